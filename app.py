@@ -20,6 +20,7 @@ from routes.slack_routes import slack_bp
 
 # Import utilities to initialize contexts
 from utils.context_manager import load_user_contexts
+from utils.server_discovery import start_server_discovery
 
 def create_app():
     """Application factory"""
@@ -37,6 +38,9 @@ def create_app():
     load_user_contexts()
     logger.info("User contexts loaded successfully.")
     
+    # Keep SERVERS in line with the servers under the PufferPanel root
+    start_server_discovery()
+    
     # Register blueprints
     app.register_blueprint(api_bp)
     app.register_blueprint(slack_bp)
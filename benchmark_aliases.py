@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Alias resolution benchmark
+
+Compares the legacy ``process_command_alias`` (three dict checks, CONFIG
+lookups and regex placeholder substitution per call) with the compiled
+dispatch table, after checking both give the same result for every
+configured alias and shortcut with every argument count.
+
+Usage: python3 benchmark_aliases.py [calls]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import CONFIG, ALIASES, LUCKPERMS_SHORTCUTS, ESSENTIALS_SHORTCUTS
+from modules.command_processor import process_command_alias
+
+ROUNDS = 5
+ARGS = ['Steve', 'creative', 'diamond', '64', 'survival_1']
+
+
+def legacy_format_command_template(template, args):
+    placeholders = re.findall(r'\{(\w+)\}', template)
+    formatted_command = template
+    for i, placeholder in enumerate(placeholders):
+        if i < len(args):
+            formatted_command = formatted_command.replace(f'{{{placeholder}}}', args[i])
+        else:
+            return None, f"Missing argument for {{{placeholder}}}"
+    remaining_placeholders = re.findall(r'\{(\w+)\}', formatted_command)
+    if remaining_placeholders:
+        return None, f"Missing arguments: {', '.join(['{' + p + '}' for p in remaining_placeholders])}"
+    return formatted_command, None
+
+
+def legacy_process_command_alias(command, user_name="unknown"):
+    """The previous implementation, without the coordcmd special case"""
+    if not command.strip():
+        return command, None
+    parts = command.strip().split()
+    base_command = parts[0].lower()
+    args = parts[1:] if len(parts) > 1 else []
+    for flag, templates, prefix, always_format in (
+            ('enable_aliases', ALIASES, "Alias error", False),
+            ('enable_luckperms_shortcuts', LUCKPERMS_SHORTCUTS, "LuckPerms shortcut error", True),
+            ('enable_essentials_shortcuts', ESSENTIALS_SHORTCUTS, "Essentials shortcut error", False)):
+        if CONFIG.get(flag, True) and base_command in templates:
+            template = templates[base_command]
+            if always_format or '{' in template:
+                formatted_command, error = legacy_format_command_template(template, args)
+                if error:
+                    return command, f"{prefix}: {error}"
+                return formatted_command, None
+            return template + (' ' + ' '.join(args) if args else ''), None
+    return command, None
+
+
+def sample_commands():
+    templates = {**ESSENTIALS_SHORTCUTS, **LUCKPERMS_SHORTCUTS, **ALIASES}
+    # Coordinate shortcuts run a coordcmd rather than resolving to a command
+    names = sorted(name for name, template in templates.items() if not template.startswith('coordcmd'))
+    commands = [' '.join([name] + ARGS[:count]) for name in names for count in range(len(ARGS) + 1)]
+    return commands + ['list', 'say hello world', 'tp {x} Alex', 'whitelist add Steve']
+
+
+def bench(label, func, commands, calls):
+    best = None
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        done = 0
+        while done < calls:
+            for command in commands:
+                func(command)
+            done += len(commands)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    rate = done / best
+    print(f"{label:<24} {best * 1e6 / done:7.2f} µs per call   {rate:12,.0f} calls/s")
+    return rate
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    commands = sample_commands()
+    for command in commands:
+        expected = legacy_process_command_alias(command)
+        actual = process_command_alias(command)
+        assert actual == expected, f"{command!r}: {actual!r} != {expected!r}"
+
+    print(f"🔀 Alias resolution benchmark - {len(commands)} distinct commands, {calls} calls, best of {ROUNDS}")
+    print("=" * 80)
+    legacy = bench("legacy", legacy_process_command_alias, commands, calls)
+    compiled = bench("compiled table", process_command_alias, commands, calls)
+    print(f"\n⚡ Compiled table resolves {compiled / legacy:.1f}x faster; results are identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Output cleaner benchmark
+
+Compares the legacy ``clean_output_text`` with the precompiled cleaner and
+its streaming variant on multi-megabyte RCON-like output (``§`` colour
+codes, ANSI sequences, control characters, blank lines), and the per-call
+cost on a typical short response.
+
+Usage: python3 benchmark_output_cleaner.py [megabytes]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.output_cleaner import clean_output_text, iter_clean_output
+
+CHUNK_SIZE = 4096
+ROUNDS = 5
+SHORT_CALLS = 100000
+SHORT_OUTPUT = "There are 3 of a max of 20 players online: §aSteve§r, Alex, Notch"
+
+
+def legacy_clean_output_text(text):
+    """The previous implementation: four re.sub passes with a function-level import"""
+    if not text:
+        return ""
+
+    import re
+    text = re.sub(r'\x1b\[[0-9;]*m', '', text)
+    text = re.sub(r'§[0-9a-fk-or]', '', text)
+    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+    text = re.sub(r'\n\s*\n', '\n', text)
+    text = text.strip()
+
+    return text
+
+
+def make_sample(megabytes):
+    """Plugin-list / help style output with formatting noise"""
+    rng = random.Random(42)
+    pieces = [
+        "§e/command{i}§r: Description of plugin command number {i} — ✓\n",
+        "\x1b[32m[INFO]\x1b[0m Player{i} joined the game\n",
+        "§6§lLuckPerms§r group{i}: weight {i}, §aprefix§r\n",
+        "\n\n   \n",
+        "Plain line {i} with\ttabs and \x07bell\x01 characters\n",
+    ]
+    lines = []
+    size = 0
+    target = megabytes * 1024 * 1024
+    i = 0
+    while size < target:
+        line = rng.choice(pieces).format(i=i)
+        lines.append(line)
+        size += len(line.encode('utf-8'))
+        i += 1
+    return "".join(lines)
+
+
+def chunks(text, size=CHUNK_SIZE):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def bench(label, func, text, megabytes):
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        result = func(text)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"{label:<32} best {best * 1000:9.1f} ms   {megabytes / best:8.1f} MB/s")
+    return best, result
+
+
+def bench_short(label, func):
+    started = time.perf_counter()
+    for _ in range(SHORT_CALLS):
+        func(SHORT_OUTPUT)
+    per_call = (time.perf_counter() - started) / SHORT_CALLS
+    print(f"{label:<32} {per_call * 1e6:9.2f} µs per call")
+    return per_call
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    text = make_sample(megabytes)
+    print(f"🧹 Output cleaner benchmark - {megabytes} MB sample, best of {ROUNDS}")
+    print("=" * 90)
+
+    legacy, expected = bench("legacy (4 passes)", legacy_clean_output_text, text, megabytes)
+    current, result = bench("precompiled", clean_output_text, text, megabytes)
+    assert result == expected, "precompiled output differs from legacy output"
+    streaming, result = bench(f"streaming ({CHUNK_SIZE} char chunks)",
+                              lambda t: "".join(iter_clean_output(chunks(t))), text, megabytes)
+    assert result == expected, "streaming output differs from legacy output"
+
+
+    print(f"\nShort response ({len(SHORT_OUTPUT)} chars), {SHORT_CALLS} calls")
+    print("=" * 90)
+    legacy_short = bench_short("legacy", legacy_clean_output_text)
+    current_short = bench_short("precompiled", clean_output_text)
+
+    print(f"\n⚡ Precompiled cleaner: {legacy / current:.1f}x on {megabytes} MB "
+          f"(streaming {legacy / streaming:.1f}x), {legacy_short / current_short:.1f}x per short response; "
+          f"outputs are identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+RCON micro-benchmark
+
+Runs a local fake Minecraft RCON server and compares the native in-process
+client against the legacy per-command ``mcrcon`` subprocess path.
+
+Usage: python3 benchmark_rcon.py [iterations]
+"""
+import os
+import shutil
+import socketserver
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.rcon_client import (RconClient, SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE,
+                               SERVERDATA_EXECCOMMAND, SERVERDATA_RESPONSE_VALUE)
+from utils.rcon_pool import RconConnectionPool
+from utils.rcon_async import RconEngine
+from config.settings import SERVERS
+
+PASSWORD = "benchmark"
+LIST_OUTPUT = "There are 3 of a max of 20 players online: Steve, Alex, Notch"
+HELP_OUTPUT = "\n".join(f"§e/command{i}§r: Description of plugin command number {i} — ✓" for i in range(2000))
+FRAGMENT_SIZE = 4096
+# Minecraft reads at most this much per packet
+READ_SIZE = 1460
+
+
+class FakeRconHandler(socketserver.BaseRequestHandler):
+    """Answers RCON packets the way a vanilla Minecraft server does
+
+    Like Minecraft's RconClient it takes one ``read()`` per packet and drops
+    the connection when that read holds anything but exactly one packet, so
+    a client writing packets back to back fails here as it would in game.
+    """
+
+    def setup(self):
+        self.server.connections.add(self.request)
+
+    def finish(self):
+        self.server.connections.discard(self.request)
+
+    def handle(self):
+        try:
+            self._serve()
+        except OSError:
+            pass  # Connection dropped by stop() or the client
+
+    def _serve(self):
+        authenticated = False
+        while True:
+            data = self.request.recv(READ_SIZE)
+            if len(data) < 14:
+                return
+            (size,) = struct.unpack_from('<i', data)
+            if size != len(data) - 4:
+                self.server.framing_errors += 1
+                return
+            request_id, packet_type = struct.unpack_from('<ii', data, 4)
+            body = data[12:-2].decode('utf-8')
+
+            if packet_type == SERVERDATA_AUTH:
+                authenticated = body == self.server.password
+                self._send(request_id if authenticated else -1, SERVERDATA_AUTH_RESPONSE, "")
+            elif not authenticated:
+                return
+            elif packet_type == SERVERDATA_EXECCOMMAND:
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                self._send(request_id, SERVERDATA_RESPONSE_VALUE, self.server.respond(body))
+            else:
+                self._send(request_id, SERVERDATA_RESPONSE_VALUE, f"Unknown request {packet_type:x}")
+
+    def _send(self, request_id, packet_type, body):
+        # Like Minecraft, split long responses into 4096-byte packets with the same id, one write each
+        payload = body.encode('utf-8')
+        for offset in range(0, max(len(payload), 1), FRAGMENT_SIZE):
+            fragment = payload[offset:offset + FRAGMENT_SIZE]
+            self.request.sendall(struct.pack('<iii', len(fragment) + 10, request_id, packet_type) +
+                                 fragment + b'\x00\x00')
+
+
+class FakeRconServer(socketserver.ThreadingTCPServer):
+    """Threaded fake RCON server bound to a random local port"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=PASSWORD, latency=0.0, responses=None, port=0):
+        super().__init__(('127.0.0.1', port), FakeRconHandler)
+        self.password = password
+        self.latency = latency
+        self.responses = responses or {'list': LIST_OUTPUT, 'help': HELP_OUTPUT}
+        self.connections = set()
+        self.framing_errors = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def respond(self, command):
+        return self.responses.get(command, f"Executed: {command}")
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop serving and drop open connections, like a server restart"""
+        self.shutdown()
+        self.server_close()
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(2)
+            except OSError:
+                pass
+
+
+def summarize(label, samples):
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(f"{label:<32} mean {statistics.mean(samples_ms):8.3f} ms   "
+          f"p50 {statistics.median(samples_ms):8.3f} ms   p95 {p95:8.3f} ms")
+    return statistics.mean(samples_ms)
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_native(port, iterations):
+    def run():
+        with RconClient('127.0.0.1', port, PASSWORD, timeout=5) as client:
+            client.command('list')
+    return time_calls(run, iterations)
+
+
+def bench_native_reused(port, iterations):
+    client = RconClient('127.0.0.1', port, PASSWORD, timeout=5)
+    client.connect()
+    try:
+        return time_calls(lambda: client.command('list'), iterations)
+    finally:
+        client.close()
+
+
+def bench_pooled(port, iterations):
+    pool = RconConnectionPool('benchmark', '127.0.0.1', port, PASSWORD, max_size=4, timeout=5)
+    try:
+        return time_calls(lambda: pool.execute('list'), iterations)
+    finally:
+        pool.close()
+
+
+def bench_engine(port, iterations):
+    SERVERS['benchmark'] = {'port': port, 'password': PASSWORD}
+    engine = RconEngine()
+    try:
+        return time_calls(lambda: engine.execute('benchmark', 'list', 5), iterations)
+    finally:
+        engine.close()
+        del SERVERS['benchmark']
+
+
+def bench_large_output(port, iterations):
+    """Reassembly of a multi-packet response"""
+    client = RconClient('127.0.0.1', port, PASSWORD, timeout=5)
+    client.connect()
+    try:
+        output = client.command('help')
+        assert output == HELP_OUTPUT, "reassembled output does not match"
+        packets = -(-len(HELP_OUTPUT.encode('utf-8')) // FRAGMENT_SIZE)
+        summarize(f"help, {len(output) // 1024} KiB / {packets} packets", time_calls(lambda: client.command('help'), iterations))
+        summarize("help, streamed", time_calls(lambda: sum(1 for _ in client.iter_command('help')), iterations))
+    finally:
+        client.close()
+
+
+def bench_concurrent(label, port, iterations, concurrency=50):
+    """Total wall time for `iterations` commands issued from `concurrency` threads"""
+    SERVERS['benchmark'] = {'port': port, 'password': PASSWORD}
+    engine = RconEngine()
+    pool = RconConnectionPool('benchmark', '127.0.0.1', port, PASSWORD, max_size=4, timeout=5)
+    run = {'engine': lambda: engine.execute('benchmark', 'list', 5), 'pool': lambda: pool.execute('list', 5)}[label]
+    run()  # warm up the connection
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda _: run(), range(iterations)))
+            elapsed = time.perf_counter() - start
+    finally:
+        engine.close()
+        pool.close()
+        del SERVERS['benchmark']
+    print(f"{label + f' ({concurrency} threads)':<32} {iterations / elapsed:10.0f} commands/s")
+
+
+def bench_batch(port, iterations, size=200):
+    """One batch of `size` commands: sequential command() calls against pipeline() and the engine"""
+    commands = [f"whitelist add player{i}" for i in range(size)]
+    expected = [f"Executed: {command}" for command in commands]
+    SERVERS['benchmark'] = {'port': port, 'password': PASSWORD}
+    engine = RconEngine()
+    client = RconClient('127.0.0.1', port, PASSWORD, timeout=5)
+    client.connect()
+    try:
+        assert client.pipeline(commands) == expected, "pipelined results do not match"
+        assert engine.execute_many('benchmark', commands, 5) == expected, "engine batch results do not match"
+        sequential = summarize(f"batch of {size}, sequential", time_calls(lambda: [client.command(c) for c in commands], iterations))
+        pipelined = summarize(f"batch of {size}, pipelined", time_calls(lambda: client.pipeline(commands), iterations))
+        summarize(f"batch of {size}, engine", time_calls(lambda: engine.execute_many('benchmark', commands, 5), iterations))
+        print(f"{'':<32} pipelining is {sequential / pipelined:.1f}x faster than sequential commands")
+    finally:
+        client.close()
+        engine.close()
+        del SERVERS['benchmark']
+
+
+def bench_mcrcon(port, iterations):
+    def run():
+        subprocess.run(['mcrcon', '-H', '127.0.0.1', '-P', str(port), '-p', PASSWORD, 'list'],
+                       capture_output=True, text=True, timeout=30)
+    return time_calls(run, iterations)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = FakeRconServer().start()
+    print(f"🎮 RCON benchmark - {iterations} iterations against fake server on port {server.port}")
+    print("=" * 90)
+
+    try:
+        native = summarize("native (connect per command)", bench_native(server.port, iterations))
+        summarize("native (reused connection)", bench_native_reused(server.port, iterations))
+        summarize("native (connection pool)", bench_pooled(server.port, iterations))
+        summarize("async engine (sync facade)", bench_engine(server.port, iterations))
+        bench_large_output(server.port, max(iterations // 10, 20))
+        bench_batch(server.port, max(iterations // 25, 10))
+        print()
+        bench_concurrent('pool', server.port, iterations)
+        bench_concurrent('engine', server.port, iterations)
+
+        if shutil.which('mcrcon'):
+            legacy = summarize("mcrcon subprocess", bench_mcrcon(server.port, iterations))
+            print(f"\n⚡ Native client is {legacy / native:.1f}x faster than the mcrcon subprocess")
+        else:
+            print("\n⚠️  mcrcon not installed - skipping subprocess comparison")
+        assert server.framing_errors == 0, f"{server.framing_errors} connections broke Minecraft's one-packet-per-read framing"
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Server metadata benchmark
+
+Compares the legacy ``get_server_display_name`` (reads ``<id>.json`` up to
+twice and scans ``server.properties`` on every call) with the cached
+ServerRegistry on a temporary PufferPanel server root. Each simulated Slack
+request looks a server up three times, as ``execute_rcon_command`` logging,
+response formatting and server lists do. Also checks that both give the same
+names and that the registry notices an edited file.
+
+Usage: python3 benchmark_server_registry.py [servers]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import CONFIG
+from utils.output_cleaner import strip_formatting
+from utils.server_registry import ServerRegistry
+
+REQUESTS = 20000
+LOOKUPS_PER_REQUEST = 3
+
+
+def legacy_get_server_display_name(root, server_id):
+    """The previous implementation, reading the files on every call"""
+    display_name = ""
+
+    pufferpanel_config = os.path.join(root, f"{server_id}.json")
+    if os.path.exists(pufferpanel_config):
+        try:
+            with open(pufferpanel_config, 'r') as f:
+                config = json.load(f)
+                display_name = config.get('data', {}).get('motd', {}).get('value', '')
+                if display_name:
+                    display_name = strip_formatting(display_name)
+                    display_name = display_name.strip().strip('"\'')[:40]
+        except (json.JSONDecodeError, KeyError, IOError):
+            pass
+
+    if not display_name and os.path.exists(pufferpanel_config):
+        try:
+            with open(pufferpanel_config, 'r') as f:
+                config = json.load(f)
+                display_name = config.get('display', '').strip()
+        except (json.JSONDecodeError, KeyError, IOError):
+            pass
+
+    if not display_name:
+        server_properties = os.path.join(root, server_id, "server.properties")
+        if os.path.exists(server_properties):
+            try:
+                with open(server_properties, 'r') as f:
+                    for line in f:
+                        if line.startswith('motd='):
+                            motd = line.split('=', 1)[1].strip()
+                            display_name = strip_formatting(motd)
+                            display_name = display_name.strip()[:40]
+                            break
+            except IOError:
+                pass
+
+    return display_name or server_id
+
+
+def make_servers(root, count):
+    """PufferPanel-style configs: a third with a MOTD, a third with a display name, a third with neither"""
+    server_ids = []
+    for i in range(count):
+        server_id = f"{i:08x}"
+        server_ids.append(server_id)
+        data = {'port': {'value': 25565 + i}, 'rcon-port': {'value': 25575 + i}}
+        if i % 3 == 0:
+            data['motd'] = {'value': f"§6Server §l{i}§r - survival"}
+        config = {'name': server_id, 'display': f"Display {i}" if i % 3 == 1 else '', 'data': data,
+                  'run': {'stop': 'stop', 'command': ['java -jar server.jar'] * 5}}
+        with open(os.path.join(root, f"{server_id}.json"), 'w') as f:
+            json.dump(config, f, indent=2)
+
+        os.makedirs(os.path.join(root, server_id))
+        properties = [f"#Minecraft server properties", "enable-rcon=true", f"rcon.port={25575 + i}",
+                      f"server-port={25565 + i}"]
+        properties += [f"setting-{n}=value-{n}" for n in range(50)]
+        properties.append(f"motd=§aProperties MOTD {i}")
+        with open(os.path.join(root, server_id, "server.properties"), 'w') as f:
+            f.write("\n".join(properties) + "\n")
+    return server_ids
+
+
+def bench(label, lookup, server_ids):
+    started = time.perf_counter()
+    for n in range(REQUESTS):
+        server_id = server_ids[n % len(server_ids)]
+        for _ in range(LOOKUPS_PER_REQUEST):
+            lookup(server_id)
+    per_request = (time.perf_counter() - started) / REQUESTS
+    print(f"{label:<28} {per_request * 1e6:9.2f} µs per request ({LOOKUPS_PER_REQUEST} lookups)")
+    return per_request
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    root = tempfile.mkdtemp(prefix='server-registry-bench-')
+    try:
+        server_ids = make_servers(root, count)
+        registry = ServerRegistry(root)
+        print(f"🗂️  Server metadata benchmark - {count} servers, {REQUESTS} requests")
+        print("=" * 90)
+
+        for server_id in server_ids:
+            assert registry.get(server_id).display_name == legacy_get_server_display_name(root, server_id), \
+                f"registry name differs from legacy name for {server_id}"
+
+        legacy = bench("legacy (reads files)", lambda s: legacy_get_server_display_name(root, s), server_ids)
+        cached = bench("registry", lambda s: registry.get(s).display_name, server_ids)
+        interval = CONFIG.get('server_registry_check_interval', 2)
+        CONFIG['server_registry_check_interval'] = 0
+        checked = bench("registry (stat every read)", lambda s: registry.get(s).display_name, server_ids)
+
+        # An edited file is picked up on the next check
+        config_path = os.path.join(root, f"{server_ids[1]}.json")
+        with open(config_path) as f:
+            config = json.load(f)
+        config['display'] = 'Renamed server'
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+        assert registry.get(server_ids[1]).display_name == 'Renamed server', "edited config not picked up"
+        CONFIG['server_registry_check_interval'] = interval
+
+        print(f"\n⚡ Registry: {legacy / cached:.0f}x faster per request "
+              f"({legacy / checked:.0f}x when every read is checked against the files); names are identical")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
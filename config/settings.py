@@ -5,9 +5,19 @@ import os
 
 # PufferPanel configuration
 USER_CONTEXTS_FILE = 'user_contexts.json'
+DEFERRED_COMMANDS_FILE = 'deferred_commands.json'
+COMMAND_POLICY_FILE = 'command_policy.json'
+MACROS_FILE = 'macros.json'
+HISTORY_DIR = 'history'
 PUFFERPANEL_SERVER_ROOT = "/var/lib/pufferpanel/servers"
 
-# Server configurations
+# RCON connection settings
+RCON_HOST = "localhost"
+# Unix socket of the optional shared RCON gateway (gateway.py)
+RCON_GATEWAY_SOCKET = os.environ.get('RCON_GATEWAY_SOCKET', '/run/rcon-gateway/gateway.sock')
+
+# Server configurations; server discovery adds every server under PUFFERPANEL_SERVER_ROOT
+# with enable-rcon=true and takes port and password from its server.properties
 SERVERS = {
     "7eaa7ab6": {
         "port": 25576,
@@ -36,10 +46,62 @@ CONFIG = {
     'admin_users': ['doktorodd'],  # Add your Slack username here
     'enable_dangerous_commands': False,
     'max_command_length': 500,
+    'policy_reload_interval': 5,  # seconds between checks of COMMAND_POLICY_FILE for changes
+    'policy_cache_size': 1024,  # cached allow/deny verdicts
+    'rcon_timeout': 30,  # seconds, used until a command has latency history
+    'adaptive_timeouts': True,  # derive per-command timeouts from recorded latencies
+    'adaptive_timeout_margin': 3,  # timeout = p99 latency x margin
+    'adaptive_timeout_floor': 2,  # seconds
+    'adaptive_timeout_ceiling': 120,  # seconds
+    'adaptive_timeout_min_samples': 20,  # samples before a learned timeout is used
+    'rcon_engine': 'async',  # 'async' (one multiplexed socket per server) or 'pool'
+    'rcon_gateway': 'auto',  # 'auto' uses the gateway daemon when it is running, 'off' always goes direct
+    'gateway_retry_interval': 5,  # seconds in direct mode after the gateway could not be reached
+    'gateway_connect_timeout': 1,  # seconds
+    'rcon_pool_size': 4,  # max connections per server
+    'rcon_pool_idle_timeout': 300,  # seconds before an idle connection is closed
+    'rcon_keepalive_interval': 60,  # seconds between probes of idle connections
+    'fanout_deadline': 10,  # seconds to wait for all servers in `/mc all`
+    'max_batch_commands': 200,  # commands per POST /mc/batch request
+    'max_bulk_players': 1000,  # players per bulk command
+    'bulk_chunk_size': 50,  # commands pipelined per round in bulk commands and per gateway batch call
+    'max_macro_steps': 50,  # steps in one macro script
+    'max_macro_commands': 500,  # commands one macro run may execute, loops included
+    'max_macro_wait': 600,  # seconds one macro run may spend in wait steps
+    'slack_page_size': 3500,  # characters of output per Slack message
+    'slack_pushed_pages': 4,  # pages posted through the response_url after the reply; the rest wait for `/mc more`
+    'slack_page_cache_size': 100,  # results with pages left to fetch with `/mc more`
+    'slack_page_ttl': 1800,  # seconds a `/mc more` token stays valid
+    'max_log_lines': 500,  # lines `/logs` may show
+    'enable_command_history': True,  # record executed commands in HISTORY_DIR for `/mc history`
+    'history_flush_interval': 1,  # seconds between writes of buffered history
+    'history_buffer_size': 10000,  # unwritten history entries kept before new ones are dropped
+    'history_segment_size': 4194304,  # bytes per history segment before it is sealed and indexed
+    'history_retention_days': 30,
+    'max_history_results': 200,  # entries one history query may return
+    'enable_server_discovery': True,  # follow PUFFERPANEL_SERVER_ROOT for servers and their RCON settings
+    'server_discovery_poll_interval': 30,  # seconds between rescans where inotify is unavailable
+    'server_registry_check_interval': 2,  # seconds before cached server metadata is checked against its files
+    'position_cache_ttl': 0.5,  # seconds a player position is reused by coordinate commands
+    'position_cache_size': 128,  # max cached player positions, kept apart from result_cache_size
+    'max_in_flight_per_server': 4,  # concurrent RCON commands per server
+    'max_queued_per_server': 20,  # queued commands per server before rejecting as busy
+    'scheduler_queue_timeout': 10,  # seconds a queued command waits before giving up
+    'breaker_failure_threshold': 3,  # consecutive connection failures/timeouts before a server is marked down
+    'breaker_reset_timeout': 15,  # seconds before a down server is probed again
+    'breaker_probe_timeout': 2,  # seconds allowed for a background probe
+    'enable_result_cache': True,  # reuse results of read-only commands (see CACHEABLE_COMMANDS)
+    'result_cache_size': 256,  # max cached results across all servers
+    'enable_single_flight': True,  # identical concurrent read-only commands share one execution
+    'enable_deferred_commands': False,  # queue admin commands for offline servers (see DEFERRABLE_COMMANDS)
+    'max_deferred_per_server': 100,
+    'deferred_replay_poll_interval': 15,  # seconds between checks of servers with queued commands
     'rate_limit_per_user': 30,  # commands per minute
     'enable_context_commands': True,
     'default_context_timeout': 300,  # 5 minutes
-    'enable_auto_suggest': True,
+    'enable_auto_suggest': True,  # answer unknown commands with "did you mean" instead of running them
+    'max_suggestions': 3,
+    'server_commands_ttl': 3600,  # seconds a server's command list (for suggestions) is reused
     'log_level': 'INFO'
 }
 
@@ -92,6 +154,49 @@ ALIASES = {
     'level': 'experience add {player} {amount} levels'
 }
 
+# Command scheduling priorities (base commands); admin users always run first
+SERVER_CONTROL_COMMANDS = [
+    'stop', 'restart', 'reload', 'save-all', 'save-on', 'save-off', 'kick', 'ban', 'ban-ip',
+    'pardon', 'pardon-ip', 'op', 'deop', 'whitelist', 'lp', 'luckperms', 'kill'
+]
+COSMETIC_COMMANDS = [
+    'say', 'me', 'msg', 'tell', 'w', 'tellraw', 'title', 'particle', 'playsound',
+    'broadcast', 'bc', 'r'
+]
+
+# Read-only commands whose results may be reused, with their TTL in seconds
+CACHEABLE_COMMANDS = {
+    'list': 5,
+    'plugins': 300,
+    'pl': 300,
+    'seed': 3600,
+    'version': 3600,
+    'whitelist list': 60,
+    'banlist': 60,
+    'lp listgroups': 60,
+}
+# Commands that change server state; running one drops the server's cached results
+CACHE_INVALIDATING_COMMANDS = [
+    'whitelist', 'op', 'deop', 'ban', 'ban-ip', 'pardon', 'pardon-ip', 'kick',
+    'lp', 'luckperms', 'reload', 'restart', 'stop', 'plugman'
+]
+
+# Admin commands that may be queued while their server is offline and replayed when it is back
+DEFERRABLE_COMMANDS = [
+    'whitelist add', 'whitelist remove', 'op', 'deop', 'ban', 'ban-ip', 'pardon', 'pardon-ip',
+    'lp user', 'lp group', 'luckperms user', 'luckperms group'
+]
+
+# Command safety policy; rules in COMMAND_POLICY_FILE ({"rules": [...]}) are checked first and
+# the first matching rule wins. 'command' is a base command or '*'; optional 'subcommand',
+# 'args' (regex searched in the arguments), 'roles' ('admin', 'user'; default both) and
+# 'message'. 'dangerous' rules do not apply while enable_dangerous_commands is on.
+COMMAND_POLICY_RULES = [
+    {'command': 'stop', 'action': 'deny', 'roles': ['user'], 'dangerous': True},
+    {'command': 'restart', 'action': 'deny', 'roles': ['user'], 'dangerous': True},
+    {'command': 'kill', 'action': 'deny', 'roles': ['user'], 'dangerous': True},
+]
+
 # LuckPerms shortcuts
 LUCKPERMS_SHORTCUTS = {
     'addgroup': 'lp user {player} parent add {group}',
@@ -128,6 +233,19 @@ ESSENTIALS_SHORTCUTS = {
     'hangsign': 'coordcmd {player} {server} setblock {x} {y} {z} minecraft:oak_hanging_sign'
 }
 
+# Vanilla commands, for suggestions; each server's own command list is fetched as well
+VANILLA_COMMANDS = [
+    'advancement', 'attribute', 'ban', 'ban-ip', 'banlist', 'bossbar', 'clear', 'clone', 'damage', 'data',
+    'datapack', 'debug', 'defaultgamemode', 'deop', 'difficulty', 'effect', 'enchant', 'execute',
+    'experience', 'fill', 'fillbiome', 'forceload', 'function', 'gamemode', 'gamerule', 'give', 'help',
+    'item', 'jfr', 'kick', 'kill', 'list', 'locate', 'loot', 'me', 'msg', 'op', 'pardon', 'pardon-ip',
+    'particle', 'perf', 'place', 'playsound', 'publish', 'random', 'recipe', 'reload', 'return', 'ride',
+    'save-all', 'save-off', 'save-on', 'say', 'schedule', 'scoreboard', 'seed', 'setblock',
+    'setidletimeout', 'setworldspawn', 'spawnpoint', 'spectate', 'spreadplayers', 'stop', 'stopsound',
+    'summon', 'tag', 'team', 'teammsg', 'teleport', 'tell', 'tellraw', 'tick', 'time', 'title', 'tm', 'tp',
+    'transfer', 'trigger', 'w', 'weather', 'whitelist', 'worldborder', 'xp'
+]
+
 # Command descriptions for help system
 COMMAND_DESCRIPTIONS = {
     'list': 'Shows all online players',
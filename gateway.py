@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+RCON Gateway - shared RCON connections for all web workers
+Owns the RCON connections, schedulers, circuit breakers and caches for every
+server and serves the gunicorn workers over a Unix domain socket
+(protocol: utils/rcon_gateway.py)
+"""
+import os
+import sys
+import logging
+import signal
+import socketserver
+
+# Add the current directory to Python path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config.settings import CONFIG, RCON_GATEWAY_SOCKET
+
+# The gateway itself always executes directly
+CONFIG['rcon_gateway'] = 'off'
+
+from modules.command_processor import (execute_rcon_command, execute_cached_rcon_command, execute_rcon_batch,
+                                       get_rcon_stats, get_server_breaker_states, get_timeout_table,
+                                       apply_config_value, apply_alias)
+from utils.rcon_gateway import send_frame, recv_frame, GatewayError
+from utils.server_discovery import start_server_discovery
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = {
+    'ping': lambda: 'pong',
+    'execute': execute_rcon_command,
+    'execute_cached': execute_cached_rcon_command,
+    'batch': execute_rcon_batch,
+    'stats': get_rcon_stats,
+    'breakers': get_server_breaker_states,
+    'timeouts': get_timeout_table,
+    # `config set` and `config alias` from a worker, so flags read here take effect
+    'config': apply_config_value,
+    'config_alias': apply_alias,
+}
+
+
+class GatewayHandler(socketserver.BaseRequestHandler):
+    """Serves requests from one worker connection until it closes"""
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_frame(self.request)
+            except (OSError, ValueError, GatewayError) as e:
+                logger.warning(f"Dropping gateway connection: {e}")
+                return
+            if request is None:
+                return
+
+            operation = OPERATIONS.get(request.get('op'))
+            if operation is None:
+                response = {'id': request.get('id'), 'ok': False, 'error': f"Unknown operation: {request.get('op')}"}
+            else:
+                try:
+                    response = {'id': request.get('id'), 'ok': True, 'result': operation(**request.get('args', {}))}
+                except Exception as e:
+                    logger.error(f"Gateway operation {request.get('op')} failed: {e}")
+                    response = {'id': request.get('id'), 'ok': False, 'error': str(e)}
+
+            try:
+                send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class GatewayServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every worker thread opens its own connection, often all at once after a restart
+    request_queue_size = 128
+
+
+def create_server(path=RCON_GATEWAY_SOCKET):
+    """Bind the gateway socket, replacing a stale one left by a previous run"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = GatewayServer(path, GatewayHandler)
+    os.chmod(path, 0o660)
+    return server
+
+
+if __name__ == '__main__':
+    log_level = getattr(logging, CONFIG.get('log_level', 'INFO').upper())
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    start_server_discovery()
+    server = create_server()
+    # systemd stops us with SIGTERM; exit normally so the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    logger.info(f"RCON gateway listening on {RCON_GATEWAY_SOCKET}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(RCON_GATEWAY_SOCKET):
+            os.unlink(RCON_GATEWAY_SOCKET)
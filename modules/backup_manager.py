@@ -16,7 +16,7 @@ def handle_backup_list():
     """List all servers available for backup"""
     try:
         server_list = "📋 *Servers Available for Backup*\n\n"
-        for server_id in SERVERS.keys():
+        for server_id in list(SERVERS):
             server_info = get_server_info(server_id)
             if server_info:
                 server_list += f"• *{server_info['name']}* (`{server_id}`)\n"
@@ -1,74 +1,520 @@
 """
 Command processing and RCON execution module
 """
-import subprocess
 import logging
+import math
 import re
-from config.settings import (SERVERS, CONFIG, ALIASES, LUCKPERMS_SHORTCUTS, 
-                           ESSENTIALS_SHORTCUTS, COMMAND_DESCRIPTIONS)
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from config.settings import (SERVERS, CONFIG, ALIASES, COMMAND_DESCRIPTIONS, VANILLA_COMMANDS,
+                           SERVER_CONTROL_COMMANDS, COSMETIC_COMMANDS)
 from utils.server_utils import clean_output_text, get_server_info
+from utils.server_registry import get_server_registry
+from utils.server_discovery import add_discovery_listener
+from utils.rcon_client import RconError, RconConnectionError, RconTimeoutError, RconAuthError, RconNotSentError
+from utils.rcon_pool import get_pool, get_pool_stats
+from utils.rcon_async import get_engine, get_engine_stats
+from utils.command_scheduler import (get_scheduler, get_scheduler_stats, SchedulerBusyError,
+                                     PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+from utils.circuit_breaker import get_breaker, get_breaker_states, add_recovery_listener
+from utils.latency_tracker import get_latency_tracker
+from utils.result_cache import (get_result_cache, get_position_cache, get_cache_stats, get_command_ttl,
+                                invalidates_cache, normalize_command)
+from utils.rcon_gateway import get_gateway_client, mark_gateway_unavailable, GatewayUnavailableError, GatewayError
+from utils.deferred_queue import (get_deferred_queue, is_deferrable, start_replay_watcher,
+                                  wake_replay_watcher)
+from utils.alias_table import lookup_alias, rebuild_alias_table, alias_names, ALIAS_FLAGS
+from utils.command_suggestions import SuggestionIndex
+from utils.command_policy import get_command_policy, ROLE_ADMIN, ROLE_USER
+from utils.output_parsers import parse_output, NBT_POSITION
 from utils.context_manager import get_user_context, set_user_context, clear_user_context
+from utils.command_history import get_command_history
 
 logger = logging.getLogger(__name__)
 
-def execute_rcon_command(server_id, command, source="Web Service"):
-    """Execute RCON command on specified server"""
+# Shared workers for fanning one command out to several servers
+_fanout_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='rcon-fanout')
+
+# Read-only executions in flight, keyed by (server_id, normalized command)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_single_flight_stats = {'leaders': 0, 'coalesced': 0}
+
+# Returned by _forward_to_gateway when the caller should do the work itself
+_DIRECT = object()
+# Settings for reaching the gateway, which `config set` must not change in the gateway itself
+_WORKER_CONFIG_KEYS = frozenset({'rcon_gateway', 'gateway_retry_interval', 'gateway_connect_timeout'})
+
+# Suggestion index over aliases and known commands, with the alias names it was built from
+_suggestion_index = (None, None)
+# Per-server (index of the server's own commands or None, fetched at, valid for)
+_server_command_indexes = {}
+_server_command_fetches = set()
+_server_commands_lock = threading.Lock()
+# Command names in `help` output; over RCON the lines often arrive joined together
+_HELP_COMMAND = re.compile(r'(?:^|[\s)\]>|])/([a-z][\w.:-]*)', re.IGNORECASE)
+
+def _forward_to_gateway(op, on_error, **args):
+    """Run an operation on the local RCON gateway, if one is running
+    
+    Returns _DIRECT when there is no reachable gateway (nothing was sent, so the
+    caller runs the operation itself). Failures after the request was sent are
+    not retried directly, since the gateway may already have run the command.
+    """
+    client = get_gateway_client()
+    if client is None:
+        return _DIRECT
+    # The gateway enforces the real timeouts; this only guards against a hung gateway, so a
+    # worker thread is never held longer than one queue wait and the slowest timeout.
+    # Batches are forwarded a chunk at a time to stay within it.
+    timeout = (CONFIG.get('scheduler_queue_timeout', 10)
+               + max(CONFIG.get('rcon_timeout', 30), CONFIG.get('adaptive_timeout_ceiling', 120)) + 5)
+    try:
+        return client.call(op, timeout, **args)
+    except GatewayUnavailableError as e:
+        mark_gateway_unavailable(e)
+        return _DIRECT
+    except GatewayError as e:
+        logger.error(f"RCON gateway {op} failed: {e}")
+        return on_error(e)
+
+def _send_rcon(server_id, command, timeout):
+    """Send a command through the configured RCON engine"""
+    if CONFIG.get('rcon_engine', 'async') == 'pool':
+        return get_pool(server_id).execute(command, timeout)
+    return get_engine().execute(server_id, command, timeout)
+
+def _send_rcon_many(server_id, commands, timeout):
+    """Pipeline commands through the configured RCON engine"""
+    if CONFIG.get('rcon_engine', 'async') == 'pool':
+        return get_pool(server_id).execute_many(commands, timeout)
+    return get_engine().execute_many(server_id, commands, timeout)
+
+def get_base_command(command):
+    """Get the lowercase base command without a leading slash or minecraft: namespace"""
+    parts = command.strip().split(None, 1)
+    if not parts:
+        return ""
+    base = parts[0].lower().lstrip('/')
+    return base[len('minecraft:'):] if base.startswith('minecraft:') else base
+
+def get_command_priority(command, user_name=None):
+    """Scheduling priority: admins and server control first, cosmetic commands last"""
+    if user_name:
+        from utils.security import is_admin_user
+        if is_admin_user(user_name):
+            return PRIORITY_HIGH
+    base_command = get_base_command(command)
+    if base_command in SERVER_CONTROL_COMMANDS:
+        return PRIORITY_HIGH
+    if base_command in COSMETIC_COMMANDS:
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+def get_command_timeout(server_id, command):
+    """RCON timeout for a command, learned from its latency history on the server"""
+    return get_latency_tracker().timeout_for(server_id, get_base_command(command))
+
+def _busy_message(server_id, error):
+    server_info = get_server_info(server_id)
+    return (f"❌ Server {server_info['name']} is busy ({error.queued} commands queued). "
+            f"Please try again in a few seconds.")
+
+def _unreachable_message(server_id, breaker):
+    return (f"❌ Server {server_id} is unreachable (circuit open). "
+            f"Retrying in {breaker.retry_in():.0f} seconds.")
+
+def _record_outcome(breaker, responses):
+    """Feed connection failures and timeouts to the server's circuit breaker"""
+    for response in responses:
+        if isinstance(response, (RconConnectionError, RconTimeoutError)):
+            breaker.record_failure(response)
+            return
+    breaker.record_success()
+
+def _defer_command(server_id, command, source, user_name, response_url=None):
+    """Queue a mutating command for an offline server; None if it cannot be deferred"""
+    if not CONFIG.get('enable_deferred_commands', False) or not is_deferrable(command):
+        return None
+    position = get_deferred_queue().add(server_id, command, user_name or source, source, response_url)
+    if position is None:
+        return None
+    logger.info(f"Deferred RCON command for offline server {server_id}: {command} [Source: {source}]")
+    return (f"⏳ Server {server_id} is offline. Queued `{command}` (#{position} in queue); "
+            f"it will run as soon as the server is back.")
+
+def execute_rcon_command(server_id, command, source="Web Service", user_name=None, original_command=None,
+                         response_url=None):
+    """Execute RCON command on specified server
+    
+    original_command is what the user typed before alias expansion, for the command history.
+    response_url is the Slack slash command's reply URL, used to report a deferred command's result.
+    """
     if server_id not in SERVERS:
         return f"❌ Invalid server ID: {server_id}"
     
-    server_config = SERVERS[server_id]
+    forwarded = _forward_to_gateway('execute', lambda e: f"❌ Gateway error: {e}", server_id=server_id,
+                                    command=command, source=source, user_name=user_name,
+                                    original_command=original_command, response_url=response_url)
+    if forwarded is not _DIRECT:
+        return forwarded
+    
+    started = time.time()
+    result = _execute_rcon_direct(server_id, command, source, user_name, response_url)
+    get_command_history().record(server_id, command, source, user_name, original_command,
+                                 started, time.time() - started, result)
+    return result
+
+def _execute_rcon_direct(server_id, command, source, user_name, response_url=None):
+    # Known-down servers fail fast instead of waiting for a connect timeout
+    breaker = get_breaker(server_id)
+    if not breaker.allow_request():
+        return (_defer_command(server_id, command, source, user_name, response_url)
+                or _unreachable_message(server_id, breaker))
+    
     server_info = get_server_info(server_id)
+    base_command = get_base_command(command)
+    timeout = get_latency_tracker().timeout_for(server_id, base_command)
     
     logger.info(f"Executing RCON command on {server_info['name']} ({server_id}): {command} [Source: {source}]")
     
     try:
-        result = subprocess.run([
-            'mcrcon', '-H', 'localhost', '-P', str(server_config['port']), 
-            '-p', server_config['password'], command
-        ], capture_output=True, text=True, timeout=30)
+        with get_scheduler(server_id).slot(get_command_priority(command, user_name),
+                                           CONFIG.get('scheduler_queue_timeout', 10)):
+            started = time.perf_counter()
+            try:
+                output = _send_rcon(server_id, command, timeout)
+            except RconTimeoutError:
+                # A timeout still tells us the command needs at least this long
+                get_latency_tracker().record(server_id, base_command, time.perf_counter() - started)
+                raise
+            finally:
+                # Invalidate after the change lands, so reads racing it are not cached
+                if invalidates_cache(command):
+                    get_result_cache().invalidate_server(server_id)
+            get_latency_tracker().record(server_id, base_command, time.perf_counter() - started)
+            output = clean_output_text(output)
+        breaker.record_success()
         
-        if result.returncode == 0:
-            output = clean_output_text(result.stdout)
-            if not output.strip():
-                output = "✅ Command executed successfully (no output)"
-            logger.info(f"RCON command successful on {server_id}")
-            return output
-        else:
-            error_msg = clean_output_text(result.stderr) or "Unknown error occurred"
-            logger.error(f"RCON command failed on {server_id}: {error_msg}")
-            return f"❌ Command failed: {error_msg}"
+        if not output.strip():
+            output = "✅ Command executed successfully (no output)"
+        logger.info(f"RCON command successful on {server_id}")
+        return output
             
-    except subprocess.TimeoutExpired:
+    except SchedulerBusyError as e:
+        breaker.release_trial()
+        logger.warning(f"RCON command rejected on {server_id}: server busy ({e.queued} queued)")
+        return _busy_message(server_id, e)
+    except RconTimeoutError as e:
+        breaker.record_failure(e)
         logger.error(f"RCON command timeout on {server_id}")
-        return "❌ Command timed out after 30 seconds"
-    except FileNotFoundError:
-        logger.error("mcrcon not found")
-        return "❌ RCON client not available on server"
+        return f"❌ Command timed out after {timeout} seconds"
+    except RconError as e:
+        _record_outcome(breaker, [e])
+        logger.error(f"RCON command failed on {server_id}: {e}")
+        if isinstance(e, RconConnectionError):
+            deferred = _defer_command(server_id, command, source, user_name, response_url)
+            if deferred:
+                return deferred
+        return f"❌ Command failed: {e}"
     except Exception as e:
+        breaker.release_trial()
         logger.error(f"Unexpected error executing RCON command: {str(e)}")
         return f"❌ Unexpected error: {str(e)}"
 
-def format_command_template(template, args):
-    """Format command template with provided arguments"""
+def execute_single_flight(server_id, command, source="Web Service", user_name=None, original_command=None):
+    """Execute a read-only RCON command, sharing the result of an identical one already in flight
+    
+    Concurrent identical requests wait for the first one instead of each
+    sending the command; nothing is reused once it has finished.
+    """
+    key = (server_id, normalize_command(command))
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+            _single_flight_stats['leaders'] += 1
+        else:
+            _single_flight_stats['coalesced'] += 1
+    
+    if not leader:
+        logger.info(f"Joining in-flight {command} on {server_id} [Source: {source}]")
+        return future.result()
+    
     try:
-        # Simple placeholder replacement
-        placeholders = re.findall(r'\{(\w+)\}', template)
-        formatted_command = template
-        
-        for i, placeholder in enumerate(placeholders):
-            if i < len(args):
-                formatted_command = formatted_command.replace(f'{{{placeholder}}}', args[i])
-            else:
-                return None, f"Missing argument for {{{placeholder}}}"
-        
-        # Check if there are unused arguments
-        remaining_placeholders = re.findall(r'\{(\w+)\}', formatted_command)
-        if remaining_placeholders:
-            return None, f"Missing arguments: {', '.join(['{' + p + '}' for p in remaining_placeholders])}"
+        result = execute_rcon_command(server_id, command, source, user_name, original_command)
+    except BaseException as e:
+        with _in_flight_lock:
+            del _in_flight[key]
+        future.set_exception(e)
+        raise
+    with _in_flight_lock:
+        del _in_flight[key]
+    future.set_result(result)
+    return result
+
+def get_single_flight_stats():
+    """Executions led and requests that joined an in-flight execution"""
+    with _in_flight_lock:
+        return dict(_single_flight_stats, in_flight=len(_in_flight))
+
+def execute_cached_rcon_command(server_id, command, source="Web Service", user_name=None, original_command=None,
+                                response_url=None):
+    """Execute an RCON command, reusing a recent result for read-only commands
+    
+    Returns:
+        Tuple of (result, cache_age) where cache_age is the age in seconds of a
+        cached result, or None if the command was run
+    """
+    forwarded = _forward_to_gateway('execute_cached', lambda e: (f"❌ Gateway error: {e}", None),
+                                    server_id=server_id, command=command, source=source, user_name=user_name,
+                                    original_command=original_command, response_url=response_url)
+    if forwarded is not _DIRECT:
+        return tuple(forwarded)
+    
+    ttl = get_command_ttl(command)
+    if ttl is None or server_id not in SERVERS:
+        return execute_rcon_command(server_id, command, source, user_name, original_command, response_url), None
+    
+    run = execute_single_flight if CONFIG.get('enable_single_flight', True) else execute_rcon_command
+    if not CONFIG.get('enable_result_cache', True):
+        return run(server_id, command, source, user_name, original_command), None
+    
+    cache = get_result_cache()
+    cached = cache.get(server_id, command)
+    if cached is not None:
+        result, age = cached
+        logger.info(f"Serving cached result for {command} on {server_id} ({age:.1f}s old) [Source: {source}]")
+        return result, age
+    
+    generation = cache.generation(server_id)
+    result = run(server_id, command, source, user_name, original_command)
+    if not result.startswith("❌"):
+        cache.put(server_id, command, result, ttl, generation)
+    return result, None
+
+def get_rcon_stats():
+    """Engine, pool, scheduler, cache, single-flight and breaker statistics
+    
+    Comes from the gateway when one is running, since it owns the connections.
+    """
+    forwarded = _forward_to_gateway('stats', lambda e: {'error': str(e)})
+    if forwarded is not _DIRECT:
+        forwarded['gateway'] = True
+        return forwarded
+    return {
+        'gateway': False,
+        'engine': get_engine_stats(),
+        'pools': get_pool_stats(),
+        'schedulers': get_scheduler_stats(),
+        'cache': get_cache_stats(),
+        'single_flight': get_single_flight_stats(),
+        'server_registry': dict(get_server_registry().stats),
+        'breakers': get_breaker_states()
+    }
+
+def get_server_breaker_states():
+    """Circuit breaker stats per server, from the gateway when one is running"""
+    forwarded = _forward_to_gateway('breakers', lambda e: {})
+    return get_breaker_states() if forwarded is _DIRECT else forwarded
+
+def get_timeout_table(server_id=None):
+    """Learned latencies and timeouts, from the gateway when one is running"""
+    forwarded = _forward_to_gateway('timeouts', lambda e: [], server_id=server_id)
+    return get_latency_tracker().table(server_id) if forwarded is _DIRECT else forwarded
+
+def format_cache_age(cache_age):
+    """Short note for responses served from the result cache"""
+    if cache_age is None:
+        return ""
+    return f"_⚡ cached result, {cache_age:.0f}s old_"
+
+def execute_rcon_batch(server_id, commands, source="Web Service", user_name=None, with_status=False):
+    """Execute several RCON commands on one server, pipelined over one connection
+    
+    Args:
+        server_id: The server to execute on
+        commands: Already processed commands, run in order
+        source: Command source for logging
+        with_status: Return (result, sent) pairs, where sent is False for
+            commands that certainly never reached the server
         
-        return formatted_command, None
+    Returns:
+        List of result strings (or (result, sent) pairs) in the same order as commands
+    """
+    if server_id not in SERVERS:
+        results = [(f"❌ Invalid server ID: {server_id}", False)] * len(commands)
+        return results if with_status else [result for result, _ in results]
+    
+    results = []
+    chunk_size = max(1, CONFIG.get('bulk_chunk_size', 50))
+    for start in range(0, len(commands), chunk_size):
+        chunk = commands[start:start + chunk_size]
+        # The gateway may have run some of a chunk it failed on, so those count as sent
+        forwarded = _forward_to_gateway('batch', lambda e, count=len(chunk): [[f"❌ Gateway error: {e}", True]] * count,
+                                        server_id=server_id, commands=chunk, source=source, user_name=user_name,
+                                        with_status=True)
+        if forwarded is _DIRECT:
+            break
+        results.extend((result, sent) for result, sent in forwarded)
+    remaining = commands[len(results):]
+    if remaining or not results:
+        started = time.time()
+        direct = _execute_rcon_batch_direct(server_id, remaining, source, user_name)
+        # Pipelined commands are not timed separately, so each is recorded with the batch's duration
+        duration = time.time() - started
+        history = get_command_history()
+        for command, (result, _) in zip(remaining, direct):
+            history.record(server_id, command, source, user_name, None, started, duration, result)
+        results.extend(direct)
+    return results if with_status else [result for result, _ in results]
+
+def _execute_rcon_batch_direct(server_id, commands, source, user_name):
+    """(result, sent) for each command, run on this process's connections"""
+    breaker = get_breaker(server_id)
+    if not breaker.allow_request():
+        return [(_unreachable_message(server_id, breaker), False)] * len(commands)
+    
+    server_info = get_server_info(server_id)
+    # Pipelined commands share one timeout; give every command the headroom of the slowest
+    timeout = max((get_command_timeout(server_id, command) for command in commands),
+                  default=CONFIG.get('rcon_timeout', 30))
+    
+    logger.info(f"Executing batch of {len(commands)} RCON commands on {server_info['name']} ({server_id}) [Source: {source}]")
+    
+    # The whole batch shares one slot, at the priority of its most important command
+    priority = min(get_command_priority(command, user_name) for command in commands) if commands else PRIORITY_NORMAL
+    
+    try:
+        with get_scheduler(server_id).slot(priority, CONFIG.get('scheduler_queue_timeout', 10)):
+            try:
+                responses = _send_rcon_many(server_id, commands, timeout)
+            finally:
+                if any(invalidates_cache(command) for command in commands):
+                    get_result_cache().invalidate_server(server_id)
+    except SchedulerBusyError as e:
+        breaker.release_trial()
+        logger.warning(f"RCON batch rejected on {server_id}: server busy ({e.queued} queued)")
+        return [(_busy_message(server_id, e), False)] * len(commands)
+    except (RconConnectionError, RconAuthError) as e:
+        # Raised rather than reported per command only while connecting, before anything is sent
+        logger.error(f"RCON batch failed on {server_id}: {e}")
+        responses = [RconNotSentError(str(e)) if isinstance(e, RconConnectionError) else e] * len(commands)
+    except RconError as e:
+        logger.error(f"RCON batch failed on {server_id}: {e}")
+        responses = [e] * len(commands)
     except Exception as e:
-        return None, f"Error formatting command: {str(e)}"
+        breaker.release_trial()
+        logger.error(f"Unexpected error executing RCON batch: {str(e)}")
+        return [(f"❌ Unexpected error: {str(e)}", True)] * len(commands)
+    
+    _record_outcome(breaker, responses)
+    
+    results = []
+    for response in responses:
+        if isinstance(response, RconTimeoutError):
+            results.append((f"❌ Command timed out after {timeout} seconds", True))
+        elif isinstance(response, RconError):
+            sent = not isinstance(response, (RconNotSentError, RconAuthError))
+            results.append((f"❌ Command failed: {response}", sent))
+        else:
+            output = clean_output_text(response)
+            results.append((output if output.strip() else "✅ Command executed successfully (no output)", True))
+    
+    failed = sum(1 for result, _ in results if result.startswith("❌"))
+    logger.info(f"RCON batch on {server_id} finished: {len(results) - failed} succeeded, {failed} failed")
+    return results
+
+def replay_deferred_commands(server_id):
+    """Run a server's deferred commands in order as one batch and report back to the requesters
+    
+    Commands that never reached the server (it went away again, or the
+    connection dropped before their turn) are queued again in order.
+    
+    Returns:
+        List of (entry, result) pairs for the commands that were run; empty
+        if nothing was queued or the server was still unreachable
+    """
+    queue = get_deferred_queue()
+    entries = queue.take(server_id)
+    if not entries:
+        return []
+    
+    logger.info(f"Replaying {len(entries)} deferred commands on {server_id}")
+    results = execute_rcon_batch(server_id, [entry['command'] for entry in entries], "Deferred replay",
+                                 with_status=True)
+    unsent = [entry for entry, (_, sent) in zip(entries, results) if not sent]
+    if unsent:
+        logger.warning(f"Server {server_id} unreachable, keeping {len(unsent)} of {len(entries)} deferred commands")
+        queue.requeue(server_id, unsent)
+    replayed = [(entry, result) for entry, (result, sent) in zip(entries, results) if sent]
+    if not replayed:
+        return []
+    
+    from utils.slack_notifications import notify_deferred_results, RESPONSE_URL_LIFETIME
+    server_name = get_server_info(server_id)['name']
+    by_requester = {}
+    for entry, result in replayed:
+        # Slack only accepts replies through a response_url for a while after the command
+        response_url = entry.get('response_url')
+        if response_url and time.time() - entry['queued_at'] > RESPONSE_URL_LIFETIME:
+            response_url = None
+        by_requester.setdefault((entry['user_name'], response_url), []).append((entry['command'], result))
+    for (user, response_url), user_results in by_requester.items():
+        notify_deferred_results(user, server_name, user_results, response_url)
+    return replayed
+
+# Replay deferred commands once their server answers again
+start_replay_watcher(replay_deferred_commands)
+add_recovery_listener(wake_replay_watcher)
+
+def execute_rcon_fanout(server_ids, command, source="Web Service", deadline=None, user_name=None):
+    """Execute the same RCON command on several servers concurrently
+    
+    Args:
+        server_ids: Servers to run on (in the order results should be returned)
+        command: Already processed command
+        source: Command source for logging
+        deadline: Seconds to wait for all servers (defaults to CONFIG['fanout_deadline'])
+        user_name: Requesting user, used for scheduling priority
+        
+    Returns:
+        Dict of server_id -> {'result', 'success', 'duration_ms', 'cache_age'}; servers
+        that miss the deadline are reported as failed
+    """
+    if deadline is None:
+        deadline = CONFIG.get('fanout_deadline', 10)
+    
+    def run(server_id):
+        started = time.monotonic()
+        result, cache_age = execute_cached_rcon_command(server_id, command, source, user_name)
+        return result, (time.monotonic() - started) * 1000, cache_age
+    
+    logger.info(f"Fanning out RCON command to {len(server_ids)} servers: {command} [Source: {source}]")
+    futures = {server_id: _fanout_executor.submit(run, server_id) for server_id in server_ids}
+    wait(futures.values(), timeout=deadline)
+    
+    results = {}
+    for server_id, future in futures.items():
+        if future.done():
+            result, duration_ms, cache_age = future.result()
+            results[server_id] = {
+                'result': result,
+                'success': not result.startswith("❌"),
+                'duration_ms': round(duration_ms, 1),
+                'cache_age': None if cache_age is None else round(cache_age, 1)
+            }
+        else:
+            logger.warning(f"RCON fan-out to {server_id} missed the {deadline}s deadline")
+            results[server_id] = {
+                'result': f"❌ No response within the {deadline} second deadline",
+                'success': False,
+                'duration_ms': round(deadline * 1000, 1),
+                'cache_age': None
+            }
+    return results
 
 def process_command_alias(command, user_name="unknown"):
     """Process command aliases and shortcuts"""
@@ -87,37 +533,16 @@ def process_command_alias(command, user_name="unknown"):
         # For coordinate commands, we return the result directly
         return result, "COORDINATE_RESULT"
     
-    # Check regular aliases first
-    if CONFIG.get('enable_aliases', True) and base_command in ALIASES:
-        template = ALIASES[base_command]
-        if '{' in template:
-            formatted_command, error = format_command_template(template, args)
-            if error:
-                return command, f"Alias error: {error}"
-            return formatted_command, None
-        else:
-            # Simple alias without parameters
-            return template + (' ' + ' '.join(args) if args else ''), None
-    
-    # Check LuckPerms shortcuts
-    if CONFIG.get('enable_luckperms_shortcuts', True) and base_command in LUCKPERMS_SHORTCUTS:
-        template = LUCKPERMS_SHORTCUTS[base_command]
-        formatted_command, error = format_command_template(template, args)
+    alias = lookup_alias(base_command)
+    if alias is not None:
+        formatted_command, error = alias.render(args)
         if error:
-            return command, f"LuckPerms shortcut error: {error}"
+            return command, error
+        # Shortcuts like hangsign expand to a coordinate command
+        if formatted_command.split(None, 1)[0].lower() == 'coordcmd':
+            return process_command_alias(formatted_command, user_name)
         return formatted_command, None
     
-    # Check Essentials shortcuts
-    if CONFIG.get('enable_essentials_shortcuts', True) and base_command in ESSENTIALS_SHORTCUTS:
-        template = ESSENTIALS_SHORTCUTS[base_command]
-        if '{' in template:
-            formatted_command, error = format_command_template(template, args)
-            if error:
-                return command, f"Essentials shortcut error: {error}"
-            return formatted_command, None
-        else:
-            return template + (' ' + ' '.join(args) if args else ''), None
-    
     return command, None
 
 def execute_context_command(command, user_name):
@@ -144,7 +569,7 @@ def execute_context_command(command, user_name):
                 if error:
                     return f"❌ {error}"
                 
-                result = execute_rcon_command(selected_server, processed_command, f"Slack User: {user_name}")
+                result = execute_rcon_command(selected_server, processed_command, f"Slack User: {user_name}", user_name)
                 return f"**Server: {get_server_info(selected_server)['name']}**\n```\n{result}\n```"
             else:
                 return f"❌ Invalid choice. Please enter a number between 1 and {len(available_servers)}, or 'cancel' to abort."
@@ -182,6 +607,8 @@ Available commands:
 • `config set <key> <value>` - Set configuration value
 • `config list` - List all configuration keys
 • `config reset <key>` - Reset to default value
+• `config alias <name> [template|none]` - Show, set or remove a command alias
+• `config timeouts [server_id]` - Show learned command latencies and timeouts
 
 **Examples:**
 • `config get enable_aliases`
@@ -208,8 +635,15 @@ Available commands:
             value = value.lower() == 'true'
         elif value.isdigit():
             value = int(value)
+        elif re.fullmatch(r'\d+\.\d+', value):
+            value = float(value)
         
-        CONFIG[key] = value
+        apply_config_value(key, value)
+        if key not in _WORKER_CONFIG_KEYS:
+            # Most flags are read where commands run, which is the gateway when it is up
+            forwarded = _forward_to_gateway('config', lambda e: e, key=key, value=value)
+            if isinstance(forwarded, GatewayError):
+                return f"⚠️ Set **{key}** to `{value}` here, but the RCON gateway did not apply it: {forwarded}"
         return f"✅ Set **{key}** to `{value}`"
     
     elif subcommand == 'list':
@@ -222,9 +656,58 @@ Available commands:
         # This would reset to defaults - implementation depends on your needs
         return f"✅ Configuration key {parts[2]} reset to default"
     
+    elif subcommand == 'alias':
+        if len(parts) < 3:
+            return "❌ Usage: config alias <name> [template]"
+        name = parts[2].lower()
+        if len(parts) == 3:
+            template = ALIASES.get(name)
+            return f"**{name}**: `{template}`" if template else f"❌ No alias named {name}"
+        template = ' '.join(parts[3:])
+        if template.lower() == 'none':
+            template = None
+        if not apply_alias(name, template):
+            return f"❌ No alias named {name}"
+        forwarded = _forward_to_gateway('config_alias', lambda e: e, name=name, template=template)
+        if isinstance(forwarded, GatewayError):
+            return f"⚠️ Alias **{name}** changed here, but the RCON gateway did not apply it: {forwarded}"
+        return f"✅ Removed alias **{name}**" if template is None else f"✅ Alias **{name}** → `{template}`"
+    
+    elif subcommand == 'timeouts':
+        server_id = parts[2] if len(parts) > 2 else None
+        rows = get_timeout_table(server_id)
+        if not rows:
+            return f"⏱️ No latency history yet. Commands use the default timeout of {CONFIG.get('rcon_timeout', 30)}s."
+        lines = [f"• `{row['server_id']}` **{row['command']}**: p50 {row['p50_ms']}ms, p99 {row['p99_ms']}ms, "
+                 f"timeout {row['timeout']}s ({row['samples']} samples)" for row in rows]
+        enabled = "on" if CONFIG.get('adaptive_timeouts', True) else "off"
+        return f"⏱️ **Learned Timeouts** (adaptive timeouts {enabled}):\n\n" + "\n".join(lines)
+    
     else:
         return f"❌ Unknown config command: {subcommand}"
 
+def apply_config_value(key, value):
+    """Set a CONFIG key in this process and refresh what is derived from it"""
+    CONFIG[key] = value
+    if key in ALIAS_FLAGS:
+        rebuild_alias_table()
+    # Verdicts may depend on any flag (e.g. enable_dangerous_commands)
+    get_command_policy().clear_cache()
+
+def apply_alias(name, template):
+    """Set an alias in this process, or remove it when template is None
+    
+    Returns:
+        False if there was no alias to remove
+    """
+    if template is None:
+        if ALIASES.pop(name, None) is None:
+            return False
+    else:
+        ALIASES[name] = template
+    rebuild_alias_table()
+    return True
+
 def convert_to_essentials_command(command, source="Web Service"):
     """Convert standard commands to Essentials format if needed"""
     if not CONFIG.get('enable_essentials_shortcuts', True):
@@ -245,51 +728,178 @@ def get_command_description(command):
     base_command = command.split()[0].lower() if command else ""
     return COMMAND_DESCRIPTIONS.get(base_command, "No description available")
 
+def _get_suggestion_index():
+    global _suggestion_index
+    names = alias_names()
+    built_from, index = _suggestion_index
+    if built_from is not names:
+        index = SuggestionIndex(list(names) + list(COMMAND_DESCRIPTIONS) + VANILLA_COMMANDS)
+        _suggestion_index = (names, index)
+    return index
+
+def _fetch_server_commands(server_id):
+    """Load a server's command list from `help`, once per server_commands_ttl"""
+    index, valid_for = None, 60
+    try:
+        output = execute_rcon_command(server_id, 'minecraft:help', 'Command Suggestions')
+        names = {normalize_command(name) for name in _HELP_COMMAND.findall(output)}
+        if not output.startswith("❌") and names:
+            index, valid_for = SuggestionIndex(names), CONFIG.get('server_commands_ttl', 3600)
+            logger.info(f"Loaded {len(index)} commands for suggestions on {server_id}")
+    except Exception as e:
+        logger.error(f"Error loading commands for {server_id}: {e}")
+    finally:
+        with _server_commands_lock:
+            _server_command_indexes[server_id] = (index, time.monotonic(), valid_for)
+            _server_command_fetches.discard(server_id)
+
+def get_server_command_index(server_id):
+    """The server's own commands, or None until they have been fetched in the background"""
+    with _server_commands_lock:
+        index, fetched_at, valid_for = _server_command_indexes.get(server_id, (None, None, 0))
+        stale = fetched_at is None or time.monotonic() - fetched_at > valid_for
+        if stale and server_id not in _server_command_fetches:
+            _server_command_fetches.add(server_id)
+            threading.Thread(target=_fetch_server_commands, args=(server_id,),
+                             name='server-commands', daemon=True).start()
+    return index
+
+def suggest_commands(server_id, command, processed_command):
+    """Close matches for an unknown base command, or None if it is known or may be valid"""
+    if not CONFIG.get('enable_auto_suggest', True) or not processed_command.strip():
+        return None
+    base = normalize_command(command.split()[0])
+    if ':' in base or lookup_alias(base) is not None:
+        return None
+    processed_base = normalize_command(processed_command.split()[0])
+    index = _get_suggestion_index()
+    if processed_base in index:
+        return None
+    # Without the server's own list an unknown command may still be a plugin's
+    server_index = get_server_command_index(server_id)
+    if server_index is None or processed_base in server_index:
+        return None
+    
+    limit = CONFIG.get('max_suggestions', 3)
+    ranked = sorted(set(index.closest(base, limit)) | set(server_index.closest(base, limit)))
+    return [name for _, name in ranked[:limit]] or None
+
+def format_suggestions(command, suggestions):
+    base = command.split()[0]
+    return f"❓ Unknown command `{base}`. Did you mean {' or '.join(f'`{name}`' for name in suggestions)}?"
+
+def _forget_server_state(event, server_id):
+    """Drop results and command lists that may describe a server's old settings"""
+    get_result_cache().invalidate_server(server_id)
+    get_position_cache().invalidate_server(server_id)
+    with _server_commands_lock:
+        _server_command_indexes.pop(server_id, None)
+
+# Takes effect once the app or gateway starts server discovery
+add_discovery_listener(_forget_server_state)
+
 def validate_command_safety(command, user_name):
     """Validate command safety and permissions"""
-    dangerous_commands = ['stop', 'restart', '/stop', '/restart', 'kill']
-    
-    if not CONFIG.get('enable_dangerous_commands', False):
-        for dangerous in dangerous_commands:
-            if dangerous in command.lower():
-                from utils.security import is_admin_user
-                if not is_admin_user(user_name):
-                    return False, f"❌ Dangerous command '{dangerous}' is restricted to admin users."
-    
     if len(command) > CONFIG.get('max_command_length', 500):
         return False, f"❌ Command too long (max {CONFIG.get('max_command_length', 500)} characters)."
     
-    return True, None
+    from utils.security import is_admin_user
+    role = ROLE_ADMIN if is_admin_user(user_name) else ROLE_USER
+    return get_command_policy().check(command, role)
 
 def parse_coordinates(coordinates_output):
-    """Parse coordinates from player data query output"""
+    """Parse block coordinates from player data query output
+    
+    Accepts the NBT list printed by `data get entity <player> Pos`
+    ("Steve has the following entity data: [-1.5d, 64.0d, 2.0d]", exponents
+    included) and plain "x y z" / "x, y, z" output. Coordinates are floored to
+    the block the player is in.
+    """
     try:
-        # Look for coordinate patterns like "Pos: [-123.45, 64.0, 789.12]"
-        pos_match = re.search(r'Pos:\s*\[([^]]+)\]', coordinates_output)
-        if pos_match:
-            coords_str = pos_match.group(1)
-            coords = [float(x.strip().rstrip('d')) for x in coords_str.split(',')]
-            if len(coords) >= 3:
-                # Convert to integers (whole block coordinates)
-                x = int(coords[0])
-                y = int(coords[1])
-                z = int(coords[2])
-                return x, y, z, None
-        
-        # Alternative pattern for different output formats
-        xyz_match = re.search(r'(-?\d+\.?\d*),?\s+(-?\d+\.?\d*),?\s+(-?\d+\.?\d*)', coordinates_output)
-        if xyz_match:
-            x = int(float(xyz_match.group(1)))
-            y = int(float(xyz_match.group(2)))
-            z = int(float(xyz_match.group(3)))
+        match = NBT_POSITION.search(coordinates_output) or _PLAIN_POSITION.search(coordinates_output)
+        if match:
+            x, y, z = (math.floor(float(value)) for value in match.groups())
             return x, y, z, None
-            
         return None, None, None, "Could not parse coordinates from output"
-        
-    except Exception as e:
+    except (ValueError, OverflowError) as e:
         return None, None, None, f"Error parsing coordinates: {str(e)}"
 
-def execute_coordinate_command(server_id, player_name, command_template, source="Web Service"):
+_PLAIN_POSITION = re.compile(r'(-?\d+(?:\.\d+)?),?\s+(-?\d+(?:\.\d+)?),?\s+(-?\d+(?:\.\d+)?)')
+_COORDINATE_PLACEHOLDER = re.compile(r'\{(x|y|z|player)\}')
+
+def _position_command(player_name):
+    return f"data get entity {player_name} Pos"
+
+def get_player_positions(server_id, player_names, source="Web Service", user_name=None):
+    """Current block coordinates of several players, fetched in one pipelined batch
+    
+    Positions younger than CONFIG['position_cache_ttl'] are reused.
+    
+    Returns:
+        Dict of player -> (x, y, z, error)
+    """
+    ttl = CONFIG.get('position_cache_ttl', 0.5)
+    cache = get_position_cache()
+    outputs = {}
+    missing = []
+    for player_name in player_names:
+        cached = cache.get(server_id, _position_command(player_name)) if ttl > 0 else None
+        if cached is not None:
+            outputs[player_name] = cached[0]
+        else:
+            missing.append(player_name)
+    
+    if missing:
+        logger.info(f"Getting coordinates for {', '.join(missing)} on {server_id}")
+        generation = cache.generation(server_id)
+        results = execute_rcon_batch(server_id, [_position_command(p) for p in missing], source, user_name)
+        for player_name, result in zip(missing, results):
+            outputs[player_name] = result
+    
+    fetched = set(missing)
+    positions = {}
+    for player_name in player_names:
+        output = outputs[player_name]
+        if output.startswith("❌"):
+            positions[player_name] = (None, None, None, output)
+            continue
+        x, y, z, error = parse_coordinates(output)
+        if error:
+            positions[player_name] = (None, None, None, f"❌ {error}. Raw output: {output}")
+            continue
+        positions[player_name] = (x, y, z, None)
+        if ttl > 0 and player_name in fetched:
+            cache.put(server_id, _position_command(player_name), output, ttl, generation)
+    return positions
+
+def fill_coordinate_template(command_template, player_name, x, y, z):
+    """Fill {x}, {y}, {z} and {player}, leaving any other braces (e.g. NBT) alone"""
+    values = {'x': str(x), 'y': str(y), 'z': str(z), 'player': player_name}
+    return _COORDINATE_PLACEHOLDER.sub(lambda match: values[match.group(1)], command_template)
+
+def resolve_players(server_id, players, source="Web Service", user_name=None):
+    """Player names from a comma-separated list or @a (everyone online)
+    
+    Returns:
+        Tuple of (player names, error message)
+    """
+    if players.lower() == '@a':
+        result, _ = execute_cached_rcon_command(server_id, 'list', source, user_name)
+        parsed = parse_output('list', result)
+        if parsed is None:
+            return None, result if result.startswith("❌") else "❌ Could not read the list of online players"
+        if not parsed['players']:
+            return None, "❌ No players are online"
+        return parsed['players'], None
+    if players.startswith('@'):
+        return None, "❌ Only @a or player names are supported here"
+    
+    player_names = list(dict.fromkeys(name for name in players.split(',') if name))
+    if not player_names:
+        return None, "❌ No player names given"
+    return player_names, None
+
+def execute_coordinate_command(server_id, player_name, command_template, source="Web Service", user_name=None):
     """Execute a command using a player's current coordinates
     
     Args:
@@ -297,35 +907,65 @@ def execute_coordinate_command(server_id, player_name, command_template, source=
         player_name: The player whose coordinates to get
         command_template: Command template with {x}, {y}, {z} placeholders
         source: Command source for logging
+        user_name: Requesting user, used for scheduling priority
         
     Returns:
         Command execution result
     """
+    return execute_coordinate_commands(server_id, [player_name], command_template, source, user_name)
+
+def execute_coordinate_commands(server_id, player_names, command_template, source="Web Service", user_name=None):
+    """Execute a command at each of several players' current coordinates
+    
+    All positions are fetched in one pipelined batch, then every resulting
+    command is run as a second batch. Each command is safety-checked for the
+    requesting user first.
+    
+    Returns:
+        Formatted results, one entry per player
+    """
+    max_players = CONFIG.get('max_batch_commands', 200)
+    if len(player_names) > max_players:
+        return f"❌ Too many players (max {max_players} per coordinate command)"
+    
     try:
-        # First, get the player's coordinates
-        coord_command = f"data get entity {player_name} Pos"
-        logger.info(f"Getting coordinates for {player_name} on {server_id}")
-        
-        coord_result = execute_rcon_command(server_id, coord_command, source)
-        
-        if coord_result.startswith("❌"):
-            return coord_result
-        
-        # Parse the coordinates
-        x, y, z, error = parse_coordinates(coord_result)
-        if error:
-            return f"❌ {error}. Raw output: {coord_result}"
+        positions = get_player_positions(server_id, player_names, source, user_name)
         
-        # Format the command template with coordinates
-        final_command = command_template.format(x=x, y=y, z=z, player=player_name)
+        planned = []
+        errors = {}
+        for player_name in player_names:
+            x, y, z, error = positions[player_name]
+            if error:
+                errors[player_name] = error
+                continue
+            final_command = fill_coordinate_template(command_template, player_name, x, y, z)
+            is_safe, safety_error = validate_command_safety(final_command, user_name)
+            if not is_safe:
+                errors[player_name] = safety_error
+                continue
+            planned.append((player_name, final_command))
         
-        logger.info(f"Executing coordinate-based command: {final_command}")
+        logger.info(f"Executing {len(planned)} coordinate-based commands on {server_id}: {command_template}")
+        results = execute_rcon_batch(server_id, [command for _, command in planned], source, user_name) if planned else []
+        outcomes = {player_name: (command, result) for (player_name, command), result in zip(planned, results)}
         
-        # Execute the final command
-        result = execute_rcon_command(server_id, final_command, source)
+        if len(player_names) == 1:
+            player_name = player_names[0]
+            if player_name in errors:
+                return errors[player_name]
+            x, y, z, _ = positions[player_name]
+            final_command, result = outcomes[player_name]
+            return f"🎯 **Coordinates for {player_name}**: {x}, {y}, {z}\n📝 **Command**: `{final_command}`\n📤 **Result**:\n{result}"
         
-        # Return both coordinate info and command result
-        return f"🎯 **Coordinates for {player_name}**: {x}, {y}, {z}\n📝 **Command**: `{final_command}`\n📤 **Result**:\n{result}"
+        lines = [f"🎯 **Coordinate command for {len(player_names)} players**: `{command_template}`"]
+        for player_name in player_names:
+            if player_name in errors:
+                lines.append(f"• **{player_name}**: {errors[player_name]}")
+                continue
+            x, y, z, _ = positions[player_name]
+            final_command, result = outcomes[player_name]
+            lines.append(f"• **{player_name}** ({x}, {y}, {z}) `{final_command}`: {result or '✅'}")
+        return "\n".join(lines)
         
     except Exception as e:
         logger.error(f"Error in coordinate command execution: {str(e)}")
@@ -334,15 +974,18 @@ def execute_coordinate_command(server_id, player_name, command_template, source=
 def process_coordinate_alias(command, user_name="unknown"):
     """Process coordinate-based command aliases
     
-    Expected format: coordcmd <player> <server_id> <command_template>
-    Example: coordcmd Steve survival setblock {x} {y} {z} minecraft:oak_hanging_sign
+    Expected format: coordcmd <players> <server_id> <command_template>
+    where players is a name, a comma-separated list of names or @a
+    Example: coordcmd Steve,Alex survival setblock {x} {y} {z} minecraft:oak_hanging_sign
     """
     parts = command.strip().split()
     
     if len(parts) < 4:
         return None, """❌ **Coordinate Command Usage:**
         
-`coordcmd <player> <server_id> <command_template>`
+`coordcmd <players> <server_id> <command_template>`
+
+`<players>` is a player name, several names separated by commas, or `@a` for everyone online.
 
 **Available placeholders in command_template:**
 • `{x}` - Player's X coordinate (integer)
@@ -354,19 +997,99 @@ def process_coordinate_alias(command, user_name="unknown"):
 • `coordcmd Steve survival setblock {x} {y} {z} minecraft:oak_hanging_sign`
 • `coordcmd Alice creative fill {x} {y} {z} {x} {y} {z} minecraft:diamond_block`
 • `coordcmd Bob skyblock tp {player} {x} {y} {z}`
-• `coordcmd Steve survival summon minecraft:villager {x} {y} {z}`
+• `coordcmd Steve,Alex,Bob survival summon minecraft:villager {x} {y} {z}`
+• `coordcmd @a survival particle minecraft:heart {x} {y} {z}`
 
-**Note:** Coordinates are automatically converted to integers (whole blocks)."""
+**Note:** Coordinates are converted to whole blocks. All positions are read in one round, then all commands are sent as one batch."""
     
-    player_name = parts[1]
     server_id = parts[2]
     command_template = ' '.join(parts[3:])
     
     # Validate server exists
     if server_id not in SERVERS:
-        available_servers = ', '.join(SERVERS.keys())
+        available_servers = ', '.join(list(SERVERS))
         return None, f"❌ Invalid server ID: {server_id}. Available servers: {available_servers}"
     
+    source = f"Slack User: {user_name}"
+    player_names, error = resolve_players(server_id, parts[1], source, user_name)
+    if error:
+        return None, error
+    
     # Execute the coordinate command
-    result = execute_coordinate_command(server_id, player_name, command_template, f"Slack User: {user_name}")
+    result = execute_coordinate_commands(server_id, player_names, command_template, source, user_name)
     return result, None
+
+BULK_USAGE = """❌ **Bulk Command Usage:**
+
+`bulk <command> <players> [arguments]`
+
+`<players>` is a comma-separated list of names (`Steve,` for one) or `@a`. The command
+is expanded once per player as `<command> <player> [arguments]`, through aliases and shortcuts.
+
+**Examples:**
+• `bulk whitelist add Steve,Alex,Notch`
+• `bulk addgroup Steve,Alex builder`
+• `bulk kick @a Server restarting`"""
+
+FANOUT_COORDINATE_ERROR = "❌ Coordinate commands can't be run on several servers at once; run them on one server."
+
+def is_coordinate_command(command):
+    """Whether a command is coordcmd or a shortcut for it (these run while being processed)"""
+    base_command = command.split()[0].lower() if command.strip() else ''
+    alias = lookup_alias(base_command)
+    return base_command == 'coordcmd' or (alias is not None and alias.template.startswith('coordcmd'))
+
+def parse_bulk_arguments(text):
+    """Split `<command> <players> [arguments]`; players is the first token with a comma, or @a
+    
+    Returns:
+        Tuple of (command, players, extra arguments), or None if there is no player list
+    """
+    parts = text.split()
+    for index, token in enumerate(parts):
+        if index > 0 and (',' in token or token.lower() == '@a'):
+            return ' '.join(parts[:index]), token, parts[index + 1:]
+    return None
+
+def expand_bulk_command(command, player_names, extra_args, user_name=None):
+    """Expand a command over players and safety-check every result before anything runs
+    
+    Returns:
+        Tuple of (list of (player, processed command), error message)
+    """
+    if is_coordinate_command(command):
+        return None, "❌ Coordinate commands can't be run in bulk; coordcmd already takes several players."
+    
+    max_players = CONFIG.get('max_bulk_players', 1000)
+    if len(player_names) > max_players:
+        return None, f"❌ Too many players (max {max_players} per bulk command)"
+    
+    expanded = []
+    for player_name in player_names:
+        processed_command, error = process_command_alias(' '.join([command, player_name] + extra_args), user_name)
+        if error:
+            return None, f"❌ {player_name}: {error}"
+        is_safe, safety_error = validate_command_safety(processed_command, user_name)
+        if not is_safe:
+            return None, safety_error
+        expanded.append((player_name, processed_command))
+    return expanded, None
+
+def execute_bulk_commands(server_id, commands, source="Web Service", user_name=None, on_progress=None):
+    """Execute many commands on one server as pipelined chunks
+    
+    Chunks of CONFIG['bulk_chunk_size'] commands each go down one connection;
+    between chunks other commands for the server get their turn, and
+    on_progress(done, total) is called.
+    
+    Returns:
+        List of result strings in the same order as commands
+    """
+    chunk_size = max(1, CONFIG.get('bulk_chunk_size', 50))
+    logger.info(f"Executing {len(commands)} bulk commands on {server_id} in chunks of {chunk_size} [Source: {source}]")
+    results = []
+    for start in range(0, len(commands), chunk_size):
+        results.extend(execute_rcon_batch(server_id, commands[start:start + chunk_size], source, user_name))
+        if on_progress is not None:
+            on_progress(len(results), len(commands))
+    return results
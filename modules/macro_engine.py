@@ -0,0 +1,438 @@
+"""
+Stored command macros
+
+A macro is a named script of steps separated by ';', with optional parameters:
+
+    warn(minutes): say Restart in {minutes} minutes; wait 30; say 30 seconds left
+
+Steps:
+    <command>                           run a command (aliases and shortcuts apply)
+    wait <seconds>                      pause the macro
+    set <var> = <command>               run a command and keep its result: {var} is the
+                                        text, {var.<field>} a field from utils/output_parsers
+    if <value> <op> <value> then <step> ops: == != > < >= <= contains
+    for <var> in <list> do <step>       list: names separated by commas, {var.players} or @a
+
+Every command is expanded and safety-checked for the defining user when the
+macro is saved, and again with its real values for the user running it.
+Consecutive commands, including all iterations of a loop, are pipelined down
+one RCON connection; only `set` and `wait` wait for what came before.
+
+``run_macro_later`` runs a macro in the background without holding a thread
+through its waits: each stretch between waits is handed to an executor and
+the next one is scheduled with a timer.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Generator, List, Optional, Tuple
+
+from config.settings import CONFIG, MACROS_FILE
+from modules.command_processor import (execute_rcon_command, execute_rcon_batch, execute_cached_rcon_command,
+                                       process_command_alias, validate_command_safety, is_coordinate_command)
+from utils.output_parsers import parse_output
+
+logger = logging.getLogger(__name__)
+
+# Command results listed when reporting a macro run
+MACRO_RESULTS_SHOWN = 30
+
+MACRO_USAGE = """🧩 **Macro Commands:**
+
+• `macro define <name>[(param1,param2)] <step>; <step>; ...` - Save a macro
+• `macro run <name> [arguments]` - Run a macro on your server
+• `macro list` - List saved macros
+• `macro show <name>` - Show a macro's script
+• `macro delete <name>` - Delete a macro (owner or admin)
+
+**Steps:**
+• `<command>` - Run a command; `{param}` and `{var}` are filled in
+• `wait <seconds>` - Pause
+• `set <var> = <command>` - Keep a result: `{var}` is the text, `{var.online}`, `{var.players}` ... parsed fields
+• `if <value> <op> <value> then <step>` - Ops: `==` `!=` `>` `<` `>=` `<=` `contains`
+• `for <var> in <a,b,c | {var.players} | @a> do <step>` - Repeat a step
+
+**Example:**
+`macro define warn(minutes) say Restart in {minutes} minutes; wait 30; set p = list; for pl in {p.players} do msg {pl} Please log off`"""
+
+_NAME = re.compile(r'[a-z][a-z0-9_-]{0,31}\Z')
+_DEFINITION = re.compile(r'([A-Za-z][\w-]*)(?:\(([^)]*)\))?:?\s+(.+)\Z', re.DOTALL)
+_VARIABLE = re.compile(r'\{(\w+)(?:\.(\w+))?\}')
+_WAIT = re.compile(r'wait\s+(\d+(?:\.\d+)?)\Z', re.IGNORECASE)
+_SET = re.compile(r'set\s+(\w+)\s*=\s*(.+)\Z', re.IGNORECASE | re.DOTALL)
+_IF = re.compile(r'if\s+(.+?)\s+(==|!=|>=|<=|>|<|contains)\s+(.+?)\s+then\s+(.+)\Z', re.IGNORECASE | re.DOTALL)
+_FOR = re.compile(r'for\s+(\w+)\s+in\s+(\S+)\s+do\s+(.+)\Z', re.IGNORECASE | re.DOTALL)
+
+
+class MacroError(Exception):
+    """A macro could not be defined or run"""
+
+
+def parse_step(text: str) -> Tuple:
+    """One step as a tuple: ('command', text), ('wait', seconds), ('set', var, command),
+    ('if', left, op, right, step) or ('for', var, items, step)"""
+    text = text.strip()
+    match = _WAIT.match(text)
+    if match:
+        return ('wait', float(match.group(1)))
+    match = _SET.match(text)
+    if match:
+        return ('set', match.group(1), match.group(2).strip())
+    match = _IF.match(text)
+    if match:
+        left, op, right, body = match.groups()
+        return ('if', left, op.lower(), right, parse_step(body))
+    match = _FOR.match(text)
+    if match:
+        var, items, body = match.groups()
+        return ('for', var, items, parse_step(body))
+    return ('command', text)
+
+
+def parse_script(script: str) -> List[Tuple]:
+    steps = [parse_step(part) for part in script.split(';') if part.strip()]
+    if not steps:
+        raise MacroError("A macro needs at least one step")
+    max_steps = CONFIG.get('max_macro_steps', 50)
+    if len(steps) > max_steps:
+        raise MacroError(f"Too many steps (max {max_steps})")
+    return steps
+
+
+def _check_references(text: str, known: set):
+    for name, _ in _VARIABLE.findall(text):
+        if name not in known:
+            raise MacroError(f"Unknown variable {{{name}}} in `{text}`")
+
+
+def _check_command(command: str, known: set, user_name: str):
+    _check_references(command, known)
+    if _VARIABLE.match(command.split()[0]):
+        raise MacroError(f"The command name can't be a variable: `{command}`")
+    if is_coordinate_command(command):
+        raise MacroError(f"Coordinate commands can't be used in macros: `{command}`")
+    # Check the shape of the command with stand-in values; the real ones are checked at run time
+    processed_command, error = process_command_alias(_VARIABLE.sub('x', command), user_name)
+    if error:
+        raise MacroError(f"`{command}`: {error}")
+    is_safe, safety_error = validate_command_safety(processed_command, user_name)
+    if not is_safe:
+        raise MacroError(f"`{command}`: {safety_error}")
+
+
+def _check_step(step: Tuple, known: set, user_name: str):
+    kind = step[0]
+    if kind == 'command':
+        _check_command(step[1], known, user_name)
+    elif kind == 'wait':
+        if step[1] > CONFIG.get('max_macro_wait', 600):
+            raise MacroError(f"wait {step[1]:g} is longer than the {CONFIG.get('max_macro_wait', 600)}s limit")
+    elif kind == 'set':
+        _check_command(step[2], known, user_name)
+        known.add(step[1])
+    elif kind == 'if':
+        _check_references(step[1], known)
+        _check_references(step[3], known)
+        _check_step(step[4], known, user_name)
+    elif kind == 'for':
+        _check_references(step[2], known)
+        _check_step(step[3], known | {step[1]}, user_name)
+
+
+def has_waits(steps: List[Tuple]) -> bool:
+    """Whether running the steps can pause, i.e. may outlast a request"""
+    for step in steps:
+        if step[0] == 'wait' or (step[0] in ('if', 'for') and has_waits([step[-1]])):
+            return True
+    return False
+
+
+class MacroStore:
+    """Macros persisted to a JSON file shared by every worker"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error loading macros: {e}")
+            return {}
+
+    def _save(self, data: Dict[str, Dict]):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def get(self, name: str) -> Optional[Dict]:
+        return self._load().get(name)
+
+    def all(self) -> Dict[str, Dict]:
+        return self._load()
+
+    def put(self, macro: Dict):
+        with self._locked():
+            data = self._load()
+            data[macro['name']] = macro
+            self._save(data)
+
+    def delete(self, name: str) -> bool:
+        with self._locked():
+            data = self._load()
+            if data.pop(name, None) is None:
+                return False
+            self._save(data)
+            return True
+
+
+_store = MacroStore(MACROS_FILE)
+
+
+def get_macro_store() -> MacroStore:
+    return _store
+
+
+def define_macro(definition: str, user_name: str) -> Dict:
+    """Parse, check and save `<name>[(params)] <steps>`; raises MacroError"""
+    match = _DEFINITION.match(definition.strip())
+    if not match:
+        raise MacroError("Usage: `macro define <name>[(param1,param2)] <step>; <step>; ...`")
+    name, params, script = match.group(1).lower(), match.group(2), match.group(3).strip()
+    if not _NAME.match(name):
+        raise MacroError("Macro names are up to 32 letters, digits, '-' or '_', starting with a letter")
+    params = [param.strip() for param in (params or '').split(',') if param.strip()]
+    if any(not re.fullmatch(r'\w+', param) for param in params):
+        raise MacroError("Parameter names may only contain letters, digits and '_'")
+
+    existing = _store.get(name)
+    if existing and existing['owner'] != user_name:
+        from utils.security import is_admin_user
+        if not is_admin_user(user_name):
+            raise MacroError(f"Macro {name} belongs to {existing['owner']}")
+
+    steps = parse_script(script)
+    known = set(params)
+    for step in steps:
+        _check_step(step, known, user_name)
+
+    macro = {'name': name, 'params': params, 'script': script, 'owner': user_name, 'updated_at': time.time()}
+    _store.put(macro)
+    logger.info(f"Macro {name} defined by {user_name}: {script}")
+    return macro
+
+
+def delete_macro(name: str, user_name: str) -> bool:
+    """Delete a macro; only its owner or an admin may. Raises MacroError"""
+    macro = _store.get(name)
+    if macro is None:
+        return False
+    if macro['owner'] != user_name:
+        from utils.security import is_admin_user
+        if not is_admin_user(user_name):
+            raise MacroError(f"Macro {name} belongs to {macro['owner']}")
+    return _store.delete(name)
+
+
+def _compare(left: str, op: str, right: str) -> bool:
+    if op == 'contains':
+        return right.lower() in left.lower()
+    try:
+        left_value, right_value = float(left), float(right)
+    except ValueError:
+        left_value, right_value = left, right
+    if op == '==':
+        return left_value == right_value
+    if op == '!=':
+        return left_value != right_value
+    try:
+        return {'>': left_value > right_value, '<': left_value < right_value,
+                '>=': left_value >= right_value, '<=': left_value <= right_value}[op]
+    except TypeError:
+        raise MacroError(f"Can't compare `{left}` {op} `{right}`")
+
+
+class MacroRun:
+    """State of one macro execution on one server"""
+
+    def __init__(self, server_id: str, user_name: str, source: str, variables: Dict):
+        self.server_id = server_id
+        self.user_name = user_name
+        self.source = source
+        self.variables = variables
+        self.pending: List[str] = []
+        self.results: List[Tuple[str, str]] = []
+        self.commands = 0
+        self.deadline = time.monotonic() + CONFIG.get('max_macro_wait', 600)
+
+    def substitute(self, text: str) -> str:
+        def value(match):
+            name, field = match.groups()
+            if name not in self.variables:
+                raise MacroError(f"Unknown variable {{{name}}}")
+            current = self.variables[name]
+            if isinstance(current, dict):
+                current = current.get(field or 'output')
+                if current is None:
+                    raise MacroError(f"{{{name}}} has no field {field}")
+            elif field:
+                raise MacroError(f"{{{name}}} has no field {field}")
+            return ','.join(map(str, current)) if isinstance(current, list) else str(current)
+        return _VARIABLE.sub(value, text)
+
+    def _prepare(self, command: str) -> str:
+        command = self.substitute(command)
+        processed_command, error = process_command_alias(command, self.user_name)
+        if error:
+            raise MacroError(f"`{command}`: {error}")
+        is_safe, safety_error = validate_command_safety(processed_command, self.user_name)
+        if not is_safe:
+            raise MacroError(safety_error)
+        self.commands += 1
+        max_commands = CONFIG.get('max_macro_commands', 500)
+        if self.commands > max_commands:
+            raise MacroError(f"Macro ran more than {max_commands} commands")
+        return processed_command
+
+    def flush(self):
+        """Send the queued commands as one pipelined batch"""
+        if self.pending:
+            commands, self.pending = self.pending, []
+            self.results.extend(zip(commands, execute_rcon_batch(self.server_id, commands, self.source, self.user_name)))
+
+    def _items(self, source: str) -> List[str]:
+        source = self.substitute(source)
+        if source.lower() != '@a':
+            return [item for item in source.split(',') if item]
+        result, _ = execute_cached_rcon_command(self.server_id, 'list', self.source, self.user_name)
+        parsed = parse_output('list', result)
+        if parsed is None:
+            raise MacroError(f"Could not read the list of online players: {result}")
+        return parsed['players']
+
+    def run_step(self, step: Tuple) -> Generator[float, None, None]:
+        """Run one step, yielding the seconds to pause at each wait"""
+        kind = step[0]
+        if kind == 'command':
+            self.pending.append(self._prepare(step[1]))
+        elif kind == 'wait':
+            self.flush()
+            yield max(0.0, min(step[1], self.deadline - time.monotonic()))
+        elif kind == 'set':
+            self.flush()
+            command = self._prepare(step[2])
+            result = execute_rcon_command(self.server_id, command, self.source, self.user_name)
+            self.results.append((command, result))
+            if result.startswith("❌"):
+                raise MacroError(f"`{command}` failed")
+            self.variables[step[1]] = dict(parse_output(command, result) or {}, output=result)
+        elif kind == 'if':
+            if _compare(self.substitute(step[1]), step[2], self.substitute(step[3])):
+                yield from self.run_step(step[4])
+        elif kind == 'for':
+            for item in self._items(step[2]):
+                self.variables[step[1]] = item
+                yield from self.run_step(step[3])
+
+
+MacroOutcome = Tuple[List[Tuple[str, str]], Optional[str]]
+
+
+def run_macro(server_id: str, name: str, args: List[str], user_name: str,
+              source: str = "Web Service") -> MacroOutcome:
+    """Run a stored macro; returns the (command, result) pairs run and an error, if it stopped early
+
+    Waits block the calling thread; see run_macro_later for background runs.
+    """
+    steps = _macro_steps(server_id, name, args, user_name, source)
+    while True:
+        try:
+            delay = next(steps)
+        except StopIteration as done:
+            return done.value
+        time.sleep(delay)
+
+
+def run_macro_later(server_id: str, name: str, args: List[str], user_name: str, source: str,
+                    submit: Callable[[Callable[[], None]], object], on_done: Callable[[MacroOutcome], None]):
+    """Run a stored macro in the background and pass its outcome to on_done
+
+    The commands run through submit (e.g. an executor's submit); a wait
+    schedules the rest of the macro with a timer instead of holding a worker.
+    """
+    steps = _macro_steps(server_id, name, args, user_name, source)
+
+    def advance():
+        try:
+            delay = next(steps)
+        except StopIteration as done:
+            on_done(done.value)
+            return
+        except Exception as e:
+            logger.error(f"Error running macro {name}: {e}")
+            on_done(([], str(e)))
+            return
+        timer = threading.Timer(delay, submit, (advance,))
+        timer.daemon = True
+        timer.start()
+
+    submit(advance)
+
+
+def _macro_steps(server_id: str, name: str, args: List[str], user_name: str,
+                 source: str) -> Generator[float, None, MacroOutcome]:
+    """Run a stored macro, yielding the seconds to pause at each wait; returns its outcome"""
+    macro = _store.get(name)
+    if macro is None:
+        return [], f"No macro named {name}"
+    params = macro['params']
+    if len(args) < len(params):
+        return [], f"Missing argument for {{{params[len(args)]}}} (usage: macro run {name} {' '.join(params)})"
+    # The last parameter takes the rest of the arguments, e.g. a message
+    values = args[:len(params)]
+    if params and len(args) > len(params):
+        values[-1] = ' '.join(args[len(params) - 1:])
+
+    run = MacroRun(server_id, user_name, source, dict(zip(params, values)))
+    logger.info(f"Running macro {name} on {server_id} [Source: {source}]")
+    try:
+        for step in parse_script(macro['script']):
+            yield from run.run_step(step)
+        run.flush()
+    except MacroError as e:
+        run.flush()
+        return run.results, str(e)
+    return run.results, None
+
+
+def format_macro_results(name: str, server_name: str, results: List[Tuple[str, str]], error: Optional[str]) -> str:
+    succeeded = sum(1 for _, result in results if not result.startswith("❌"))
+    text = f"*🧩 Macro `{name}`* on *{server_name}*: {succeeded}/{len(results)} commands succeeded"
+    for command, result in results[:MACRO_RESULTS_SHOWN]:
+        status_emoji = "❌" if result.startswith("❌") else "✅"
+        text += f"\n{status_emoji} `{command}`" + (f" - {result}" if result else "")
+    if len(results) > MACRO_RESULTS_SHOWN:
+        text += f"\n…and {len(results) - MACRO_RESULTS_SHOWN} more"
+    if error:
+        text += f"\n❌ Stopped: {error}"
+    return text
@@ -10,6 +10,8 @@ from flask import jsonify
 import logging
 import sys; sys.path.append("/root/rcon-web-service"); from utils.pufferpanel_integration import list_servers, get_server_info, control_server, get_server_logs, backup_server
 from utils.context_manager import get_user_default_server, set_user_default_server
+from utils.slack_pages import paginate, paged_reply
+from config.settings import CONFIG
 
 logger = logging.getLogger(__name__)
 
@@ -155,7 +157,7 @@ def handle_server_control_command(user_name, text):
             'text': f'❌ Error controlling server: {str(e)}'
         })
 
-def handle_logs_command(user_name, text):
+def handle_logs_command(user_name, text, response_url=None):
     """Handle server logs command with default server support"""
     try:
         parts = text.split()
@@ -185,7 +187,7 @@ def handle_logs_command(user_name, text):
             # No default server set, need to choose
             return prompt_server_selection_for_control(user_name, text, 'view logs for')
         
-        lines = min(lines, 50)  # Limit to 50 lines max
+        lines = min(lines, CONFIG.get('max_log_lines', 500))
         
         # Check if server exists
         server_info = get_server_info(server_id)
@@ -203,17 +205,10 @@ def handle_logs_command(user_name, text):
                 'text': f'📜 No recent logs found for *{server_info["name"]}*'
             })
         
-        # Format logs for Slack
-        log_text = f"📜 *Recent logs for {server_info['name']}* (last {len(logs)} lines):\n\n```\n"
-        for log_line in logs:
-            if log_line.strip():
-                log_text += log_line + "\n"
-        log_text += "```"
-        
-        return jsonify({
-            'response_type': 'ephemeral',
-            'text': log_text
-        })
+        # Long logs are sent a page at a time
+        header = f"📜 *Recent logs for {server_info['name']}* (last {len(logs)} lines):\n"
+        paged = paginate(header, (log_line for log_line in logs if log_line.strip()), user_name, 'ephemeral')
+        return paged_reply(paged, response_url)
         
     except Exception as e:
         logger.error(f"Error in logs command: {e}")
@@ -2,48 +2,105 @@
 API routes for direct API access
 """
 import logging
+import time
 from flask import Blueprint, request, jsonify
 from utils.security import verify_api_token
 from utils.server_utils import get_server_info
-from modules.command_processor import (execute_rcon_command, process_command_alias, 
-                                     validate_command_safety)
-from config.settings import SERVERS
+from modules.command_processor import (execute_cached_rcon_command, execute_rcon_fanout, execute_rcon_batch,
+                                     process_command_alias, validate_command_safety,
+                                     get_rcon_stats, get_server_breaker_states,
+                                     resolve_players, expand_bulk_command, execute_bulk_commands,
+                                     suggest_commands, is_coordinate_command, FANOUT_COORDINATE_ERROR)
+from utils.deferred_queue import get_deferred_queue
+from utils.command_history import get_command_history, parse_history_time
+from utils.output_parsers import parse_output, OUTPUT_FORMATS
+from config.settings import SERVERS, CONFIG
 
 logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__)
 
+BATCH_COORDINATE_ERROR = "❌ Coordinate commands can't be run in a batch; send them on their own."
+
+def get_output_format(data):
+    """Requested output format from `?format=` or the body's `format` field"""
+    output_format = request.args.get('format') or (data or {}).get('format') or 'text'
+    return output_format if output_format in OUTPUT_FORMATS else None
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': __import__('time').time()})
+    breakers = {server_id: stats['state'] for server_id, stats in get_server_breaker_states().items()}
+    return jsonify({'status': 'healthy', 'timestamp': __import__('time').time(), 'servers': breakers})
 
 @api_bp.route('/servers', methods=['GET'])
 @verify_api_token
 def list_servers():
     """List all configured servers"""
     servers_info = []
-    for server_id in SERVERS.keys():
+    breakers = get_server_breaker_states()
+    for server_id in list(SERVERS):
         server_info = get_server_info(server_id)
         if server_info:
             # Don't include password in API response
             safe_info = {k: v for k, v in server_info.items() if k != 'password'}
+            safe_info['breaker'] = breakers.get(server_id)
             servers_info.append(safe_info)
     
     return jsonify({'servers': servers_info})
 
+@api_bp.route('/deferred', methods=['GET'])
+@verify_api_token
+def list_deferred_commands():
+    """List commands queued for servers that are offline"""
+    return jsonify({'deferred': get_deferred_queue().pending()})
+
+@api_bp.route('/history', methods=['GET'])
+@verify_api_token
+def list_command_history():
+    """Recorded commands, newest first, filtered by `user`, `server`, `command`, `since`, `until` and `limit`"""
+    try:
+        filters = {key: request.args[key] for key in ('user', 'server', 'command') if request.args.get(key)}
+        for key in ('since', 'until'):
+            if request.args.get(key):
+                filters[key] = parse_history_time(request.args[key])
+        filters['limit'] = min(int(request.args.get('limit', 50)), CONFIG.get('max_history_results', 200))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    entries = get_command_history().query(**filters)
+    return jsonify({'history': entries, 'count': len(entries)})
+
+@api_bp.route('/rcon/stats', methods=['GET'])
+@verify_api_token
+def rcon_stats():
+    """RCON engine, connection pool, scheduler, cache and breaker statistics"""
+    return jsonify(get_rcon_stats())
+
 @api_bp.route('/mc', methods=['POST'])
 @verify_api_token
 def execute_rcon():
-    """Execute RCON command via API"""
+    """Execute RCON command via API
+    
+    Send `server_id` for a single server, or `server_ids` (a list, or "all")
+    to run the command on several servers concurrently.
+    """
     data = request.get_json()
     
     if not data or 'command' not in data:
         return jsonify({'error': 'Missing command parameter'}), 400
     
+    output_format = get_output_format(data)
+    if output_format is None:
+        return jsonify({'error': f'format must be one of: {", ".join(OUTPUT_FORMATS)}'}), 400
+    
     server_id = data.get('server_id')
+    server_ids = data.get('server_ids')
     command = data.get('command')
     source = data.get('source', 'API')
     
+    if server_ids is not None:
+        return execute_rcon_fanout_request(server_ids, command, source, data.get('deadline'), output_format)
+    
     if not server_id:
         return jsonify({'error': 'Missing server_id parameter'}), 400
     
@@ -60,12 +117,198 @@ def execute_rcon():
     if not is_safe:
         return jsonify({'error': safety_error}), 403
     
+    suggestions = suggest_commands(server_id, command, processed_command)
+    if suggestions:
+        return jsonify({'error': f'Unknown command: {command.split()[0]}', 'suggestions': suggestions}), 400
+    
     # Execute command
-    result = execute_rcon_command(server_id, processed_command, f"API: {source}")
+    result, cache_age = execute_cached_rcon_command(server_id, processed_command, f"API: {source}",
+                                                    original_command=command)
     
-    return jsonify({
+    response = {
         'server_id': server_id,
         'original_command': command,
         'processed_command': processed_command,
-        'result': result
+        'result': result,
+        'cached': cache_age is not None,
+        'cache_age': None if cache_age is None else round(cache_age, 1)
+    }
+    if output_format == 'json':
+        response['parsed'] = parse_output(processed_command, result)
+    return jsonify(response)
+
+def execute_rcon_fanout_request(server_ids, command, source, deadline, output_format='text'):
+    """Run one command on several servers concurrently"""
+    if server_ids == 'all':
+        server_ids = list(SERVERS)
+    if not isinstance(server_ids, list) or not server_ids:
+        return jsonify({'error': 'server_ids must be a non-empty list or "all"'}), 400
+    
+    invalid = [s for s in server_ids if s not in SERVERS]
+    if invalid:
+        return jsonify({'error': f'Invalid server_ids: {", ".join(map(str, invalid))}'}), 400
+    
+    if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+        return jsonify({'error': 'deadline must be a positive number of seconds'}), 400
+    
+    # Processing a coordinate command runs it, so it must be turned away first
+    if is_coordinate_command(command):
+        return jsonify({'error': FANOUT_COORDINATE_ERROR}), 400
+    
+    processed_command, error = process_command_alias(command, "api_user")
+    if error:
+        return jsonify({'error': error}), 400
+    
+    is_safe, safety_error = validate_command_safety(processed_command, "api_user")
+    if not is_safe:
+        return jsonify({'error': safety_error}), 403
+    
+    started = time.monotonic()
+    results = execute_rcon_fanout(list(dict.fromkeys(server_ids)), processed_command, f"API: {source}", deadline)
+    if output_format == 'json':
+        for outcome in results.values():
+            outcome['parsed'] = parse_output(processed_command, outcome['result'])
+    
+    return jsonify({
+        'server_ids': list(results.keys()),
+        'original_command': command,
+        'processed_command': processed_command,
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'results': [dict(server_id=sid, **outcome) for sid, outcome in results.items()]
+    })
+
+@api_bp.route('/mc/batch', methods=['POST'])
+@verify_api_token
+def execute_rcon_batch_request():
+    """Execute an ordered list of RCON commands on one server
+    
+    Every command is alias-processed and safety-checked before any of them
+    runs; they are then pipelined down one RCON connection.
+    """
+    data = request.get_json()
+    
+    if not data or 'commands' not in data:
+        return jsonify({'error': 'Missing commands parameter'}), 400
+    
+    output_format = get_output_format(data)
+    if output_format is None:
+        return jsonify({'error': f'format must be one of: {", ".join(OUTPUT_FORMATS)}'}), 400
+    
+    server_id = data.get('server_id')
+    commands = data.get('commands')
+    source = data.get('source', 'API')
+    
+    if not server_id:
+        return jsonify({'error': 'Missing server_id parameter'}), 400
+    
+    if server_id not in SERVERS:
+        return jsonify({'error': f'Invalid server_id: {server_id}'}), 400
+    
+    if not isinstance(commands, list) or not commands or not all(isinstance(c, str) for c in commands):
+        return jsonify({'error': 'commands must be a non-empty list of strings'}), 400
+    
+    max_commands = CONFIG.get('max_batch_commands', 200)
+    if len(commands) > max_commands:
+        return jsonify({'error': f'Too many commands (max {max_commands} per batch)'}), 400
+    
+    for index, command in enumerate(commands):
+        if is_coordinate_command(command):
+            return jsonify({'error': BATCH_COORDINATE_ERROR, 'index': index, 'command': command}), 400
+    
+    processed_commands = []
+    for index, command in enumerate(commands):
+        processed_command, error = process_command_alias(command, "api_user")
+        if error:
+            return jsonify({'error': error, 'index': index, 'command': command}), 400
+        
+        is_safe, safety_error = validate_command_safety(processed_command, "api_user")
+        if not is_safe:
+            return jsonify({'error': safety_error, 'index': index, 'command': command}), 403
+        
+        processed_commands.append(processed_command)
+    
+    started = time.monotonic()
+    results = execute_rcon_batch(server_id, processed_commands, f"API: {source}")
+    
+    entries = []
+    for index, (original, processed, result) in enumerate(zip(commands, processed_commands, results)):
+        entry = {
+            'index': index,
+            'original_command': original,
+            'processed_command': processed,
+            'result': result,
+            'success': not result.startswith("❌")
+        }
+        if output_format == 'json':
+            entry['parsed'] = parse_output(processed, result)
+        entries.append(entry)
+    
+    return jsonify({
+        'server_id': server_id,
+        'count': len(results),
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'results': entries
+    })
+
+@api_bp.route('/mc/bulk', methods=['POST'])
+@verify_api_token
+def execute_rcon_bulk_request():
+    """Expand one command over many players and execute it in pipelined chunks
+    
+    `players` is a list of names, a comma-separated string or "@a"; each player
+    gets `<command> <player> [args]` after alias processing.
+    """
+    data = request.get_json()
+    
+    if not data or 'command' not in data or 'players' not in data:
+        return jsonify({'error': 'Missing command or players parameter'}), 400
+    
+    server_id = data.get('server_id')
+    command = data.get('command')
+    players = data.get('players')
+    extra_args = data.get('args', [])
+    source = data.get('source', 'API')
+    
+    if not server_id:
+        return jsonify({'error': 'Missing server_id parameter'}), 400
+    
+    if server_id not in SERVERS:
+        return jsonify({'error': f'Invalid server_id: {server_id}'}), 400
+    
+    if not isinstance(command, str) or not command.strip():
+        return jsonify({'error': 'command must be a non-empty string'}), 400
+    
+    if isinstance(extra_args, str):
+        extra_args = extra_args.split()
+    if not isinstance(extra_args, list) or not all(isinstance(a, str) for a in extra_args):
+        return jsonify({'error': 'args must be a list of strings or a string'}), 400
+    
+    if isinstance(players, list):
+        if not all(isinstance(p, str) for p in players):
+            return jsonify({'error': 'players must be a list of strings, a comma-separated string or "@a"'}), 400
+        players = ','.join(players)
+    if not isinstance(players, str):
+        return jsonify({'error': 'players must be a list of strings, a comma-separated string or "@a"'}), 400
+    
+    player_names, error = resolve_players(server_id, players, f"API: {source}", "api_user")
+    if error:
+        return jsonify({'error': error}), 400
+    
+    expanded, error = expand_bulk_command(command, player_names, extra_args, "api_user")
+    if error:
+        return jsonify({'error': error}), 400
+    
+    started = time.monotonic()
+    results = execute_bulk_commands(server_id, [processed for _, processed in expanded], f"API: {source}")
+    
+    return jsonify({
+        'server_id': server_id,
+        'command': command,
+        'count': len(results),
+        'succeeded': sum(1 for result in results if not result.startswith("❌")),
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'results': [
+            {'player': player, 'processed_command': processed, 'result': result, 'success': not result.startswith("❌")}
+            for (player, processed), result in zip(expanded, results)
+        ]
     })
@@ -2,11 +2,25 @@
 Slack integration routes for RCON Web Service
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 
-from utils.slack_notifications import notify_command
-from config.settings import SERVERS
-from modules.command_processor import execute_rcon_command, get_server_info, process_command_alias
+from utils.slack_notifications import notify_command, send_slack_response
+from config.settings import SERVERS, CONFIG
+from modules.command_processor import (execute_cached_rcon_command, execute_rcon_fanout,
+                                       get_server_info, process_command_alias, validate_command_safety,
+                                       execute_config_command, format_cache_age, get_server_breaker_states,
+                                       parse_bulk_arguments, resolve_players, expand_bulk_command,
+                                       execute_bulk_commands, BULK_USAGE, suggest_commands, format_suggestions,
+                                       is_coordinate_command, FANOUT_COORDINATE_ERROR)
+from utils.security import is_admin_user
+from modules.macro_engine import (MacroError, MACRO_USAGE, define_macro, delete_macro, run_macro, run_macro_later,
+                                  get_macro_store, parse_script, has_waits, format_macro_results)
+from utils.slack_pages import MORE_USAGE, paginate, paged_reply, get_more, iter_lines
+from utils.command_history import get_command_history, parse_history_time
+from utils.circuit_breaker import STATE_CLOSED
+from utils.deferred_queue import get_deferred_queue
 from utils.context_manager import (
     get_user_default_server, set_user_default_server, 
     get_user_context, set_user_context, clear_user_context
@@ -15,6 +29,21 @@ from utils.context_manager import (
 logger = logging.getLogger(__name__)
 slack_bp = Blueprint('slack', __name__)
 
+# Slack drops slash command responses that take longer than 3 seconds
+SLACK_RESPONSE_DEADLINE = 2.5
+
+# `config` subcommands that manage the service configuration (admin only)
+ADMIN_CONFIG_SUBCOMMANDS = ['get', 'set', 'list', 'alias', 'timeouts']
+
+# Runs bulk commands and macros that outlast the response deadline; results go to the response_url.
+# Macro waits are timers, so only the stretches between them take a worker
+_background_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='slack-background')
+
+# Failed commands listed in a bulk summary
+BULK_FAILURES_SHOWN = 20
+HISTORY_USAGE = ("Usage: `/mc history [user:<name>] [server:<id>] [command:<cmd>] "
+                 "[since:<30m|6h|7d|2026-01-31>] [until:<time>] [limit:<n>]`")
+
 def handle_help_command():
     """Handle help command with enhanced context information"""
     help_text = """🎮 *Minecraft RCON Commands*
@@ -22,7 +51,14 @@ def handle_help_command():
 *Basic Usage:*
 • `/mc <command>` - Run command on your default server
 • `/mc <server_id> <command>` - Run command on specific server  
+• `/mc all <command>` - Run command on every server at once
+• `/mc <id1>,<id2> <command>` - Run command on several servers at once
 • `/mc servers` - List all available servers
+• `/mc deferred` - Show commands queued for offline servers
+• `/mc bulk <command> <p1,p2,...|@a> [args]` - Run a command for many players
+• `/mc macro define|run|list|show|delete` - Stored multi-step command macros
+• `/mc more <token>` - Next page of a long result
+• `/mc history [user:<name>] [server:<id>] [command:<cmd>] [since:<7d>]` - Commands run so far
 • `/mc help` - Show this help
 
 *Server Management:*
@@ -75,11 +111,16 @@ def handle_servers_command(user_name):
     server_list = "🎯 *Available Minecraft Servers:*\n\n"
     
     default_server = get_user_default_server(user_name)
+    breakers = get_server_breaker_states()
     
-    for server_id, config in SERVERS.items():
+    for server_id, config in dict(SERVERS).items():
         server_info = get_server_info(server_id)
+        if server_info is None:
+            continue
         status_indicator = "✅" if default_server == server_id else "⚪"
-        server_list += f"{status_indicator} *{server_info['name']}* (`{server_id}`) - localhost:{config['port']}\n"
+        breaker_state = breakers.get(server_id, {}).get('state', STATE_CLOSED)
+        unreachable = " 🔴 _unreachable_" if breaker_state != STATE_CLOSED else ""
+        server_list += f"{status_indicator} *{server_info['name']}* (`{server_id}`) - localhost:{config['port']}{unreachable}\n"
     
     if default_server:
         server_info = get_server_info(default_server)
@@ -92,10 +133,43 @@ def handle_servers_command(user_name):
         'text': server_list
     })
 
+def handle_deferred_command():
+    """Show commands queued for servers that are offline"""
+    pending = {server_id: entries for server_id, entries in get_deferred_queue().pending().items() if entries}
+    if not pending:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': '⏳ No deferred commands.'
+        })
+    
+    text = "⏳ *Deferred Commands* (run when the server is back):\n"
+    for server_id, entries in pending.items():
+        server_info = get_server_info(server_id)
+        name = server_info['name'] if server_info else server_id
+        text += f"\n*{name}* (`{server_id}`)\n"
+        for entry in entries:
+            text += f"• `{entry['command']}` - {entry['user_name']}\n"
+    
+    return jsonify({
+        'response_type': 'ephemeral',
+        'text': text
+    })
+
 def handle_config_command(user_name, text):
     """Handle configuration commands"""
     parts = text.split()
     
+    if len(parts) >= 2 and parts[1].lower() in ADMIN_CONFIG_SUBCOMMANDS:
+        if not is_admin_user(user_name):
+            return jsonify({
+                'response_type': 'ephemeral',
+                'text': '❌ Service configuration is restricted to admin users.'
+            })
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': execute_config_command(text, user_name)
+        })
+    
     if len(parts) == 1:
         # Show current config
         default_server = get_user_default_server(user_name)
@@ -117,6 +191,9 @@ def handle_config_command(user_name, text):
         config_text += "\n*Commands:*\n"
         config_text += "• `config clear` - Clear your default server\n"
         config_text += "• `config reset` - Reset all your settings\n"
+        if is_admin_user(user_name):
+            config_text += "• `config get|set|list <key>` - Manage service configuration\n"
+            config_text += "• `config timeouts [server_id]` - Show learned command timeouts\n"
         
         return jsonify({
             'response_type': 'ephemeral',
@@ -164,8 +241,17 @@ def handle_slack_command():
             return handle_servers_command(user_name)
         elif text.lower() == 'help':
             return handle_help_command()
+        elif text.lower() == 'deferred':
+            return handle_deferred_command()
         elif text.lower().startswith('config'):
             return handle_config_command(user_name, text)
+        elif text.split()[0].lower() == 'history':
+            return handle_history_command(user_name, text, request.form.get('response_url'))
+        elif text.split()[0].lower() == 'more':
+            return handle_more_command(user_name, text)
+        elif text.split()[0].lower() == 'macro':
+            return handle_macro_command(user_name, get_user_default_server(user_name), text,
+                                        request.form.get('response_url'))
         
         # Check for pending context (user was in middle of server selection)
         context = get_user_context(user_name)
@@ -175,6 +261,12 @@ def handle_slack_command():
         # Parse command
         parts = text.split()
         
+        # Check for fan-out to several servers (`all` or `id1,id2`)
+        if len(parts) >= 2:
+            fanout_servers = parse_fanout_target(parts[0])
+            if fanout_servers:
+                return handle_fanout_command(user_name, fanout_servers, ' '.join(parts[1:]))
+        
         # Check if first part is a server ID
         if len(parts) >= 2 and parts[0] in SERVERS:
             server_id = parts[0]
@@ -197,6 +289,13 @@ def handle_slack_command():
                 'text': f'❌ Invalid server ID: `{server_id}`. Use `/mc servers` to see available servers.'
             })
         
+        if command.split()[0].lower() == 'macro':
+            return handle_macro_command(user_name, server_id, command, request.form.get('response_url'))
+        
+        if command.split()[0].lower() == 'bulk':
+            return handle_bulk_command(user_name, server_id, command.split(None, 1)[1] if ' ' in command else '',
+                                       request.form.get('response_url'))
+        
         # Process command
         processed_command, error = process_command_alias(command, user_name)
         if error:
@@ -205,20 +304,24 @@ def handle_slack_command():
                 'text': f'❌ {error}'
             })
         
+        # A likely typo is answered without a round trip to the server
+        suggestions = suggest_commands(server_id, command, processed_command)
+        if suggestions:
+            return jsonify({
+                'response_type': 'ephemeral',
+                'text': format_suggestions(command, suggestions)
+            })
+        
         # Execute command
-        result = execute_rcon_command(server_id, processed_command, f"Slack User: {user_name}")
+        result, cache_age = execute_cached_rcon_command(server_id, processed_command, f"Slack User: {user_name}",
+                                                        user_name, command, request.form.get('response_url'))
         server_info = get_server_info(server_id)
         
-        # Format response
-        if processed_command.lower() in ['list', 'who']:
-            response_text = f"*👥 Players on {server_info['name']}:*\n```\n{result}\n```"
-        else:
-            response_text = f"*🎮 {server_info['name']}* - Command: `{processed_command}`\n```\n{result}\n```"
-        
-        return jsonify({
-            'response_type': 'in_channel',
-            'text': response_text
-        })
+        # Long results are sent a page at a time
+        header = format_result_header(server_info['name'], processed_command)
+        footer = format_cache_age(cache_age) if cache_age is not None else ''
+        paged = paginate(header, iter_lines(result), user_name, 'in_channel', footer)
+        return paged_reply(paged, request.form.get('response_url'))
         
     except Exception as e:
         logger.error(f"Error handling Slack command: {e}")
@@ -227,9 +330,254 @@ def handle_slack_command():
             'text': f'❌ Error: {str(e)}'
         })
 
+def format_result_header(server_name, processed_command):
+    """Heading shown above a command's output"""
+    if processed_command.lower() in ['list', 'who']:
+        return f"*👥 Players on {server_name}:*"
+    return f"*🎮 {server_name}* - Command: `{processed_command}`"
+
+def handle_more_command(user_name, text):
+    """Send the next page of a long result: `more <token>`"""
+    parts = text.split()
+    if len(parts) != 2:
+        return jsonify({'response_type': 'ephemeral', 'text': MORE_USAGE})
+    paged = get_more(parts[1], user_name)
+    if paged is None:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': f"❌ No more output for `{parts[1]}`. Pages expire after {CONFIG.get('slack_page_ttl', 1800) // 60} minutes."
+        })
+    return jsonify({'response_type': paged.response_type, 'text': paged.next_page()})
+
+def format_history_entry(entry):
+    """One line of `/mc history` output"""
+    server_info = get_server_info(entry['server'])
+    server_name = server_info['name'] if server_info else entry['server']
+    command = entry['command']
+    if entry['processed'] != command:
+        command += f" → {entry['processed']}"
+    when = datetime.fromtimestamp(entry['ts']).strftime('%Y-%m-%d %H:%M:%S')
+    return f"{when} {server_name} {entry['user']}: {command} [{entry['outcome']}, {entry['duration_ms']:.0f}ms]"
+
+def handle_history_command(user_name, text, response_url):
+    """Search the command history; users other than admins only see their own commands"""
+    filters = {'limit': 50}
+    try:
+        for token in text.split()[1:]:
+            key, _, value = token.partition(':')
+            key = key.lower()
+            if not value or key not in ('user', 'server', 'command', 'since', 'until', 'limit'):
+                raise ValueError(HISTORY_USAGE)
+            if key in ('since', 'until'):
+                filters[key] = parse_history_time(value)
+            elif key == 'limit':
+                if not value.isdigit() or int(value) < 1:
+                    raise ValueError(HISTORY_USAGE)
+                filters[key] = min(int(value), CONFIG.get('max_history_results', 200))
+            else:
+                filters[key] = value
+    except ValueError as e:
+        return jsonify({'response_type': 'ephemeral', 'text': f"❌ {e}"})
+    
+    if not is_admin_user(user_name):
+        if filters.get('user', user_name) != user_name:
+            return jsonify({'response_type': 'ephemeral', 'text': "❌ Only admins can see other users' commands."})
+        filters['user'] = user_name
+    
+    entries = get_command_history().query(**filters)
+    if not entries:
+        return jsonify({'response_type': 'ephemeral', 'text': "🕘 No matching commands in the history."})
+    header = f"🕘 *Command history* ({len(entries)} commands, newest first):"
+    paged = paginate(header, (format_history_entry(entry) for entry in entries), user_name, 'ephemeral')
+    return paged_reply(paged, response_url)
+
+def parse_fanout_target(target):
+    """Return the server IDs for `all` or a comma-separated ID list, else None"""
+    if target.lower() == 'all':
+        return list(SERVERS)
+    if ',' in target:
+        server_ids = [s for s in target.split(',') if s]
+        if server_ids and all(s in SERVERS for s in server_ids):
+            return list(dict.fromkeys(server_ids))
+    return None
+
+def handle_fanout_command(user_name, server_ids, command):
+    """Run one command on several servers concurrently"""
+    # Processing a coordinate command runs it, so it must be turned away first
+    if is_coordinate_command(command):
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': FANOUT_COORDINATE_ERROR
+        })
+    
+    processed_command, error = process_command_alias(command, user_name)
+    if error:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': f'❌ {error}'
+        })
+    
+    is_safe, safety_error = validate_command_safety(processed_command, user_name)
+    if not is_safe:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': safety_error
+        })
+    
+    deadline = min(CONFIG.get('fanout_deadline', 10), SLACK_RESPONSE_DEADLINE)
+    results = execute_rcon_fanout(server_ids, processed_command, f"Slack User: {user_name}", deadline, user_name)
+    succeeded = sum(1 for outcome in results.values() if outcome['success'])
+    
+    response_text = f"*📡 {processed_command}* on {len(results)} servers ({succeeded}/{len(results)} succeeded)\n"
+    for server_id, outcome in results.items():
+        server_info = get_server_info(server_id)
+        status_icon = "✅" if outcome['success'] else "❌"
+        timing = format_cache_age(outcome['cache_age']) if outcome['cache_age'] is not None else f"{outcome['duration_ms']:.0f} ms"
+        response_text += f"\n{status_icon} *{server_info['name']}* (`{server_id}`) - {timing}\n```\n{outcome['result']}\n```"
+    
+    return jsonify({
+        'response_type': 'in_channel',
+        'text': response_text
+    })
+
+def format_bulk_results(server_name, command, expanded, results):
+    """Summary of a bulk command with the failed commands listed"""
+    failures = [(processed, result) for (_, processed), result in zip(expanded, results) if result.startswith("❌")]
+    text = f"*📦 Bulk `{command}`* on *{server_name}*: {len(results) - len(failures)}/{len(results)} succeeded"
+    for processed, result in failures[:BULK_FAILURES_SHOWN]:
+        text += f"\n❌ `{processed}` - {result}"
+    if len(failures) > BULK_FAILURES_SHOWN:
+        text += f"\n…and {len(failures) - BULK_FAILURES_SHOWN} more failures"
+    return text
+
+def run_bulk_command_async(response_url, server_id, command, expanded, user_name):
+    """Run a bulk command in the background, reporting progress through the response_url"""
+    server_name = get_server_info(server_id)['name']
+    reported = [0]
+    
+    def on_progress(done, total):
+        # A response_url takes at most five replies, so report each quarter only
+        quarter = done * 4 // total
+        if 0 < quarter < 4 and quarter > reported[0]:
+            reported[0] = quarter
+            send_slack_response(response_url, f"⏳ Bulk `{command}` on *{server_name}*: {done}/{total} done")
+    
+    try:
+        results = execute_bulk_commands(server_id, [processed for _, processed in expanded],
+                                        f"Slack User: {user_name}", user_name, on_progress)
+        send_slack_response(response_url, format_bulk_results(server_name, command, expanded, results), 'in_channel')
+    except Exception as e:
+        logger.error(f"Error running bulk command: {e}")
+        send_slack_response(response_url, f"❌ Bulk `{command}` failed: {str(e)}")
+
+def handle_bulk_command(user_name, server_id, text, response_url):
+    """Run one command for many players: `bulk <command> <players> [arguments]`"""
+    parsed = parse_bulk_arguments(text)
+    if parsed is None:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': BULK_USAGE
+        })
+    command, players, extra_args = parsed
+    
+    player_names, error = resolve_players(server_id, players, f"Slack User: {user_name}", user_name)
+    if not error:
+        expanded, error = expand_bulk_command(command, player_names, extra_args, user_name)
+    if error:
+        return jsonify({
+            'response_type': 'ephemeral',
+            'text': error
+        })
+    
+    # One chunk finishes well within Slack's deadline; anything longer reports back later
+    if not response_url or len(expanded) <= CONFIG.get('bulk_chunk_size', 50):
+        results = execute_bulk_commands(server_id, [processed for _, processed in expanded],
+                                        f"Slack User: {user_name}", user_name)
+        return jsonify({
+            'response_type': 'in_channel',
+            'text': format_bulk_results(get_server_info(server_id)['name'], command, expanded, results)
+        })
+    
+    _background_executor.submit(run_bulk_command_async, response_url, server_id, command, expanded, user_name)
+    return jsonify({
+        'response_type': 'ephemeral',
+        'text': f"⏳ Running `{command}` for {len(expanded)} players on *{get_server_info(server_id)['name']}*. "
+                f"I'll post progress and the results here."
+    })
+
+def run_macro_async(response_url, server_id, name, args, user_name):
+    """Run a macro in the background and post its results through the response_url"""
+    def report(outcome):
+        results, error = outcome
+        try:
+            text = format_macro_results(name, get_server_info(server_id)['name'], results, error)
+            send_slack_response(response_url, text, 'in_channel')
+        except Exception as e:
+            logger.error(f"Error reporting macro {name}: {e}")
+            send_slack_response(response_url, f"❌ Macro `{name}` failed: {str(e)}")
+    
+    run_macro_later(server_id, name, args, user_name, f"Slack User: {user_name}",
+                    _background_executor.submit, report)
+
+def handle_macro_command(user_name, server_id, text, response_url):
+    """Define, inspect and run stored macros: `macro define|run|list|show|delete`"""
+    parts = text.split()
+    subcommand = parts[1].lower() if len(parts) > 1 else ''
+    name = parts[2].lower() if len(parts) > 2 else None
+    
+    def reply(message, response_type='ephemeral'):
+        return jsonify({'response_type': response_type, 'text': message})
+    
+    if subcommand == 'define' and name:
+        try:
+            macro = define_macro(text.split(None, 2)[2], user_name)
+        except MacroError as e:
+            return reply(f"❌ {e}")
+        params = f"({', '.join(macro['params'])})" if macro['params'] else ''
+        return reply(f"✅ Saved macro `{macro['name']}{params}`. Run it with `/mc macro run {macro['name']}`.")
+    
+    if subcommand == 'list':
+        macros = get_macro_store().all()
+        if not macros:
+            return reply("🧩 No macros defined yet. See `/mc macro` for how to define one.")
+        lines = [f"• `{m['name']}` {' '.join('<' + p + '>' for p in m['params'])} - {m['owner']}"
+                 for m in sorted(macros.values(), key=lambda m: m['name'])]
+        return reply("🧩 *Macros:*\n" + "\n".join(lines))
+    
+    if subcommand == 'show' and name:
+        macro = get_macro_store().get(name)
+        if macro is None:
+            return reply(f"❌ No macro named {name}")
+        steps = "\n".join(f"{i}. `{step.strip()}`" for i, step in enumerate(macro['script'].split(';'), 1) if step.strip())
+        params = ', '.join(macro['params']) or 'none'
+        return reply(f"🧩 *Macro `{name}`* by {macro['owner']} (parameters: {params})\n{steps}")
+    
+    if subcommand == 'delete' and name:
+        try:
+            deleted = delete_macro(name, user_name)
+        except MacroError as e:
+            return reply(f"❌ {e}")
+        return reply(f"✅ Deleted macro `{name}`" if deleted else f"❌ No macro named {name}")
+    
+    if subcommand == 'run' and name:
+        if not server_id:
+            return reply("❌ No default server set. Use `/mc <server_id> macro run ...`.")
+        macro = get_macro_store().get(name)
+        if macro is None:
+            return reply(f"❌ No macro named {name}")
+        # Macros that wait can take minutes, so they report back later
+        if response_url and has_waits(parse_script(macro['script'])):
+            run_macro_async(response_url, server_id, name, parts[3:], user_name)
+            return reply(f"⏳ Running macro `{name}` on *{get_server_info(server_id)['name']}*. "
+                         f"I'll post the results here.")
+        results, error = run_macro(server_id, name, parts[3:], user_name, f"Slack User: {user_name}")
+        return reply(format_macro_results(name, get_server_info(server_id)['name'], results, error), 'in_channel')
+    
+    return reply(MACRO_USAGE)
+
 def prompt_server_selection(user_name, command):
     """Prompt user to select a server and set context"""
-    available_servers = list(SERVERS.keys())
+    available_servers = list(SERVERS)
     server_list = "🎯 *Choose a server:*\n\n"
     
     for i, server_id in enumerate(available_servers, 1):
@@ -279,7 +627,7 @@ def handle_server_selection_response(user_name, text, context):
                     result = handle_server_control_command(user_name, f"{action} {selected_server_id}")
                 elif action == 'view logs for':
                     # Execute logs command
-                    result = handle_logs_command(user_name, f"logs {selected_server_id}")
+                    result = handle_logs_command(user_name, f"logs {selected_server_id}", request.form.get('response_url'))
                 else:
                     return jsonify({
                         'response_type': 'ephemeral',
@@ -309,21 +657,17 @@ def handle_server_selection_response(user_name, text, context):
                         'text': f'❌ {error}'
                     })
                 
-                result = execute_rcon_command(selected_server_id, processed_command, f"Slack User: {user_name}")
+                result, cache_age = execute_cached_rcon_command(selected_server_id, processed_command,
+                                                                f"Slack User: {user_name}", user_name,
+                                                                original_command, request.form.get('response_url'))
                 server_info = get_server_info(selected_server_id)
                 
                 # Format response with confirmation
-                response_text = f"✅ *Server set to {server_info['name']}* (I'll remember this!)\n\n"
-                
-                if processed_command.lower() in ['list', 'who']:
-                    response_text += f"*👥 Players on {server_info['name']}:*\n```\n{result}\n```"
-                else:
-                    response_text += f"*🎮 {server_info['name']}* - Command: `{processed_command}`\n```\n{result}\n```"
-                
-                return jsonify({
-                    'response_type': 'in_channel',
-                    'text': response_text
-                })
+                header = (f"✅ *Server set to {server_info['name']}* (I'll remember this!)\n\n"
+                          + format_result_header(server_info['name'], processed_command))
+                footer = format_cache_age(cache_age) if cache_age is not None else ''
+                paged = paginate(header, iter_lines(result), user_name, 'in_channel', footer)
+                return paged_reply(paged, request.form.get('response_url'))
         else:
             return jsonify({
                 'response_type': 'ephemeral',
@@ -353,13 +697,13 @@ def handle_players_command():
         if not server_id:
             return prompt_server_selection(user_name, 'list')
         
-        result = execute_rcon_command(server_id, 'list', f"Slack User: {user_name}")
+        result, cache_age = execute_cached_rcon_command(server_id, 'list', f"Slack User: {user_name}", user_name)
         server_info = get_server_info(server_id)
         
-        return jsonify({
-            'response_type': 'in_channel',
-            'text': f"*👥 Players on {server_info['name']}:*\n```\n{result}\n```"
-        })
+        footer = format_cache_age(cache_age) if cache_age is not None else ''
+        paged = paginate(format_result_header(server_info['name'], 'list'), iter_lines(result),
+                         user_name, 'in_channel', footer)
+        return paged_reply(paged, request.form.get('response_url'))
         
     except Exception as e:
         logger.error(f"Error in players command: {e}")
@@ -463,7 +807,7 @@ def handle_logs_command_endpoint():
         from pufferpanel_commands import handle_logs_command
         user_name = request.form.get('user_name', 'unknown')
         text = request.form.get('text', '').strip()
-        return handle_logs_command(user_name, f"logs {text}")
+        return handle_logs_command(user_name, f"logs {text}", request.form.get('response_url'))
     except Exception as e:
         logger.error(f"Error in logs endpoint: {e}")
         return jsonify({
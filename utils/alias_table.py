@@ -0,0 +1,110 @@
+"""
+Compiled dispatch table for command aliases and shortcuts
+
+ALIASES, LUCKPERMS_SHORTCUTS and ESSENTIALS_SHORTCUTS are compiled once into a
+single dict of name -> CompiledAlias, holding only the kinds whose
+``enable_*`` flag is on. Each template becomes a ``str.format`` string with
+positional fields and a known arity, so resolving an alias is one dict lookup
+and one format call. Aliases win over LuckPerms shortcuts, which win over
+Essentials shortcuts, as before.
+
+The table is swapped in whole by ``rebuild_alias_table()``, which
+``config set`` calls when an alias flag changes and ``config alias`` calls
+after editing an alias.
+"""
+import logging
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from config.settings import CONFIG, ALIASES, LUCKPERMS_SHORTCUTS, ESSENTIALS_SHORTCUTS
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+# Filled in per player by coordcmd, so aliases expanding to coordcmd keep them
+_COORDINATE_PLACEHOLDERS = frozenset(('x', 'y', 'z'))
+
+# (enable flag, templates, error prefix, append extra args when the template has no placeholders),
+# lowest priority first so later kinds overwrite earlier ones
+ALIAS_SOURCES = [
+    ('enable_essentials_shortcuts', ESSENTIALS_SHORTCUTS, "Essentials shortcut error", True),
+    ('enable_luckperms_shortcuts', LUCKPERMS_SHORTCUTS, "LuckPerms shortcut error", False),
+    ('enable_aliases', ALIASES, "Alias error", True),
+]
+ALIAS_FLAGS = {flag for flag, _, _, _ in ALIAS_SOURCES}
+
+
+class CompiledAlias:
+    """One alias template compiled to a positional format string"""
+
+    __slots__ = ('name', 'template', 'placeholders', 'arity', 'error_prefix', 'append_args', '_kept', '_format')
+
+    def __init__(self, name: str, template: str, error_prefix: str, append_args: bool):
+        self.name = name
+        self.template = template
+        self.error_prefix = error_prefix
+        names = _PLACEHOLDER.findall(template)
+        self._kept = _COORDINATE_PLACEHOLDERS if template.split(None, 1)[0].lower() == 'coordcmd' else frozenset()
+        # A placeholder used twice takes the same argument both times
+        self.placeholders: List[str] = [name for name in dict.fromkeys(names) if name not in self._kept]
+        self.arity = len(self.placeholders)
+        self.append_args = append_args and not names
+
+        literals = _PLACEHOLDER.split(template)[::2]
+        parts = [literals[0].replace('{', '{{').replace('}', '}}')]
+        for placeholder, literal in zip(names, literals[1:]):
+            if placeholder in self._kept:
+                parts.append(f'{{{{{placeholder}}}}}')
+            else:
+                parts.append(f'{{{self.placeholders.index(placeholder)}}}')
+            parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        self._format = ''.join(parts).format
+
+    def render(self, args: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """The command for these arguments, or an error; extra arguments are ignored"""
+        if len(args) < self.arity:
+            return None, f"{self.error_prefix}: Missing argument for {{{self.placeholders[len(args)]}}}"
+        if self.append_args:
+            return (self.template + ' ' + ' '.join(args)) if args else self.template, None
+        command = self._format(*args[:self.arity])
+        # Placeholders can only be left over if an argument contained one
+        if '{' in command:
+            leftover = [name for name in _PLACEHOLDER.findall(command) if name not in self._kept]
+            if leftover:
+                return None, f"{self.error_prefix}: Missing arguments: {', '.join('{' + p + '}' for p in leftover)}"
+        return command, None
+
+
+_table: Dict[str, CompiledAlias] = {}
+_names: FrozenSet[str] = frozenset()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild_alias_table() -> int:
+    """Recompile the dispatch table from the alias dicts and flags; returns its size"""
+    global _table, _names
+    with _rebuild_lock:
+        table = {}
+        for flag, templates, error_prefix, append_args in ALIAS_SOURCES:
+            if not CONFIG.get(flag, True):
+                continue
+            for name, template in templates.items():
+                table[name.lower()] = CompiledAlias(name, template, error_prefix, append_args)
+        _table = table
+        _names = frozenset(table)
+    logger.debug(f"Compiled {len(table)} command aliases")
+    return len(table)
+
+
+def lookup_alias(base_command: str) -> Optional[CompiledAlias]:
+    """The compiled alias for a lowercased base command, if any is enabled"""
+    return _table.get(base_command)
+
+
+def alias_names() -> FrozenSet[str]:
+    """Names in the dispatch table; a new set after every rebuild"""
+    return _names
+
+
+rebuild_alias_table()
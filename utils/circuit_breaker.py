@@ -0,0 +1,188 @@
+"""
+Per-server circuit breakers for RCON
+
+After repeated connection failures or timeouts a server's breaker opens and
+commands against it fail immediately instead of waiting for a timeout. A
+background thread probes open servers (connect + auth only) and closes the
+breaker as soon as the server answers again.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config.settings import SERVERS, CONFIG, RCON_HOST
+from utils.rcon_client import RconClient, RconError, RconAuthError
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Tracks consecutive failures for one server and decides whether to let calls through"""
+
+    def __init__(self, server_id: str, failure_threshold: int = 3, reset_timeout: float = 15):
+        self.server_id = server_id
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+
+    def allow_request(self) -> bool:
+        """Whether a call may go to the server now
+
+        While open, one trial call is let through once ``reset_timeout`` has
+        passed (half-open); everything else fails fast.
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if (self.state == STATE_OPEN and not self._trial_in_progress
+                    and time.monotonic() - self.opened_at >= self.reset_timeout):
+                self.state = STATE_HALF_OPEN
+                self._trial_in_progress = True
+                return True
+            self.rejected += 1
+            return False
+
+    def begin_probe(self) -> bool:
+        """Claim the half-open trial for a background probe"""
+        with self._lock:
+            if self.state != STATE_OPEN or self._trial_in_progress:
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = STATE_HALF_OPEN
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            recovered = self.failures > 0
+            if self.state != STATE_CLOSED:
+                logger.info(f"Circuit for {self.server_id} closed, server is reachable again")
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+        if recovered:
+            for listener in _recovery_listeners:
+                listener(self.server_id)
+
+    def record_failure(self, error: Optional[Exception] = None):
+        with self._lock:
+            self.failures += 1
+            if error is not None:
+                self.last_error = str(error)
+            self._trial_in_progress = False
+            if self.state == STATE_HALF_OPEN or (self.state == STATE_CLOSED and self.failures >= self.failure_threshold):
+                if self.state == STATE_CLOSED:
+                    self.times_opened += 1
+                    logger.warning(f"Circuit for {self.server_id} opened after {self.failures} failures: {error}")
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+                _start_prober()
+
+    def release_trial(self):
+        """Give back a half-open trial that ended without reaching the server"""
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self.state = STATE_OPEN
+                self._trial_in_progress = False
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe (0 if not open)"""
+        with self._lock:
+            if self.state != STATE_OPEN:
+                return 0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'times_opened': self.times_opened,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+            }
+
+
+_recovery_listeners: List[Callable[[str], None]] = []
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_prober_thread: Optional[threading.Thread] = None
+
+
+def get_breaker(server_id: str) -> CircuitBreaker:
+    """Get (or create) the circuit breaker for a server, applying current CONFIG"""
+    breaker = _breakers.get(server_id)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(server_id, CircuitBreaker(server_id))
+    breaker.failure_threshold = max(1, CONFIG.get('breaker_failure_threshold', 3))
+    breaker.reset_timeout = CONFIG.get('breaker_reset_timeout', 15)
+    return breaker
+
+
+def add_recovery_listener(listener: Callable[[str], None]):
+    """Call listener(server_id) when a server that was failing answers again"""
+    _recovery_listeners.append(listener)
+
+
+def get_breaker_states() -> Dict[str, Dict[str, object]]:
+    """Breaker stats for every configured server"""
+    return {server_id: get_breaker(server_id).stats() for server_id in list(SERVERS)}
+
+
+def probe_server(server_id: str) -> bool:
+    """Check that a server accepts an RCON connection and login"""
+    server_config = SERVERS.get(server_id)
+    if not server_config:
+        return False
+    timeout = CONFIG.get('breaker_probe_timeout', 2)
+    try:
+        with RconClient(RCON_HOST, server_config['port'], server_config['password'], timeout=timeout):
+            return True
+    except RconAuthError:
+        # Reachable; a wrong password is not an outage
+        return True
+    except RconError:
+        return False
+
+
+def _start_prober():
+    global _prober_thread
+    with _breakers_lock:
+        if _prober_thread is None or not _prober_thread.is_alive():
+            _prober_thread = threading.Thread(target=_probe_loop, name="rcon-breaker-prober", daemon=True)
+            _prober_thread.start()
+
+
+def _probe_loop():
+    while True:
+        time.sleep(1)
+        with _breakers_lock:
+            breakers = list(_breakers.values())
+        for breaker in breakers:
+            if not breaker.begin_probe():
+                continue
+            try:
+                reachable = probe_server(breaker.server_id)
+            except Exception as e:
+                logger.error(f"Error probing {breaker.server_id}: {e}")
+                reachable = False
+            if reachable:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
@@ -0,0 +1,287 @@
+"""
+Append-only history of executed RCON commands
+
+Every command run on a server is recorded as one JSON line (timestamp, user,
+source, server, original and processed command, duration, outcome) in
+HISTORY_DIR. ``record()`` only appends to an in-memory buffer; a writer
+thread flushes it every ``history_flush_interval`` seconds, so the request
+path never waits on disk.
+
+History is split into segment files of about ``history_segment_size`` bytes.
+When a segment is full it is sealed: an index of line offsets by user, server
+and base command is written next to it, and segments older than
+``history_retention_days`` are deleted. Queries walk segments newest first,
+skip those outside the time range and read only the indexed lines of sealed
+segments; the one open segment is scanned.
+
+Several processes (gateway and web workers) may record at once, so appends
+and sealing happen under an exclusive lock.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config.settings import CONFIG, HISTORY_DIR
+from utils.result_cache import normalize_command
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PREFIX = 'segment-'
+_SEGMENT_SUFFIX = '.jsonl'
+_INDEX_SUFFIX = '.idx'
+# Index fields and the entry keys they are built from
+_INDEXED = (('users', 'user'), ('servers', 'server'), ('commands', 'base'))
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)([smhdw])\Z')
+_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def command_outcome(result: str) -> str:
+    """'ok', 'error' or 'deferred' for a command's result text"""
+    if result.startswith('❌'):
+        return 'error'
+    if result.startswith('⏳'):
+        return 'deferred'
+    return 'ok'
+
+
+def parse_history_time(value: str, now: Optional[float] = None) -> float:
+    """Timestamp for '30m', '6h', '7d' (that long ago) or an ISO date/time; raises ValueError"""
+    match = _DURATION.match(value.strip().lower())
+    if match:
+        return (now if now is not None else time.time()) - float(match.group(1)) * _SECONDS[match.group(2)]
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}': use e.g. 30m, 6h, 7d or 2026-01-31T12:00")
+
+
+def base_command(command: str) -> str:
+    return normalize_command(command.split(None, 1)[0]) if command.strip() else ''
+
+
+class CommandHistory:
+    """Segmented JSON-lines command log with a buffered writer"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.dropped = 0
+        self._buffer = deque()
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Sealed segments never change, so their indexes are kept once loaded
+        self._indexes: "OrderedDict[str, Dict]" = OrderedDict()
+
+    # Writing
+
+    def record(self, server_id: str, command: str, source: str, user_name: Optional[str],
+               original_command: Optional[str], started: float, duration: float, result: str):
+        """Queue one executed command for writing; never blocks on disk"""
+        if not CONFIG.get('enable_command_history', True):
+            return
+        if len(self._buffer) >= CONFIG.get('history_buffer_size', 10000):
+            self.dropped += 1
+            return
+        self._buffer.append({
+            'ts': round(started, 3),
+            'user': user_name or source,
+            'source': source,
+            'server': server_id,
+            'command': original_command or command,
+            'processed': command,
+            'base': base_command(command),
+            'duration_ms': round(duration * 1000, 1),
+            'outcome': command_outcome(result),
+        })
+        self._start_writer()
+
+    def _start_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='command-history', daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(CONFIG.get('history_flush_interval', 1))
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing command history: {e}")
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self._flush_lock:
+            entries = []
+            while self._buffer:
+                entries.append(self._buffer.popleft())
+            if not entries:
+                return
+            data = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries).encode()
+            os.makedirs(self.directory, exist_ok=True)
+            with self._locked():
+                # Named by the current time, so a new segment always sorts after the sealed ones
+                path = self._open_segment() or self._segment_path(time.time())
+                with open(path, 'ab') as f:
+                    f.write(data)
+                    size = f.tell()
+                if size >= CONFIG.get('history_segment_size', 4 * 1024 * 1024):
+                    self._seal(path)
+                    self._prune()
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _segment_path(self, ts: float) -> str:
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{int(ts * 1000):015d}{_SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[str]:
+        """Segment paths, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in sorted(names)
+                if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)]
+
+    def _open_segment(self) -> Optional[str]:
+        segments = self._segments()
+        if segments and not os.path.exists(segments[-1] + _INDEX_SUFFIX):
+            return segments[-1]
+        return None
+
+    def _seal(self, path: str):
+        index = {'start': None, 'end': None, 'count': 0}
+        for field, _ in _INDEXED:
+            index[field] = {}
+        for offset, entry in self._read_lines(path):
+            index['start'] = entry['ts'] if index['start'] is None else min(index['start'], entry['ts'])
+            index['end'] = entry['ts'] if index['end'] is None else max(index['end'], entry['ts'])
+            index['count'] += 1
+            for field, key in _INDEXED:
+                index[field].setdefault(entry.get(key, ''), []).append(offset)
+
+        # Write then rename, so readers only ever see a complete index
+        temp_path = path + _INDEX_SUFFIX + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path + _INDEX_SUFFIX)
+        logger.info(f"Sealed command history segment {os.path.basename(path)} ({index['count']} commands)")
+
+    def _prune(self):
+        cutoff = time.time() - CONFIG.get('history_retention_days', 30) * 86400
+        for path in self._segments():
+            index = self._index(path)
+            if index is None or index['end'] is None or index['end'] >= cutoff:
+                continue
+            for stale in (path, path + _INDEX_SUFFIX):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            self._indexes.pop(path, None)
+
+    # Reading
+
+    def _index(self, path: str) -> Optional[Dict]:
+        """A sealed segment's index, or None while the segment is still open"""
+        index = self._indexes.get(path)
+        if index is not None:
+            self._indexes.move_to_end(path)
+            return index
+        try:
+            with open(path + _INDEX_SUFFIX, 'r') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        self._indexes[path] = index
+        if len(self._indexes) > 64:
+            self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def _read_lines(path: str, offsets: Optional[List[int]] = None) -> Iterator[Tuple[int, Dict]]:
+        """(offset, entry) for every line, or for the lines at these offsets"""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            if offsets is None:
+                offset = 0
+                for line in f:
+                    # Readers take no lock; a line still being appended has no newline yet
+                    if line.endswith(b'\n'):
+                        try:
+                            yield offset, json.loads(line)
+                        except ValueError:
+                            pass
+                    offset += len(line)
+                return
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    yield offset, json.loads(f.readline())
+                except ValueError:
+                    pass
+
+    def query(self, user: Optional[str] = None, server: Optional[str] = None, command: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None, limit: int = 50) -> List[Dict]:
+        """Matching entries, newest first"""
+        self.flush()
+        filters = [(field, key, value) for (field, key), value
+                   in zip(_INDEXED, (user, server, base_command(command) if command else None))
+                   if value is not None]
+        results: List[Dict] = []
+        for path in reversed(self._segments()):
+            index = self._index(path)
+            offsets = None
+            if index is not None:
+                if index['end'] is None or (since is not None and index['end'] < since) \
+                        or (until is not None and index['start'] > until):
+                    continue
+                if filters:
+                    matches = [set(index[field].get(value, ())) for field, _, value in filters]
+                    offsets = sorted(set.intersection(*matches))
+                    if not offsets:
+                        continue
+
+            entries = [entry for _, entry in self._read_lines(path, offsets)]
+            for entry in reversed(entries):
+                if since is not None and entry['ts'] < since or until is not None and entry['ts'] > until:
+                    continue
+                if any(entry.get(key) != value for _, key, value in filters):
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+_history = CommandHistory(HISTORY_DIR)
+atexit.register(_history.flush)
+
+
+def get_command_history() -> CommandHistory:
+    return _history
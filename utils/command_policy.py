@@ -0,0 +1,185 @@
+"""
+Command safety policy
+
+Rules allow or deny commands by base command, subcommand and an optional
+regex over the arguments, per role ('admin' for users in
+CONFIG['admin_users'], 'user' for everyone else). Rules from
+COMMAND_POLICY_FILE are checked before COMMAND_POLICY_RULES; the first match
+wins and commands no rule matches are allowed.
+
+A command is tokenized once and its base command normalized (case, '/',
+and any 'namespace:' prefix, so 'spigot:stop' is checked as 'stop'). Rules are indexed by base command, so only the rules for that
+command (plus '*' rules) are tried. ``execute ... run <command>`` is checked
+as both commands. Verdicts are cached per (role, command). The policy file
+is reloaded when it changes, at most every ``policy_reload_interval``
+seconds.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import CONFIG, COMMAND_POLICY_FILE, COMMAND_POLICY_RULES
+from utils.result_cache import normalize_command
+
+logger = logging.getLogger(__name__)
+
+ROLE_ADMIN = 'admin'
+ROLE_USER = 'user'
+
+Verdict = Tuple[bool, Optional[str]]
+
+
+def base_command(token: str) -> str:
+    """Normalize a base command token, dropping any plugin namespace ('bukkit:stop' -> 'stop')"""
+    return normalize_command(token).rpartition(':')[2]
+
+
+class PolicyRule:
+    """One compiled allow/deny rule"""
+
+    __slots__ = ('command', 'subcommand', 'args', 'roles', 'allow', 'dangerous', 'message', 'order')
+
+    def __init__(self, rule: Dict, order: int):
+        action = rule.get('action', 'deny')
+        if action not in ('allow', 'deny'):
+            raise ValueError(f"Unknown policy action: {action}")
+        self.command = base_command(rule['command'])
+        self.subcommand = rule['subcommand'].lower() if rule.get('subcommand') else None
+        self.args = re.compile(rule['args'], re.IGNORECASE) if rule.get('args') else None
+        self.roles = frozenset(rule.get('roles', (ROLE_ADMIN, ROLE_USER)))
+        self.allow = action == 'allow'
+        # Dangerous-command rules stand down while enable_dangerous_commands is on
+        self.dangerous = bool(rule.get('dangerous', False))
+        self.message = rule.get('message')
+        self.order = order
+
+    def matches(self, tokens: List[str], role: str) -> bool:
+        if role not in self.roles:
+            return False
+        if self.dangerous and CONFIG.get('enable_dangerous_commands', False):
+            return False
+        if self.subcommand is not None and (len(tokens) < 2 or tokens[1].lower() != self.subcommand):
+            return False
+        return self.args is None or bool(self.args.search(' '.join(tokens[1:])))
+
+    def verdict(self, command_name: str) -> Verdict:
+        if self.allow:
+            return True, None
+        if self.message:
+            return False, self.message
+        if self.dangerous:
+            return False, f"❌ Dangerous command '{command_name}' is restricted to admin users."
+        return False, f"❌ Command '{command_name}' is not allowed."
+
+
+class CommandPolicy:
+    """Compiled rule index with a verdict cache and hot reload of the policy file"""
+
+    def __init__(self, path: str, builtin_rules: List[Dict], cache_size: int = 1024):
+        self.path = path
+        self.builtin_rules = builtin_rules
+        self.cache_size = cache_size
+        self._index: Dict[str, List[PolicyRule]] = {}
+        self._wildcard: List[PolicyRule] = []
+        self._cache: "OrderedDict[Tuple[str, str], Verdict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file_mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.rule_count = 0
+        self.reload()
+
+    def _load_file_rules(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            self._file_mtime = None
+            return []
+        try:
+            self._file_mtime = os.path.getmtime(self.path)
+            with open(self.path, 'r') as f:
+                return json.load(f).get('rules', [])
+        except (json.JSONDecodeError, IOError, AttributeError) as e:
+            logger.error(f"Error loading command policy: {e}")
+            return []
+
+    def reload(self):
+        """Recompile the rules and drop cached verdicts"""
+        rules = []
+        for order, rule in enumerate(self._load_file_rules() + list(self.builtin_rules)):
+            try:
+                rules.append(PolicyRule(rule, order))
+            except (KeyError, ValueError, re.error) as e:
+                logger.error(f"Skipping invalid command policy rule {rule}: {e}")
+
+        wildcard = [rule for rule in rules if rule.command == '*']
+        index: Dict[str, List[PolicyRule]] = {}
+        for rule in rules:
+            if rule.command != '*':
+                index.setdefault(rule.command, []).append(rule)
+        # Each command's rules merged with the wildcard rules in their original order
+        for command, command_rules in index.items():
+            index[command] = sorted(command_rules + wildcard, key=lambda rule: rule.order)
+
+        with self._lock:
+            self._index = index
+            self._wildcard = wildcard
+            self._cache.clear()
+            self.rule_count = len(rules)
+        logger.info(f"Loaded {len(rules)} command policy rules")
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + CONFIG.get('policy_reload_interval', 5)
+        mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        if mtime != self._file_mtime:
+            self.reload()
+
+    def _evaluate(self, tokens: List[str], role: str) -> Verdict:
+        while tokens:
+            command_name = base_command(tokens[0])
+            for rule in self._index.get(command_name, self._wildcard):
+                if rule.matches(tokens, role):
+                    verdict = rule.verdict(command_name)
+                    if not verdict[0]:
+                        return verdict
+                    break
+            if command_name != 'execute' or 'run' not in tokens:
+                return True, None
+            # The command run by `execute` must pass on its own
+            tokens = tokens[tokens.index('run') + 1:]
+        return True, None
+
+    def check(self, command: str, role: str) -> Verdict:
+        """(allowed, error message) for a processed command run by a user with this role"""
+        self._maybe_reload()
+        # Spellings of one command share a verdict, but normalizing a long command
+        # costs more than caching each spelling separately
+        key = (role, command)
+        with self._lock:
+            verdict = self._cache.get(key)
+            if verdict is not None:
+                self._cache.move_to_end(key)
+                return verdict
+
+        verdict = self._evaluate(command.split(), role)
+        with self._lock:
+            self._cache[key] = verdict
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return verdict
+
+
+_policy = CommandPolicy(COMMAND_POLICY_FILE, COMMAND_POLICY_RULES, CONFIG.get('policy_cache_size', 1024))
+
+
+def get_command_policy() -> CommandPolicy:
+    return _policy
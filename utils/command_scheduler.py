@@ -0,0 +1,156 @@
+"""
+Per-server RCON command scheduling
+
+Limits how many commands run against one Minecraft server at once. Commands
+beyond the limit wait in a bounded priority queue; when the queue is full
+they are rejected immediately instead of piling up behind slow commands
+(unless they outrank a queued command, which is rejected in their place).
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_HIGH = 0      # admin users and server control
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2       # cosmetic commands (say, title, particles, ...)
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a server's queue is full or a queued command waited too long"""
+
+    def __init__(self, message: str, queued: int):
+        super().__init__(message)
+        self.queued = queued
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'granted', 'evicted')
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.granted = False
+        self.evicted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class ServerScheduler:
+    """Bounded-concurrency, priority-ordered admission for one server"""
+
+    def __init__(self, server_id: str, max_in_flight: int = 4, max_queue: int = 20):
+        self.server_id = server_id
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+        self.expired = 0
+        self.queue_wait = 0.0
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL, timeout: float = 10):
+        """Hold one of the server's in-flight slots for the duration of the block"""
+        self._acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, priority: int, timeout: float):
+        with self._cond:
+            if self._in_flight < self.max_in_flight and not self._queue:
+                self._in_flight += 1
+                self.admitted += 1
+                return
+
+            if len(self._queue) >= self.max_queue:
+                # A full queue still admits more important work by bumping the least important waiter
+                victim = max(self._queue) if self._queue else None
+                if victim is None or victim.priority <= priority:
+                    self.rejected += 1
+                    raise SchedulerBusyError(f"Server {self.server_id} is busy", len(self._queue))
+                self._queue.remove(victim)
+                heapq.heapify(self._queue)
+                victim.evicted = True
+                self._cond.notify_all()
+
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._queue, waiter)
+            self.queued_total += 1
+            started = time.monotonic()
+            deadline = started + timeout
+            while not waiter.granted:
+                if waiter.evicted:
+                    self.rejected += 1
+                    raise SchedulerBusyError(f"Server {self.server_id} is busy", len(self._queue))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(waiter)
+                    heapq.heapify(self._queue)
+                    self.expired += 1
+                    raise SchedulerBusyError(f"Server {self.server_id} is busy", len(self._queue))
+                self._cond.wait(remaining)
+            self.admitted += 1
+            self.queue_wait += time.monotonic() - started
+
+    def _release(self):
+        with self._cond:
+            if self._queue and self._in_flight <= self.max_in_flight:
+                # Hand the slot straight to the most important waiter
+                heapq.heappop(self._queue).granted = True
+                self._cond.notify_all()
+            else:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'queued_total': self.queued_total,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'queue_wait_ms': round(self.queue_wait * 1000, 3),
+            }
+
+
+_schedulers: Dict[str, ServerScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(server_id: str) -> ServerScheduler:
+    """Get (or create) the scheduler for a server, applying current CONFIG limits"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(server_id)
+        if scheduler is None:
+            scheduler = ServerScheduler(server_id)
+            _schedulers[server_id] = scheduler
+        scheduler.max_in_flight = max(1, CONFIG.get('max_in_flight_per_server', 4))
+        scheduler.max_queue = max(0, CONFIG.get('max_queued_per_server', 20))
+        return scheduler
+
+
+def get_scheduler_stats() -> Dict[str, Dict[str, float]]:
+    """Stats for every scheduler created so far"""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {server_id: scheduler.stats() for server_id, scheduler in schedulers.items()}
@@ -0,0 +1,101 @@
+"""
+Trigram index for "did you mean" command suggestions
+
+A SuggestionIndex is built once over a set of command names. Each name is
+split into trigrams (padded, so short names like ``gm`` still have some) and
+a posting list maps every trigram to the names containing it. A lookup counts
+shared trigrams over the posting lists of the typed word's trigrams, then
+computes a banded edit distance only for the few names sharing the most, so
+it stays well under a millisecond even for servers with over a thousand
+commands.
+"""
+import heapq
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Tuple
+
+
+def _trigrams(word: str) -> List[str]:
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance with adjacent transpositions; anything over limit is reported as limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    # Only cells within limit of the diagonal can stay within limit
+    previous2 = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        best = current[0]
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous2 is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        previous2, previous = previous, current
+    return min(previous[-1], over)
+
+
+def max_distance(word: str) -> int:
+    """Typos allowed in a word: one for short words, two from six characters"""
+    return 1 if len(word) < 6 else 2
+
+
+class SuggestionIndex:
+    """Trigram index over a fixed set of command names"""
+
+    # Names compared by edit distance per lookup
+    CANDIDATES = 12
+
+    def __init__(self, words: Iterable[str]):
+        self.words = sorted({word.lower() for word in words if word})
+        self._known = frozenset(self.words)
+        self._postings: Dict[str, List[int]] = {}
+        for number, word in enumerate(self.words):
+            for trigram in set(_trigrams(word)):
+                self._postings.setdefault(trigram, []).append(number)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._known
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def closest(self, word: str, limit: int = 3) -> List[Tuple[int, str]]:
+        """(edit distance, name) for known names within a few typos of word, closest first"""
+        word = word.lower()
+        trigrams = set(_trigrams(word))
+        shared = Counter(chain.from_iterable(self._postings.get(trigram, ()) for trigram in trigrams))
+        allowed = max_distance(word)
+        # One typo changes at most three trigrams, so closer names share at least this many
+        needed = len(trigrams) - 3 * allowed
+        candidates = heapq.nlargest(self.CANDIDATES, shared, key=shared.__getitem__)
+        scored = []
+        for number in candidates:
+            name = self.words[number]
+            if shared[number] < needed or abs(len(name) - len(word)) > allowed:
+                continue
+            distance = edit_distance(word, name, allowed)
+            if distance <= allowed:
+                scored.append((distance, -shared[number], name))
+        return [(distance, name) for distance, _, name in sorted(scored)[:limit]]
+
+    def suggest(self, word: str, limit: int = 3) -> List[str]:
+        """Known names within a few typos of word, closest first"""
+        return [name for _, name in self.closest(word, limit)]
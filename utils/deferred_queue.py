@@ -0,0 +1,166 @@
+"""
+Durable queue of commands deferred while their server is offline
+
+Mutating admin commands (DEFERRABLE_COMMANDS) sent to a server that is down
+are stored in DEFERRED_COMMANDS_FILE instead of failing. A watcher thread
+checks servers with queued commands and, once RCON answers again, hands the
+server's queue to the replay handler, which runs it as one pipelined batch.
+
+The file is shared by every process (gateway and web workers) and only
+changed under an exclusive lock, so each command is taken for replay once.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config.settings import CONFIG, DEFERRED_COMMANDS_FILE, DEFERRABLE_COMMANDS
+from utils.circuit_breaker import get_breaker, probe_server
+from utils.result_cache import normalize_command, match_command_prefix
+
+logger = logging.getLogger(__name__)
+
+
+def is_deferrable(command: str) -> bool:
+    """Whether a command may be queued for a server that is offline"""
+    return match_command_prefix(normalize_command(command), DEFERRABLE_COMMANDS) is not None
+
+
+class DeferredCommandQueue:
+    """Per-server FIFO of deferred commands persisted to a JSON file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, List[Dict]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error loading deferred commands: {e}")
+            return {}
+
+    def _save(self, data: Dict[str, List[Dict]]):
+        # Write then rename, so a crash never leaves a half-written queue
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def add(self, server_id: str, command: str, user_name: str, source: str,
+            response_url: Optional[str] = None) -> Optional[int]:
+        """Queue a command; returns its position, or None if the server's queue is full
+
+        response_url is where the requester's Slack command takes replies.
+        """
+        with self._locked():
+            data = self._load()
+            queue = data.setdefault(server_id, [])
+            if len(queue) >= CONFIG.get('max_deferred_per_server', 100):
+                return None
+            queue.append({
+                'id': uuid.uuid4().hex[:8],
+                'command': command,
+                'user_name': user_name,
+                'source': source,
+                'queued_at': time.time(),
+                'response_url': response_url,
+            })
+            self._save(data)
+            return len(queue)
+
+    def take(self, server_id: str) -> List[Dict]:
+        """Remove and return everything queued for a server, oldest first"""
+        with self._locked():
+            data = self._load()
+            entries = data.pop(server_id, [])
+            if entries:
+                self._save(data)
+            return entries
+
+    def requeue(self, server_id: str, entries: List[Dict]):
+        """Put taken entries back in front of anything queued since"""
+        if not entries:
+            return
+        with self._locked():
+            data = self._load()
+            data[server_id] = entries + data.get(server_id, [])
+            self._save(data)
+
+    def pending(self) -> Dict[str, List[Dict]]:
+        """Everything queued, per server; reply URLs are left out since anyone holding one can post to Slack"""
+        with self._locked():
+            data = self._load()
+        return {server_id: [{key: value for key, value in entry.items() if key != 'response_url'} for entry in entries]
+                for server_id, entries in data.items()}
+
+
+_queue = DeferredCommandQueue(DEFERRED_COMMANDS_FILE)
+
+
+def get_deferred_queue() -> DeferredCommandQueue:
+    return _queue
+
+
+class ReplayWatcher:
+    """Background thread that replays a server's queue once its RCON answers"""
+
+    def __init__(self, queue: DeferredCommandQueue, handler: Callable[[str], None]):
+        self.queue = queue
+        self.handler = handler
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="deferred-replay", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(CONFIG.get('deferred_replay_poll_interval', 15))
+            self._wake.clear()
+            if not CONFIG.get('enable_deferred_commands', False):
+                continue
+            for server_id, entries in self.queue.pending().items():
+                if not entries or not probe_server(server_id):
+                    continue
+                # The server answered, so don't let a stale open breaker reject the replay
+                get_breaker(server_id).record_success()
+                try:
+                    self.handler(server_id)
+                except Exception as e:
+                    logger.error(f"Error replaying deferred commands for {server_id}: {e}")
+
+
+_watcher: Optional[ReplayWatcher] = None
+
+
+def start_replay_watcher(handler: Callable[[str], None]):
+    """Start watching for servers with queued commands to come back"""
+    global _watcher
+    if _watcher is None:
+        _watcher = ReplayWatcher(_queue, handler)
+
+
+def wake_replay_watcher(server_id: Optional[str] = None):
+    """Check queued servers now instead of at the next poll, e.g. after a server start"""
+    if _watcher is not None:
+        _watcher.wake()
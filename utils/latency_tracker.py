@@ -0,0 +1,114 @@
+"""
+Latency history and adaptive RCON timeouts
+
+Records how long each (server, base command) takes in a small streaming
+quantile sketch and derives per-command timeouts from it, so `list` fails
+fast on a hung server while `save-all` on a big world keeps its headroom.
+"""
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import CONFIG
+
+
+class QuantileSketch:
+    """Streaming quantile estimate with bounded relative error
+
+    Values fall into logarithmic buckets (as in DDSketch), so any quantile is
+    accurate to within ``relative_accuracy`` of the true value, memory stays
+    bounded by ``max_buckets`` and adding a value is O(1).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, max_buckets: int = 256, min_value: float = 1e-4):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float):
+        value = max(value, self.min_value)
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.max = max(self.max, value)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        # Fold the two lowest buckets together; only the fast tail loses precision
+        lowest, second = sorted(self.buckets)[:2]
+        self.buckets[second] += self.buckets.pop(lowest)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i]
+                return min(2 * self.gamma ** index / (self.gamma + 1), self.max)
+        return self.max
+
+
+class LatencyTracker:
+    """Per (server, base command) latency sketches and the timeouts derived from them"""
+
+    def __init__(self, max_commands: int = 500):
+        self.max_commands = max_commands
+        self._sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        self._lock = threading.Lock()
+
+    def record(self, server_id: str, base_command: str, seconds: float):
+        key = (server_id, base_command)
+        with self._lock:
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                # Base commands come from user input, so cap how many are tracked
+                if len(self._sketches) >= self.max_commands:
+                    return
+                sketch = self._sketches[key] = QuantileSketch()
+            sketch.add(seconds)
+
+    def timeout_for(self, server_id: str, base_command: str) -> float:
+        """Timeout in seconds: p99 x margin clamped to the floor/ceiling, once there is enough history"""
+        default = CONFIG.get('rcon_timeout', 30)
+        if not CONFIG.get('adaptive_timeouts', True):
+            return default
+        with self._lock:
+            sketch = self._sketches.get((server_id, base_command))
+            if sketch is None or sketch.count < CONFIG.get('adaptive_timeout_min_samples', 20):
+                return default
+            p99 = sketch.quantile(0.99)
+        timeout = p99 * CONFIG.get('adaptive_timeout_margin', 3)
+        timeout = max(CONFIG.get('adaptive_timeout_floor', 2), min(timeout, CONFIG.get('adaptive_timeout_ceiling', 120)))
+        return round(timeout, 1)
+
+    def table(self, server_id: Optional[str] = None) -> List[Dict[str, object]]:
+        """Learned latencies and timeouts, slowest commands first"""
+        with self._lock:
+            items = [(key, sketch.count, sketch.quantile(0.5), sketch.quantile(0.99))
+                     for key, sketch in self._sketches.items()
+                     if server_id is None or key[0] == server_id]
+        rows = [{
+            'server_id': sid,
+            'command': base_command,
+            'samples': count,
+            'p50_ms': round(p50 * 1000, 1),
+            'p99_ms': round(p99 * 1000, 1),
+            'timeout': self.timeout_for(sid, base_command),
+        } for (sid, base_command), count, p50, p99 in items]
+        rows.sort(key=lambda row: row['p99_ms'], reverse=True)
+        return rows
+
+
+_tracker = LatencyTracker()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    return _tracker
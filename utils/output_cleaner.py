@@ -0,0 +1,99 @@
+"""
+Cleaning of RCON output and MOTD text
+
+Strips ANSI escape sequences, Minecraft § formatting codes and control
+characters and collapses blank lines, with precompiled patterns applied in
+that order. Passes whose marker character does not occur in the text are
+skipped. ``StreamingOutputCleaner`` gives the same result for output that
+arrives in chunks.
+"""
+import re
+from typing import Iterable, Iterator
+
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+_SECTION_CODES = re.compile(r'§[0-9a-fk-or]')
+_CONTROL = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+_FORMATTING = re.compile(r'\x1b\[[0-9;]*m|§[0-9a-fk-or]', re.IGNORECASE)
+# Chunk endings that could be the start of a code continued in the next chunk
+_PARTIAL_CODE = re.compile(r'(?:§(?:\x1b\[[0-9;]*m)*)?(?:\x1b(?:\[[0-9;]*)?)?\Z')
+_CODE_CHARACTERS = '§\x1b[0123456789;m'
+
+
+def _strip_codes(text: str) -> str:
+    # One pass per kind of code is faster than a combined alternation, which
+    # loses the literal-prefix search and is tried at every position
+    if '\x1b' in text:
+        text = _ANSI.sub('', text)
+    if '§' in text:
+        text = _SECTION_CODES.sub('', text)
+    return _CONTROL.sub('', text)
+
+
+def clean_output_text(text: str) -> str:
+    """Clean RCON output text from Minecraft formatting codes and control characters"""
+    if not text:
+        return ""
+    return _BLANK_LINES.sub('\n', _strip_codes(text)).strip()
+
+
+def strip_formatting(text: str) -> str:
+    """Remove ANSI sequences and § formatting codes (any case), e.g. from a MOTD"""
+    return _FORMATTING.sub('', text) if text else ""
+
+
+class StreamingOutputCleaner:
+    """Incremental ``clean_output_text`` for output that arrives in chunks
+
+    ``feed()`` returns the cleaned text that is final so far; ``finish()``
+    returns the rest. Joined together they equal ``clean_output_text`` of
+    the whole output. Only a possibly unfinished code and trailing
+    whitespace are held back between chunks.
+    """
+
+    def __init__(self):
+        self._partial = ""
+        self._whitespace = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        text = self._partial + chunk
+        # Only the trailing run of characters a code can contain needs searching
+        match = _PARTIAL_CODE.search(text, len(text.rstrip(_CODE_CHARACTERS)))
+        self._partial = match.group() if match else ""
+        if self._partial:
+            text = text[:-len(self._partial)]
+        return self._emit(_strip_codes(text))
+
+    def finish(self) -> str:
+        # A code cut off by the end of the output is cleaned like any other text
+        text = _strip_codes(self._partial)
+        self._partial = ""
+        output = self._emit(text)
+        self._whitespace = ""
+        return output
+
+    def _emit(self, text: str) -> str:
+        text = self._whitespace + text
+        head = text.rstrip()
+        # Trailing whitespace may still merge with blank lines in the next chunk
+        self._whitespace = text[len(head):]
+        if not head:
+            return ""
+        head = _BLANK_LINES.sub('\n', head)
+        if not self._started:
+            head = head.lstrip()
+            self._started = bool(head)
+        return head
+
+
+def iter_clean_output(chunks: Iterable[str]) -> Iterator[str]:
+    """Clean a stream of output chunks (e.g. ``RconEngine.stream()``) as they arrive"""
+    cleaner = StreamingOutputCleaner()
+    for chunk in chunks:
+        cleaned = cleaner.feed(chunk)
+        if cleaned:
+            yield cleaned
+    tail = cleaner.finish()
+    if tail:
+        yield tail
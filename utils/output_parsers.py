@@ -0,0 +1,194 @@
+"""
+Structured parsing of RCON command output
+
+Parsers turn the cleaned text of common commands into JSON-ready dicts so API
+clients don't each have to regex the replies themselves. Each parser is
+registered against a pattern matching the command it understands;
+``parse_output()`` finds the parser for a command and runs it. Unknown commands,
+error results and output a parser doesn't recognise give ``None``.
+"""
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from utils.result_cache import normalize_command
+
+logger = logging.getLogger(__name__)
+
+Parser = Callable[[str, 're.Match'], Optional[Dict[str, Any]]]
+
+_PARSERS: List[Tuple[str, Pattern, Parser]] = []
+
+OUTPUT_FORMATS = ('text', 'json')
+
+
+def output_parser(name: str, command_pattern: str):
+    """Register a parser for commands matching ``command_pattern`` (normalized, without '/' or 'minecraft:')"""
+    pattern = re.compile(command_pattern + r'\Z')
+
+    def register(func: Parser) -> Parser:
+        _PARSERS.append((name, pattern, func))
+        return func
+    return register
+
+
+def find_parser(command: str) -> Optional[Tuple[str, Parser, 're.Match']]:
+    """The registered parser for a command, with the match of its command pattern"""
+    normalized = normalize_command(command)
+    for name, pattern, func in _PARSERS:
+        match = pattern.match(normalized)
+        if match:
+            return name, func, match
+    return None
+
+
+def parse_output(command: str, output: str) -> Optional[Dict[str, Any]]:
+    """Parse a command's cleaned output into a dict, or None if it can't be parsed"""
+    if not output or output.startswith("❌"):
+        return None
+    found = find_parser(command)
+    if found is None:
+        return None
+    name, func, match = found
+    try:
+        parsed = func(output, match)
+    except (ValueError, IndexError) as e:
+        logger.debug(f"{name} parser could not read output of '{command}': {e}")
+        return None
+    if parsed is not None:
+        parsed['type'] = name
+    return parsed
+
+
+def _split_names(names: str) -> List[str]:
+    return [name.strip() for name in re.split(r',\s*|\s+and\s+', names.strip()) if name.strip()]
+
+
+_LIST = re.compile(r'There are (\d+)(?: of a max(?: of)? |/)(\d+) players online:?(.*)', re.DOTALL)
+_LIST_UUID = re.compile(r'(\S+) \(([0-9a-f-]{36})\)')
+
+
+@output_parser('players', r'list(?: (uuids))?')
+def parse_list(output, match):
+    """``There are 3 of a max of 20 players online: a, b, c``"""
+    found = _LIST.search(output)
+    if not found:
+        return None
+    online, maximum, names = found.groups()
+    result = {'online': int(online), 'max': int(maximum)}
+    if match.group(1):
+        players = _LIST_UUID.findall(names)
+        result['players'] = [name for name, _ in players]
+        result['uuids'] = dict(players)
+    else:
+        result['players'] = _split_names(names)
+    return result
+
+
+_NUMBER = r'\*?(\d+(?:\.\d+)?)'
+_TPS = re.compile(rf'TPS from last ([^:]+):\s*{_NUMBER}(?:,\s*{_NUMBER})*')
+
+
+@output_parser('tps', r'tps')
+def parse_tps(output, match):
+    """Paper/Spigot ``TPS from last 1m, 5m, 15m: 20.0, 20.0, 20.0`` (``*`` marks a capped value)"""
+    found = _TPS.search(output)
+    if not found:
+        return None
+    periods = [period.strip() for period in found.group(1).split(',')]
+    values = [float(value) for value in re.findall(_NUMBER, output[found.end(1):found.end()])]
+    if len(values) != len(periods):
+        return None
+    return {'tps': dict(zip(periods, values))}
+
+
+_MSPT = re.compile(r'from last ([^:]+):\s*(.+)', re.DOTALL)
+_MSPT_TRIPLE = re.compile(r'(\d+(?:\.\d+)?)/(\d+(?:\.\d+)?)/(\d+(?:\.\d+)?)')
+
+
+@output_parser('mspt', r'mspt')
+def parse_mspt(output, match):
+    """Paper ``Server tick times (avg/min/max) from last 5s, 10s, 1m: ◴ 1.2/0.8/3.4, ...``"""
+    found = _MSPT.search(output)
+    if not found:
+        return None
+    periods = [period.strip() for period in found.group(1).split(',')]
+    triples = _MSPT_TRIPLE.findall(found.group(2))
+    if len(triples) != len(periods):
+        return None
+    return {'mspt': {
+        period: {'avg': float(avg), 'min': float(low), 'max': float(high)}
+        for period, (avg, low, high) in zip(periods, triples)
+    }}
+
+
+_WHITELIST = re.compile(r'There are (\d+) whitelisted player(?:s|\(s\)):(.*)', re.DOTALL)
+
+
+@output_parser('whitelist', r'whitelist list')
+def parse_whitelist(output, match):
+    """``There are 2 whitelisted player(s): a, b`` or ``There are no whitelisted players``"""
+    if 'no whitelisted players' in output:
+        return {'count': 0, 'players': []}
+    found = _WHITELIST.search(output)
+    if not found:
+        return None
+    return {'count': int(found.group(1)), 'players': _split_names(found.group(2))}
+
+
+_BAN_COUNT = re.compile(r'There are (\d+) bans?(?:\(s\))?:')
+_BAN = re.compile(r'^(.+?) was banned by (.+?): (.*)$', re.MULTILINE)
+
+
+@output_parser('bans', r'banlist(?: (?:players|ips))?')
+def parse_banlist(output, match):
+    """``There are 2 ban(s):`` followed by ``<target> was banned by <source>: <reason>`` lines"""
+    if 'There are no bans' in output:
+        return {'count': 0, 'bans': []}
+    found = _BAN_COUNT.search(output)
+    if not found:
+        return None
+    bans = [{'target': target, 'source': source, 'reason': reason}
+            for target, source, reason in _BAN.findall(output[found.end():])]
+    return {'count': int(found.group(1)), 'bans': bans}
+
+
+_LP_FIELD = re.compile(r'^\s*-?\s*(UUID|Status|Primary Group|Prefix|Suffix):\s*(.*?)\s*$', re.MULTILINE)
+_LP_PARENTS = re.compile(r'Parent Groups:\s*\n((?:\s*>\s*.+\n?)+)')
+
+
+@output_parser('lp_user', r'(?:lp|luckperms) user \S+ info')
+def parse_lp_user_info(output, match):
+    """LuckPerms ``lp user <name> info``"""
+    user = re.search(r'User Info:\s*(\S+)', output)
+    if not user:
+        return None
+    fields = {key.lower().replace(' ', '_'): value for key, value in _LP_FIELD.findall(output)}
+    parents = _LP_PARENTS.search(output)
+    result = {
+        'username': user.group(1),
+        'uuid': fields.get('uuid'),
+        'online': fields.get('status', '').lower() == 'online',
+        'parent_groups': re.findall(r'>\s*(\S+)', parents.group(1)) if parents else [],
+        'primary_group': fields.get('primary_group'),
+    }
+    for key in ('prefix', 'suffix'):
+        value = fields.get(key)
+        result[key] = None if value in (None, 'None') else value.strip('"')
+    return result
+
+
+_NBT_NUMBER = r'(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)[dDfF]?'
+# An NBT list of three doubles, e.g. the `Pos` tag: [-1.5d, 64.0d, 2.0d]
+NBT_POSITION = re.compile(rf'\[\s*{_NBT_NUMBER}\s*,\s*{_NBT_NUMBER}\s*,\s*{_NBT_NUMBER}\s*\]')
+_POSITION = re.compile(r'(\S+) has the following entity data: ' + NBT_POSITION.pattern)
+
+
+@output_parser('position', r'data get entity (\S+) pos')
+def parse_entity_position(output, match):
+    """``Steve has the following entity data: [-1.5d, 64.0d, 2.0d]``"""
+    found = _POSITION.search(output)
+    if not found:
+        return None
+    entity, x, y, z = found.groups()
+    return {'entity': entity, 'x': float(x), 'y': float(y), 'z': float(z)}
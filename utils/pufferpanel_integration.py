@@ -15,6 +15,10 @@ from datetime import datetime
 import sqlite3
 
 from utils.slack_notifications import notify_server_status, notify_command
+from utils.deferred_queue import wake_replay_watcher
+from utils.output_cleaner import strip_formatting
+from utils.server_registry import get_server_registry
+from utils.server_discovery import get_server_discovery
 
 logger = logging.getLogger(__name__)
 
@@ -89,7 +93,11 @@ class PufferPanelManager:
             
             # Add server properties if available
             properties_path = os.path.join(server_dir, 'server.properties')
-            if os.path.exists(properties_path):
+            if self.server_root == get_server_registry().root:
+                properties = get_server_registry().get(server_id).properties
+                if properties:
+                    server_info['properties'] = properties
+            elif os.path.exists(properties_path):
                 server_info['properties'] = self.parse_server_properties(properties_path)
             
             # Add resource usage if running
@@ -109,8 +117,7 @@ class PufferPanelManager:
             motd = config['data']['motd'].get('value', '')
             if motd:
                 # Clean up Minecraft formatting codes
-                import re
-                clean_motd = re.sub(r'§[0-9a-fA-F]', '', motd)
+                clean_motd = strip_formatting(motd)
                 clean_motd = clean_motd.replace('"', '').strip()
                 if clean_motd:
                     return clean_motd
@@ -194,12 +201,16 @@ class PufferPanelManager:
         """Get information for all servers"""
         servers = []
         try:
-            for file in os.listdir(self.server_root):
-                if file.endswith('.json'):
-                    server_id = file[:-5]  # Remove .json extension
-                    server_info = self.get_server_info(server_id)
-                    if server_info:
-                        servers.append(server_info)
+            # Server discovery already follows the root; only scan it when discovery is off
+            discovery = get_server_discovery()
+            if discovery is not None and discovery.root == self.server_root:
+                server_ids = discovery.server_ids()
+            else:
+                server_ids = [file[:-5] for file in os.listdir(self.server_root) if file.endswith('.json')]
+            for server_id in server_ids:
+                server_info = self.get_server_info(server_id)
+                if server_info:
+                    servers.append(server_info)
         except Exception as e:
             logger.error(f"Error listing servers: {e}")
         
@@ -234,6 +245,9 @@ class PufferPanelManager:
                 if success:
                     logger.info(f"Server {server_id} {action} successful")
                     notify_server_status(server_info['name'], action, user)
+                    if action in ['start', 'restart']:
+                        # Replay commands queued while it was down as soon as RCON answers
+                        wake_replay_watcher(server_id)
                 else:
                     logger.error(f"Server {server_id} {action} failed")
                 
@@ -0,0 +1,476 @@
+"""
+Asyncio RCON engine
+
+Keeps one socket per server and queues any number of concurrent commands on
+it, matching responses to callers by RCON request id. A background event
+loop thread drives every connection, and ``RconEngine`` gives synchronous
+callers (Flask/gunicorn threads) a blocking facade.
+
+Minecraft reads one packet per ``read()`` and drops the connection when a
+read holds more than one, so a connection never has more than one packet the
+server has not answered yet: the next queued packet is written when the
+first reply to the previous one arrives. The server handles packets in
+order, so the reply to a later packet also ends the response to every
+earlier command; when nothing else is queued, an empty RESPONSE_VALUE
+sentinel packet (as in ``utils.rcon_client``) ends the last one.
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import struct
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from config.settings import SERVERS, CONFIG, RCON_HOST
+from utils.rcon_client import (RconError, RconConnectionError, RconAuthError, RconTimeoutError,
+                               RconNotSentError, SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE, SERVERDATA_EXECCOMMAND,
+                               SERVERDATA_RESPONSE_VALUE, MAX_PACKET_SIZE, encode_packet,
+                               decode_packet, join_response, iter_decoded, quick_ack)
+
+logger = logging.getLogger(__name__)
+
+_SIZE = struct.Struct('<i')
+
+
+class _PendingResponse:
+    """Fragments collected so far for one in-flight command"""
+    __slots__ = ('future', 'parts', 'on_chunk')
+
+    def __init__(self, future: asyncio.Future, on_chunk: Optional[Callable[[bytes], None]] = None):
+        self.future = future
+        self.parts: List[bytes] = []
+        self.on_chunk = on_chunk
+
+
+class AsyncRconConnection:
+    """One authenticated RCON socket shared by many concurrent commands"""
+
+    def __init__(self, server_id: str, host: str, port: int, password: str, timeout: float = 30):
+        self.server_id = server_id
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._sock = None
+        self._pending: Dict[int, _PendingResponse] = {}
+        # Packets waiting for their turn on the socket
+        self._outbox: Deque[Tuple[int, bytes]] = deque()
+        # Written packets whose response may not be complete, in write order (True for commands)
+        self._written: "OrderedDict[int, bool]" = OrderedDict()
+        # The written packet the server has not answered yet
+        self._unacked: Optional[int] = None
+        self._ids = itertools.count(1)
+        self.closed = True
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self):
+        """Open the socket, authenticate and start the response dispatcher"""
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        except asyncio.TimeoutError:
+            raise RconTimeoutError(f"Connection to {self.host}:{self.port} timed out")
+        except OSError as e:
+            raise RconConnectionError(f"Connection to {self.host}:{self.port} failed: {e}")
+        self._sock = self._writer.get_extra_info('socket')
+
+        try:
+            await asyncio.wait_for(self._authenticate(), self.timeout)
+        except asyncio.TimeoutError:
+            self._close_transport()
+            raise RconTimeoutError("Timed out during RCON authentication")
+        except RconError:
+            self._close_transport()
+            raise
+
+        self.closed = False
+        self._reader_task = asyncio.get_running_loop().create_task(self._dispatch_responses())
+
+    async def command(self, command: str, timeout: Optional[float] = None,
+                      on_chunk: Optional[Callable[[bytes], None]] = None) -> str:
+        """Queue a command and wait for its complete response
+
+        With ``on_chunk`` each fragment is handed over as it arrives instead
+        of being buffered, and an empty string is returned.
+        """
+        if self.closed:
+            raise RconNotSentError("Not connected")
+        request_id, response = self._enqueue(command, on_chunk)
+        try:
+            self._pump()
+            await asyncio.wait_for(response.future, timeout if timeout is not None else self.timeout)
+            return join_response(response.parts)
+        except asyncio.TimeoutError:
+            raise RconTimeoutError("Timed out waiting for RCON response")
+        finally:
+            self._release(request_id)
+
+    async def command_many(self, commands: List[str], timeout: Optional[float] = None) -> List[Union[str, RconError]]:
+        """Queue several commands in order and collect their responses
+
+        Returns one entry per command: the response text or the RconError
+        for that command. ``timeout`` applies to each response in turn.
+        """
+        if self.closed:
+            raise RconNotSentError("Not connected")
+        timeout = timeout if timeout is not None else self.timeout
+        registered = []
+        for command in commands:
+            try:
+                registered.append(self._enqueue(command))
+            except RconError as e:
+                registered.append(e)
+
+        results: List[Union[str, RconError]] = []
+        try:
+            self._pump()
+            for entry in registered:
+                if isinstance(entry, RconError):
+                    results.append(entry)
+                    continue
+                request_id, response = entry
+                try:
+                    await asyncio.wait_for(response.future, timeout)
+                    results.append(join_response(response.parts))
+                except asyncio.TimeoutError:
+                    results.append(RconTimeoutError("Timed out waiting for RCON response"))
+                except RconError as e:
+                    results.append(e)
+                finally:
+                    self._release(request_id)
+        except RconError as e:
+            results.extend([e] * (len(commands) - len(results)))
+        finally:
+            for entry in registered:
+                if not isinstance(entry, RconError):
+                    self._release(entry[0])
+        return results
+
+    def _enqueue(self, command: str, on_chunk: Optional[Callable[[bytes], None]] = None):
+        """Allocate an id for a command and queue its packet"""
+        request_id = self._next_id()
+        # Encoding raises for oversized commands, before anything is registered
+        packet = encode_packet(request_id, SERVERDATA_EXECCOMMAND, command)
+        response = _PendingResponse(asyncio.get_running_loop().create_future(), on_chunk)
+        self._pending[request_id] = response
+        self._outbox.append((request_id, packet))
+        return request_id, response
+
+    def _release(self, request_id: int):
+        """Forget a command once its caller stops waiting for it"""
+        response = self._pending.pop(request_id, None)
+        if response is None or (response.future.done() and not response.future.cancelled()):
+            return
+        if request_id == self._unacked:
+            # The server never answered, so what it reads next is unknown
+            logger.info(f"RCON command on {self.server_id} abandoned before the server answered; reconnecting")
+            self.close()
+        else:
+            self._outbox = deque(entry for entry in self._outbox if entry[0] != request_id)
+
+    def _pump(self):
+        """Write the next packet if the server has answered the previous one"""
+        if self._unacked is not None or self.closed:
+            return
+        if self._writer is None or self._writer.is_closing():
+            # The transport is gone before the dispatcher noticed; queued commands were never written
+            self.close()
+            return
+        if self._outbox:
+            packet_id, data = self._outbox.popleft()
+            self._written[packet_id] = True
+        elif self._written and next(reversed(self._written.values())):
+            # Nothing follows the last command, so a sentinel has to end its response
+            packet_id = self._next_id()
+            data = encode_packet(packet_id, SERVERDATA_RESPONSE_VALUE, "")
+            self._written[packet_id] = False
+        else:
+            return
+        self._unacked = packet_id
+        self._write_raw(data)
+
+    def close(self):
+        """Close the socket and fail every queued and in-flight command"""
+        self.closed = True
+        if self._reader_task and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._close_transport()
+        self._fail_pending(RconConnectionError("Connection closed"))
+
+    async def _authenticate(self):
+        request_id = self._next_id()
+        self._write(request_id, SERVERDATA_AUTH, self.password)
+        while True:
+            response_id, packet_type, _ = await self._read_packet()
+            # Source servers send an empty RESPONSE_VALUE ahead of the auth response
+            if packet_type != SERVERDATA_AUTH_RESPONSE:
+                continue
+            if response_id == -1:
+                raise RconAuthError("RCON authentication failed")
+            if response_id == request_id:
+                return
+
+    async def _dispatch_responses(self):
+        try:
+            while True:
+                response_id, _, body = await self._read_packet()
+                if response_id not in self._written:
+                    logger.debug(f"Discarding RCON packet with unexpected id {response_id} from {self.server_id}")
+                    continue
+                if response_id == self._unacked:
+                    self._unacked = None
+                # Packets are answered in order, so every response before this one is complete
+                for packet_id in list(self._written):
+                    if packet_id == response_id:
+                        break
+                    del self._written[packet_id]
+                    response = self._pending.get(packet_id)
+                    if response is not None and not response.future.done():
+                        response.future.set_result(None)
+
+                if self._written[response_id]:
+                    response = self._pending.get(response_id)
+                    if response is not None:
+                        if response.on_chunk is not None:
+                            response.on_chunk(body)
+                        else:
+                            response.parts.append(body)
+                else:
+                    # A sentinel's reply only marks the end of the command before it
+                    del self._written[response_id]
+                self._pump()
+        except asyncio.CancelledError:
+            pass
+        except RconError as e:
+            logger.info(f"RCON connection to {self.server_id} lost: {e}")
+            self.close()
+        except Exception as e:
+            logger.error(f"Unexpected error reading from {self.server_id}: {e}")
+            self.close()
+
+    async def _read_packet(self):
+        try:
+            (size,) = _SIZE.unpack(await self._reader.readexactly(_SIZE.size))
+            if size < 10 or size > MAX_PACKET_SIZE:
+                raise RconError(f"Invalid RCON packet size: {size}")
+            packet = decode_packet(await self._reader.readexactly(size))
+            if self._sock is not None:
+                quick_ack(self._sock)
+            return packet
+        except asyncio.IncompleteReadError:
+            raise RconConnectionError("Connection closed by server")
+        except OSError as e:
+            raise RconConnectionError(f"Connection lost: {e}")
+
+    def _write(self, request_id: int, packet_type: int, body: str):
+        self._write_raw(encode_packet(request_id, packet_type, body))
+
+    def _write_raw(self, data: bytes):
+        if self._writer is None or self._writer.is_closing():
+            raise RconConnectionError("Connection closed")
+        self._writer.write(data)
+
+    def _next_id(self) -> int:
+        request_id = next(self._ids)
+        if request_id >= 0x7FFFFFFF:
+            self._ids = itertools.count(1)
+            request_id = next(self._ids)
+        return request_id
+
+    def _fail_pending(self, error: Exception):
+        unsent = {packet_id for packet_id, _ in self._outbox}
+        for request_id, response in self._pending.items():
+            if not response.future.done():
+                response.future.set_exception(RconNotSentError(str(error)) if request_id in unsent else error)
+        self._pending.clear()
+        self._outbox.clear()
+        self._written.clear()
+        self._unacked = None
+
+    def _close_transport(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+        self._sock = None
+
+
+class AsyncRconEngine:
+    """Owns one multiplexed connection per server"""
+
+    def __init__(self):
+        self._connections: Dict[str, AsyncRconConnection] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self.commands = 0
+        self.timeouts = 0
+        self.reconnects = 0
+
+    async def command(self, server_id: str, command: str, timeout: Optional[float] = None,
+                      on_chunk: Optional[Callable[[bytes], None]] = None) -> str:
+        """Run a command on a server, reconnecting once if its socket died before the command was written
+
+        A command that reached the socket is never sent again, since the
+        server may already have run it.
+        """
+        self.commands += 1
+        connection = await self._connection(server_id)
+        try:
+            return await connection.command(command, timeout, on_chunk)
+        except RconTimeoutError:
+            self.timeouts += 1
+            raise
+        except RconNotSentError:
+            logger.info(f"RCON connection to {server_id} lost, reconnecting")
+            self.reconnects += 1
+            connection = await self._connection(server_id)
+            return await connection.command(command, timeout, on_chunk)
+
+    async def command_many(self, server_id: str, commands: List[str],
+                           timeout: Optional[float] = None) -> List[Union[str, RconError]]:
+        """Pipeline several commands to one server over its shared socket
+
+        If the connection fails, the commands that were never written are
+        sent once more on a new connection; the others report the error.
+        """
+        self.commands += len(commands)
+        connection = await self._connection(server_id)
+        try:
+            results = await connection.command_many(commands, timeout)
+        except RconNotSentError as e:
+            results = [e] * len(commands)
+        unsent = [index for index, result in enumerate(results) if isinstance(result, RconNotSentError)]
+        if unsent:
+            logger.info(f"RCON connection to {server_id} lost, reconnecting")
+            self.reconnects += 1
+            try:
+                connection = await self._connection(server_id)
+                retried = await connection.command_many([commands[index] for index in unsent], timeout)
+            except RconError as e:
+                # Only connecting can fail here, so these commands were still not sent
+                retried = [RconNotSentError(str(e)) if isinstance(e, RconConnectionError) else e] * len(unsent)
+            for index, result in zip(unsent, retried):
+                results[index] = result
+        self.timeouts += sum(1 for result in results if isinstance(result, RconTimeoutError))
+        return results
+
+    async def _connection(self, server_id: str) -> AsyncRconConnection:
+        server_config = SERVERS[server_id]
+        lock = self._connect_locks.setdefault(server_id, asyncio.Lock())
+        async with lock:
+            connection = self._connections.get(server_id)
+            if connection and (connection.port, connection.password) != (server_config['port'], server_config['password']):
+                connection.close()
+                connection = None
+            if connection is None or connection.closed:
+                connection = AsyncRconConnection(server_id, RCON_HOST, server_config['port'],
+                                                 server_config['password'],
+                                                 timeout=CONFIG.get('rcon_timeout', 30))
+                await connection.connect()
+                self._connections[server_id] = connection
+            return connection
+
+    def close(self):
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            'commands': self.commands,
+            'timeouts': self.timeouts,
+            'reconnects': self.reconnects,
+            'connections': {
+                server_id: {'connected': not connection.closed, 'in_flight': connection.in_flight}
+                for server_id, connection in self._connections.items()
+            },
+        }
+
+
+class RconEngine:
+    """Blocking facade over AsyncRconEngine running on a background event loop"""
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._engine = AsyncRconEngine()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="rcon-engine", daemon=True)
+        self._thread.start()
+
+    def execute(self, server_id: str, command: str, timeout: Optional[float] = None) -> str:
+        """Run a command and block the calling thread until it completes"""
+        timeout = CONFIG.get('rcon_timeout', 30) if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(self._engine.command(server_id, command, timeout), self._loop)
+        try:
+            # Connecting can take up to another timeout before the command is sent
+            return future.result(timeout * 2 + 1)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RconTimeoutError("Timed out waiting for RCON response")
+
+    def execute_many(self, server_id: str, commands: List[str],
+                     timeout: Optional[float] = None) -> List[Union[str, RconError]]:
+        """Pipeline several commands to one server and block until all complete"""
+        timeout = CONFIG.get('rcon_timeout', 30) if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(self._engine.command_many(server_id, commands, timeout), self._loop)
+        try:
+            return future.result(timeout * (len(commands) + 2) + 1)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RconTimeoutError("Timed out waiting for RCON batch")
+
+    def stream(self, server_id: str, command: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Run a command and yield its output packet by packet as it arrives"""
+        timeout = CONFIG.get('rcon_timeout', 30) if timeout is None else timeout
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._engine.command(server_id, command, timeout, on_chunk=chunks.put), self._loop)
+        future.add_done_callback(lambda _: chunks.put(None))
+
+        def fragments():
+            while True:
+                try:
+                    body = chunks.get(timeout=timeout * 2 + 1)
+                except queue.Empty:
+                    future.cancel()
+                    raise RconTimeoutError("Timed out waiting for RCON response")
+                if body is None:
+                    future.result()  # re-raise any RCON error
+                    return
+                yield body
+
+        return iter_decoded(fragments())
+
+    def stats(self) -> Dict[str, object]:
+        return asyncio.run_coroutine_threadsafe(self._stats(), self._loop).result(5)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._engine.close)
+
+    async def _stats(self):
+        return self._engine.stats()
+
+
+_engine: Optional[RconEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RconEngine:
+    """Get the process-wide RCON engine, starting its event loop on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RconEngine()
+        return _engine
+
+
+def get_engine_stats() -> Optional[Dict[str, object]]:
+    """Engine stats, or None if the engine has not been started"""
+    return _engine.stats() if _engine is not None else None
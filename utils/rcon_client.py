@@ -0,0 +1,372 @@
+"""
+Native Source RCON protocol client
+
+Speaks the RCON wire protocol used by Minecraft directly over a TCP socket,
+replacing the per-command ``mcrcon`` subprocess.
+
+Responses larger than one packet arrive as several packets with the same id.
+After each command we send an empty RESPONSE_VALUE "sentinel" packet; the
+server answers it only after finishing the command's response, so its reply
+marks the end of the fragments.
+
+Minecraft reads each packet with a single ``read()`` and drops the connection
+when that read does not return exactly one packet, so two packets must never
+reach it back to back. A packet is only written once the server has answered
+the previous one: the sentinel goes out after the first fragment of the
+command's response has arrived.
+"""
+import codecs
+import itertools
+import logging
+import select
+import socket
+import struct
+from typing import Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Packet types (SERVERDATA_EXECCOMMAND and SERVERDATA_AUTH_RESPONSE share a value)
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# Minecraft rejects client packets with a payload larger than this
+MAX_COMMAND_BYTES = 1446
+# Largest packet we are willing to read (the server caps responses at 4096 bytes of body)
+MAX_PACKET_SIZE = 4096 + 10
+
+_TCP_QUICKACK = getattr(socket, 'TCP_QUICKACK', None)
+
+_HEADER = struct.Struct('<iii')
+_SIZE = struct.Struct('<i')
+
+
+class RconError(Exception):
+    """Base class for RCON failures"""
+
+
+class RconConnectionError(RconError):
+    """Raised when the server cannot be reached or drops the connection"""
+
+
+class RconNotSentError(RconConnectionError):
+    """Reported for a queued command that was never written because the connection failed first"""
+
+
+class RconAuthError(RconError):
+    """Raised when the server rejects the RCON password"""
+
+
+class RconTimeoutError(RconError):
+    """Raised when the server does not answer in time"""
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    """Encode a single RCON packet"""
+    payload = body.encode('utf-8')
+    if len(payload) > MAX_COMMAND_BYTES:
+        raise RconError(f"Command too large for RCON ({len(payload)} bytes, max {MAX_COMMAND_BYTES})")
+    size = _HEADER.size - _SIZE.size + len(payload) + 2
+    return _HEADER.pack(size, request_id, packet_type) + payload + b'\x00\x00'
+
+
+def decode_packet(data: bytes) -> Tuple[int, int, bytes]:
+    """Decode the id, type and raw body of a packet (without its size prefix)"""
+    request_id, packet_type = struct.unpack_from('<ii', data)
+    return request_id, packet_type, data[8:-2]
+
+
+def join_response(parts: List[bytes]) -> str:
+    """Join response fragments and decode them once
+
+    Decoding after the join keeps multi-byte characters split across
+    packets intact and avoids quadratic string concatenation.
+    """
+    return b''.join(parts).decode('utf-8', errors='replace')
+
+
+def iter_decoded(parts) -> Iterator[str]:
+    """Incrementally decode an iterable of response fragments"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for body in parts:
+        text = decoder.decode(body)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def quick_ack(sock):
+    """Ask the kernel to ACK received data immediately (Linux only)
+
+    Minecraft writes each response packet separately with Nagle enabled, so
+    the sentinel reply waits for our ACK of the previous packet. Without this
+    a delayed ACK adds ~40 ms to every multi-packet exchange.
+    """
+    if _TCP_QUICKACK is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, _TCP_QUICKACK, 1)
+        except OSError:
+            pass
+
+
+class RconClient:
+    """Blocking RCON client holding one authenticated connection"""
+
+    def __init__(self, host: str, port: int, password: str, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._ids = itertools.count(1)
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    def connect(self):
+        """Open the TCP connection and authenticate"""
+        try:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except socket.timeout:
+            raise RconTimeoutError(f"Connection to {self.host}:{self.port} timed out")
+        except OSError as e:
+            raise RconConnectionError(f"Connection to {self.host}:{self.port} failed: {e}")
+        try:
+            self._authenticate()
+        except RconError:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the connection (safe to call more than once)"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def command(self, command: str, timeout: Optional[float] = None) -> str:
+        """Run a command and return the complete (reassembled) response body"""
+        return join_response(list(self._response_packets(command, timeout)))
+
+    def iter_command(self, command: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Run a command and yield its response text packet by packet
+
+        Stopping early is safe: the remaining fragments are drained so the
+        connection can be reused.
+        """
+        return iter_decoded(self._response_packets(command, timeout))
+
+    def _response_packets(self, command: str, timeout: Optional[float]) -> Iterator[bytes]:
+        if self._sock is None:
+            raise RconConnectionError("Not connected")
+        request_id = self._next_id()
+        sentinel_id = None
+        self._sock.settimeout(timeout if timeout is not None else self.timeout)
+        self._check_alive()
+        try:
+            self._send(request_id, SERVERDATA_EXECCOMMAND, command)
+        except RconConnectionError as e:
+            # A packet that could not be written in full is never run
+            raise RconNotSentError(str(e))
+
+        finished = False
+        try:
+            while True:
+                response_id, _, body = self._read_packet()
+                if response_id == request_id:
+                    if sentinel_id is None:
+                        # The server has read the command, so the sentinel arrives on its own
+                        sentinel_id = self._next_id()
+                        self._send(sentinel_id, SERVERDATA_RESPONSE_VALUE, "")
+                    yield body
+                elif response_id == sentinel_id:
+                    finished = True
+                    return
+                else:
+                    # Not an answer to this request (e.g. a duplicate sentinel reply); skip it
+                    logger.debug(f"Discarding RCON packet with unexpected id {response_id}")
+        finally:
+            if not finished and self._sock is not None:
+                if sentinel_id is None:
+                    self.close()
+                else:
+                    self._drain(sentinel_id)
+
+    def pipeline(self, commands: List[str], timeout: Optional[float] = None) -> List[Union[str, RconError]]:
+        """Run several commands on this connection and collect their responses in order
+
+        Each command is written as soon as the server answers the one before
+        it, and that answer also ends the previous command's response, so a
+        batch needs one round trip per command instead of two and only the
+        last command is followed by a sentinel.
+
+        Returns one entry per command: the response text, or the RconError
+        that prevented it from completing. Once the connection fails, every
+        remaining command is reported with that error, as RconNotSentError
+        for the commands that were never written.
+        """
+        if self._sock is None:
+            raise RconConnectionError("Not connected")
+        self._sock.settimeout(timeout if timeout is not None else self.timeout)
+        results: List[Union[str, RconError, None]] = [None] * len(commands)
+        # (index in commands, request id, packet); the sentinel has no index
+        packets = []
+        for index, command in enumerate(commands):
+            request_id = self._next_id()
+            try:
+                packets.append((index, request_id, encode_packet(request_id, SERVERDATA_EXECCOMMAND, command)))
+            except RconError as e:
+                results[index] = e
+        if not packets:
+            return results
+        sentinel_id = self._next_id()
+        packets.append((None, sentinel_id, encode_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, "")))
+
+        # Position of the packet being answered, and of the last one written
+        current, written = 0, -1
+        parts = []
+        try:
+            self._check_alive()
+            self._send_raw(packets[0][2])
+            written = 0
+            while True:
+                response_id, _, body = self._read_packet()
+                if response_id == packets[current][1]:
+                    parts.append(body)
+                elif written > current and response_id == packets[written][1]:
+                    # The server has moved on to the next packet, so this response is complete
+                    results[packets[current][0]] = join_response(parts)
+                    current, parts = written, [body]
+                    if packets[current][0] is None:
+                        return results
+                else:
+                    logger.debug(f"Discarding RCON packet with unexpected id {response_id}")
+                    continue
+                # The current packet has been read by the server; the next one can follow it
+                if written == current:
+                    self._send_raw(packets[written + 1][2])
+                    written += 1
+        except RconError as e:
+            for position, (index, _, _) in enumerate(packets):
+                if index is not None and results[index] is None:
+                    results[index] = e if position <= written else RconNotSentError(str(e))
+            return results
+
+    def _check_alive(self):
+        """Raise RconNotSentError if the server has already closed this connection
+
+        A connection to a restarted server still accepts a write, so the
+        command would be lost with no way to tell whether it ran. Nothing is
+        expected from the server between commands, so a readable socket that
+        holds no data has been closed.
+        """
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            if readable and not self._sock.recv(1, socket.MSG_PEEK):
+                raise RconNotSentError("Connection closed by server")
+        except RconNotSentError:
+            self.close()
+            raise
+        except (OSError, ValueError) as e:
+            self.close()
+            raise RconNotSentError(f"Connection lost: {e}")
+
+    def _drain(self, sentinel_id: int):
+        """Skip the rest of an abandoned response"""
+        try:
+            while self._read_packet()[0] != sentinel_id:
+                pass
+        except RconError:
+            self.close()
+
+    def ping(self, timeout: Optional[float] = None):
+        """Check the connection is alive without running a server command
+
+        Sends an empty RESPONSE_VALUE packet, which servers answer (or echo)
+        with the same id without touching the command dispatcher.
+        """
+        if self._sock is None:
+            raise RconConnectionError("Not connected")
+        request_id = self._next_id()
+        self._send(request_id, SERVERDATA_RESPONSE_VALUE, "")
+        self._sock.settimeout(timeout if timeout is not None else self.timeout)
+        while True:
+            response_id, _, _ = self._read_packet()
+            if response_id == request_id:
+                return
+
+    def _authenticate(self):
+        request_id = self._next_id()
+        self._send(request_id, SERVERDATA_AUTH, self.password)
+        while True:
+            response_id, packet_type, _ = self._read_packet()
+            # Source servers send an empty RESPONSE_VALUE ahead of the auth response
+            if packet_type != SERVERDATA_AUTH_RESPONSE:
+                continue
+            if response_id == -1:
+                raise RconAuthError("RCON authentication failed")
+            if response_id == request_id:
+                return
+
+    def _next_id(self) -> int:
+        # Keep ids positive 32-bit; -1 is reserved for auth failure
+        request_id = next(self._ids)
+        if request_id >= 0x7FFFFFFF:
+            self._ids = itertools.count(1)
+            request_id = next(self._ids)
+        return request_id
+
+    def _send(self, request_id: int, packet_type: int, body: str):
+        self._send_raw(encode_packet(request_id, packet_type, body))
+
+    def _send_raw(self, data: bytes):
+        try:
+            self._sock.sendall(data)
+        except socket.timeout:
+            self.close()
+            raise RconTimeoutError("Timed out sending RCON packet")
+        except OSError as e:
+            self.close()
+            raise RconConnectionError(f"Connection lost: {e}")
+
+    def _read_packet(self) -> Tuple[int, int, bytes]:
+        (size,) = _SIZE.unpack(self._recv_exact(_SIZE.size))
+        if size < 10 or size > MAX_PACKET_SIZE:
+            self.close()
+            raise RconError(f"Invalid RCON packet size: {size}")
+        return decode_packet(self._recv_exact(size))
+
+    def _recv_exact(self, length: int) -> bytes:
+        buffer = bytearray()
+        try:
+            while len(buffer) < length:
+                chunk = self._sock.recv(length - len(buffer))
+                if not chunk:
+                    raise RconConnectionError("Connection closed by server")
+                buffer += chunk
+            quick_ack(self._sock)
+        except socket.timeout:
+            # The stream position is now unknown, so the connection is unusable
+            self.close()
+            raise RconTimeoutError("Timed out waiting for RCON response")
+        except RconConnectionError:
+            self.close()
+            raise
+        except OSError as e:
+            self.close()
+            raise RconConnectionError(f"Connection lost: {e}")
+        return bytes(buffer)
@@ -0,0 +1,143 @@
+"""
+Client side of the local RCON gateway
+
+The gateway (`gateway.py`) is an optional daemon that owns the RCON
+connections, schedulers, breakers and caches for every server, so gunicorn
+workers share them instead of each keeping their own. Workers talk to it over
+a Unix domain socket.
+
+Protocol: every message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. Requests are ``{"id": n, "op": "...", "args": {...}}``;
+responses are ``{"id": n, "ok": true, "result": ...}`` or
+``{"id": n, "ok": false, "error": "..."}``.
+"""
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config.settings import CONFIG, RCON_GATEWAY_SOCKET
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+class GatewayError(Exception):
+    """The gateway failed to answer a request"""
+
+
+class GatewayUnavailableError(GatewayError):
+    """The gateway could not be reached; the request was not sent"""
+
+
+def send_frame(sock: socket.socket, message: Dict[str, Any]):
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Read one message, or None if the peer closed the connection between messages"""
+    header = _recv_exact(sock, _LENGTH.size, allow_eof=True)
+    if header is None:
+        return None
+    (length,) = _LENGTH.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise GatewayError(f"Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit")
+    return json.loads(_recv_exact(sock, length).decode('utf-8'))
+
+
+def _recv_exact(sock: socket.socket, size: int, allow_eof: bool = False) -> Optional[bytes]:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            if allow_eof and not buffer:
+                return None
+            raise ConnectionError("Gateway connection closed")
+        buffer += chunk
+    return bytes(buffer)
+
+
+class GatewayClient:
+    """Connection to the gateway, one socket per calling thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.settimeout(CONFIG.get('gateway_connect_timeout', 1))
+                sock.connect(self.path)
+            except OSError as e:
+                sock.close()
+                raise GatewayUnavailableError(f"Cannot connect to RCON gateway at {self.path}: {e}") from e
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def call(self, op: str, timeout: Optional[float] = None, **args) -> Any:
+        """Send one request and wait for its response"""
+        sock = self._socket()
+        request_id = next(self._ids)
+        try:
+            sock.settimeout(timeout)
+            send_frame(sock, {'id': request_id, 'op': op, 'args': args})
+        except OSError as e:
+            # A Unix socket reports a dead peer on send, so nothing reached the gateway
+            self._close()
+            raise GatewayUnavailableError(f"RCON gateway went away: {e}") from e
+
+        try:
+            response = recv_frame(sock)
+        except (OSError, ValueError) as e:
+            self._close()
+            raise GatewayError(f"Lost connection to RCON gateway: {e}") from e
+        if response is None or response.get('id') != request_id:
+            self._close()
+            raise GatewayError("Lost connection to RCON gateway")
+        if not response.get('ok'):
+            raise GatewayError(response.get('error', 'Unknown gateway error'))
+        return response.get('result')
+
+
+_client: Optional[GatewayClient] = None
+_unavailable_until = 0.0
+_client_lock = threading.Lock()
+
+
+def get_gateway_client() -> Optional[GatewayClient]:
+    """Client for the local gateway, or None when gateway mode is off or no gateway is running"""
+    global _client
+    if CONFIG.get('rcon_gateway', 'auto') == 'off':
+        return None
+    if time.monotonic() < _unavailable_until or not os.path.exists(RCON_GATEWAY_SOCKET):
+        return None
+    with _client_lock:
+        if _client is None or _client.path != RCON_GATEWAY_SOCKET:
+            _client = GatewayClient(RCON_GATEWAY_SOCKET)
+        return _client
+
+
+def mark_gateway_unavailable(error: Exception):
+    """Use direct mode for a while after the gateway could not be reached"""
+    global _unavailable_until
+    retry = CONFIG.get('gateway_retry_interval', 5)
+    _unavailable_until = time.monotonic() + retry
+    logger.warning(f"{error}; using direct RCON for {retry}s")
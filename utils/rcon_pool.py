@@ -0,0 +1,285 @@
+"""
+Persistent RCON connection pooling
+
+Keeps a bounded set of authenticated connections per server so commands
+skip the connect + auth round trips. Idle connections are probed and
+evicted by a background maintenance thread, and a connection broken by a
+server restart is transparently replaced.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+from config.settings import SERVERS, CONFIG, RCON_HOST
+from utils.rcon_client import RconClient, RconError, RconConnectionError, RconNotSentError, RconTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class RconConnectionPool:
+    """Bounded pool of authenticated RCON connections for one server"""
+
+    def __init__(self, server_id: str, host: str, port: int, password: str, max_size: int = 4,
+                 idle_timeout: float = 300, keepalive_interval: float = 60, timeout: float = 30):
+        self.server_id = server_id
+        self.host = host
+        self.port = port
+        self.password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (client, last_used, last_probed); most recently used on the right
+        self._in_use = 0
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def execute(self, command: str, timeout: Optional[float] = None) -> str:
+        """Run a command on a pooled connection"""
+        with self.connection(timeout) as client:
+            return self._with_reconnect(client, lambda c: c.command(command, timeout))
+
+    def execute_many(self, commands: List[str], timeout: Optional[float] = None) -> List[Union[str, RconError]]:
+        """Pipeline several commands down one pooled connection
+
+        If the connection fails, the commands that were never written are
+        sent once more on a new connection; the others report the error.
+        """
+        with self.connection(timeout) as client:
+            results = client.pipeline(commands, timeout)
+            unsent = [index for index, result in enumerate(results) if isinstance(result, RconNotSentError)]
+            if unsent:
+                logger.info(f"RCON connection to {self.server_id} lost, reconnecting")
+                try:
+                    self._reconnect(client)
+                    retried = client.pipeline([commands[index] for index in unsent], timeout)
+                except RconError as e:
+                    # Only connecting can fail here, so these commands were still not sent
+                    retried = [RconNotSentError(str(e)) if isinstance(e, RconConnectionError) else e] * len(unsent)
+                for index, result in zip(unsent, retried):
+                    results[index] = result
+            return results
+
+    def stream(self, command: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Run a command on a pooled connection and yield its output as it arrives"""
+        with self.connection(timeout) as client:
+            yield from client.iter_command(command, timeout)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection; it is returned to the pool unless it broke"""
+        client = self._acquire(self.timeout if timeout is None else timeout)
+        try:
+            yield client
+        finally:
+            self._release(client)
+
+    def _with_reconnect(self, client: RconClient, operation):
+        """Run operation, reconnecting once if the connection was dead before the command was written
+
+        A command that reached the socket is never sent again, since the
+        server may already have run it.
+        """
+        try:
+            return operation(client)
+        except RconNotSentError:
+            # The server most likely restarted since this connection was opened
+            logger.info(f"RCON connection to {self.server_id} lost, reconnecting")
+            self._reconnect(client)
+            return operation(client)
+
+    def _reconnect(self, client: RconClient):
+        client.close()
+        client.connect()
+        with self._cond:
+            self.reconnects += 1
+
+    def _acquire(self, timeout: float) -> RconClient:
+        start = time.monotonic()
+        deadline = start + timeout
+        client = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RconConnectionError(f"Connection pool for {self.server_id} is closed")
+                if self._idle:
+                    client, _, _ = self._idle.pop()
+                    self.hits += 1
+                    break
+                if self._in_use < self.max_size:
+                    self.misses += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RconTimeoutError(f"No RCON connection available for {self.server_id}")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.waits += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+
+        if client is None:
+            client = RconClient(self.host, self.port, self.password, timeout=self.timeout)
+            try:
+                client.connect()
+            except Exception:
+                self._release(client)
+                raise
+        return client
+
+    def _release(self, client: RconClient, last_used: Optional[float] = None):
+        now = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            if client.connected and not self._closed:
+                if last_used is None:
+                    self._idle.append((client, now, now))
+                else:
+                    # Back from a keepalive probe: keep its idle age and its place in line
+                    self._idle.appendleft((client, last_used, now))
+                client = None
+            self._cond.notify()
+        if client is not None:
+            client.close()
+
+    def maintain(self):
+        """Evict connections idle too long and probe the rest"""
+        now = time.monotonic()
+        to_close = []
+        to_probe = []
+        with self._cond:
+            keep = deque()
+            for client, last_used, last_probed in self._idle:
+                if now - last_used > self.idle_timeout:
+                    to_close.append(client)
+                    self.evictions += 1
+                elif now - last_probed > self.keepalive_interval:
+                    to_probe.append((client, last_used))
+                else:
+                    keep.append((client, last_used, last_probed))
+            self._idle = keep
+            self.probes += len(to_probe)
+            # Probed connections count as borrowed so the pool stays bounded
+            self._in_use += len(to_probe)
+
+        for client in to_close:
+            client.close()
+
+        for client, last_used in to_probe:
+            try:
+                client.ping(timeout=min(self.timeout, 5))
+            except Exception as e:
+                logger.info(f"Keepalive probe failed for {self.server_id}: {e}")
+                client.close()
+                with self._cond:
+                    self.probe_failures += 1
+            self._release(client, last_used)
+
+    def close(self):
+        """Close all idle connections and refuse new borrows"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._cond.notify_all()
+        for client, _, _ in idle:
+            client.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Snapshot of pool counters"""
+        with self._cond:
+            return {
+                'size': self._in_use + len(self._idle),
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'reconnects': self.reconnects,
+                'evictions': self.evictions,
+                'probes': self.probes,
+                'probe_failures': self.probe_failures,
+                'waits': self.waits,
+                'wait_time_ms': round(self.wait_time * 1000, 3),
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+# Global pool registry, one pool per entry in SERVERS
+_pools: Dict[str, RconConnectionPool] = {}
+_pools_lock = threading.Lock()
+_maintenance_thread: Optional[threading.Thread] = None
+
+
+def get_pool(server_id: str) -> RconConnectionPool:
+    """Get (or create) the connection pool for a server"""
+    server_config = SERVERS[server_id]
+    with _pools_lock:
+        pool = _pools.get(server_id)
+        if pool and (pool.port, pool.password) != (server_config['port'], server_config['password']):
+            # Server settings changed; drop the stale connections
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = RconConnectionPool(
+                server_id, RCON_HOST, server_config['port'], server_config['password'],
+                max_size=CONFIG.get('rcon_pool_size', 4),
+                idle_timeout=CONFIG.get('rcon_pool_idle_timeout', 300),
+                keepalive_interval=CONFIG.get('rcon_keepalive_interval', 60),
+                timeout=CONFIG.get('rcon_timeout', 30),
+            )
+            _pools[server_id] = pool
+        _start_maintenance()
+        return pool
+
+
+def get_pool_stats() -> Dict[str, Dict[str, float]]:
+    """Stats for every pool created so far"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {server_id: pool.stats() for server_id, pool in pools.items()}
+
+
+def close_all_pools():
+    """Close every pool (used on shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _start_maintenance():
+    global _maintenance_thread
+    if _maintenance_thread is None or not _maintenance_thread.is_alive():
+        _maintenance_thread = threading.Thread(target=_maintenance_loop, name="rcon-pool-maintenance", daemon=True)
+        _maintenance_thread.start()
+
+
+def _maintenance_loop():
+    while True:
+        interval = max(1, min(CONFIG.get('rcon_keepalive_interval', 60),
+                              CONFIG.get('rcon_pool_idle_timeout', 300)) / 2)
+        time.sleep(interval)
+        with _pools_lock:
+            pools = list(_pools.values())
+        for pool in pools:
+            try:
+                pool.maintain()
+            except Exception as e:
+                logger.error(f"Error maintaining RCON pool for {pool.server_id}: {e}")
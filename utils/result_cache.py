@@ -0,0 +1,126 @@
+"""
+TTL result cache for read-only RCON commands
+
+Results of commands in CACHEABLE_COMMANDS are kept per (server, normalized
+command) for the command's TTL, in an LRU of bounded size. Running a command
+in CACHE_INVALIDATING_COMMANDS on a server drops everything cached for it.
+
+Player positions for coordinate commands live in a separate, smaller LRU so
+a command over many players cannot evict the command results.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config.settings import CONFIG, CACHEABLE_COMMANDS, CACHE_INVALIDATING_COMMANDS
+
+
+def normalize_command(command: str) -> str:
+    """Lowercase, collapse whitespace and drop a leading slash or minecraft: namespace"""
+    normalized = ' '.join(command.lower().split()).lstrip('/')
+    return normalized[len('minecraft:'):] if normalized.startswith('minecraft:') else normalized
+
+
+def match_command_prefix(normalized: str, prefixes) -> Optional[str]:
+    """Longest entry of prefixes that matches the command on whole words"""
+    best = None
+    for prefix in prefixes:
+        if (normalized == prefix or normalized.startswith(prefix + ' ')) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return best
+
+
+def get_command_ttl(command: str) -> Optional[float]:
+    """Seconds a command's result may be reused, or None if it is not cacheable"""
+    prefix = match_command_prefix(normalize_command(command), CACHEABLE_COMMANDS)
+    return CACHEABLE_COMMANDS[prefix] if prefix else None
+
+
+def invalidates_cache(command: str) -> bool:
+    normalized = normalize_command(command)
+    if match_command_prefix(normalized, CACHEABLE_COMMANDS):
+        return False
+    return match_command_prefix(normalized, CACHE_INVALIDATING_COMMANDS) is not None
+
+
+class ResultCache:
+    """LRU of command results with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float, float]]" = OrderedDict()
+        # Bumped on invalidation so results fetched before it are not stored afterwards
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, server_id: str, command: str) -> Optional[Tuple[str, float]]:
+        """Cached (result, age in seconds), or None"""
+        key = (server_id, normalize_command(command))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], now - entry[1]
+
+    def generation(self, server_id: str) -> int:
+        with self._lock:
+            return self._generations.get(server_id, 0)
+
+    def put(self, server_id: str, command: str, result: str, ttl: float, generation: Optional[int] = None):
+        key = (server_id, normalize_command(command))
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation != self._generations.get(server_id, 0):
+                return
+            self._entries[key] = (result, now, now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_server(self, server_id: str):
+        with self._lock:
+            self._generations[server_id] = self._generations.get(server_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == server_id]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache = ResultCache()
+_position_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    """The shared result cache, sized from CONFIG"""
+    _cache.max_entries = max(1, CONFIG.get('result_cache_size', 256))
+    return _cache
+
+
+def get_position_cache() -> ResultCache:
+    """The player position cache, sized from CONFIG"""
+    _position_cache.max_entries = max(1, CONFIG.get('position_cache_size', 128))
+    return _position_cache
+
+
+def get_cache_stats() -> Dict[str, object]:
+    return dict(get_result_cache().stats(), positions=get_position_cache().stats())
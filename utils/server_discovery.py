@@ -0,0 +1,277 @@
+"""
+Server discovery from the PufferPanel server root
+
+Every ``<id>.json`` in PUFFERPANEL_SERVER_ROOT is a PufferPanel server. A
+server whose ``<id>/server.properties`` has ``enable-rcon=true``, an
+``rcon.port`` and an ``rcon.password`` is put into SERVERS, which is updated
+in place, one key at a time, so every module sees the change. Code that
+iterates SERVERS must iterate a copy (``dict(SERVERS)``, ``list(SERVERS)``),
+since a server may be added or removed meanwhile. The entries written in
+config/settings.py are kept as seeds: discovery overrides them while it finds
+RCON settings for the server and restores them when it no longer does.
+
+Discovery is started explicitly by the web app and the gateway
+(``start_server_discovery()``), not on import.
+
+The root and each server directory are watched with inotify (through ctypes)
+and only the servers an event names are re-read. Where inotify is not
+available the root is rescanned every ``server_discovery_poll_interval``
+seconds instead. Listeners get (event, server_id) for every server that is
+added, removed or whose RCON settings changed.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import CONFIG, SERVERS, PUFFERPANEL_SERVER_ROOT
+from utils.server_registry import ServerRegistry, get_server_registry
+
+logger = logging.getLogger(__name__)
+
+SERVER_ADDED = 'added'
+SERVER_REMOVED = 'removed'
+SERVER_CHANGED = 'changed'
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_EVENT = struct.Struct('iIII')
+# Editors and PufferPanel write a file in several steps; wait for them to settle
+_DEBOUNCE = 0.25
+
+
+class Inotify:
+    """Minimal inotify binding; raises OSError where inotify is unavailable"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, int, str]]:
+        """(watch descriptor, mask, name) of the events that arrive within timeout"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ServerDiscovery:
+    """Keeps SERVERS in line with the RCON settings found under the server root"""
+
+    def __init__(self, root: str, servers: Dict[str, Dict], registry: Optional[ServerRegistry] = None):
+        self.root = root
+        self.servers = servers
+        self.registry = registry or ServerRegistry(root)
+        self.static = {server_id: dict(config) for server_id, config in servers.items()}
+        # Every PufferPanel server id, with or without RCON
+        self.panel_servers: Set[str] = set()
+        self.mode = 'stopped'
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_listener(self, listener: Callable[[str, str], None]):
+        self._listeners.append(listener)
+
+    def server_ids(self) -> List[str]:
+        """Ids of all PufferPanel servers under the root"""
+        with self._lock:
+            return sorted(self.panel_servers)
+
+    def _rcon_config(self, server_id: str) -> Optional[Dict]:
+        properties = self.registry.get(server_id).properties
+        if properties.get('enable-rcon', '').lower() != 'true':
+            return None
+        port, password = properties.get('rcon.port', ''), properties.get('rcon.password', '')
+        if not port.isdigit() or not password:
+            return None
+        return {'port': int(port), 'password': password}
+
+    def refresh(self, server_ids):
+        """Re-read these servers and apply what changed to SERVERS"""
+        events = []
+        for server_id in server_ids:
+            on_panel = os.path.exists(os.path.join(self.root, f"{server_id}.json"))
+            config = (self._rcon_config(server_id) if on_panel else None) or self.static.get(server_id)
+            with self._lock:
+                if on_panel:
+                    self.panel_servers.add(server_id)
+                else:
+                    self.panel_servers.discard(server_id)
+                current = self.servers.get(server_id)
+                if config == current:
+                    continue
+                if config is None:
+                    self.servers.pop(server_id, None)
+                    events.append((SERVER_REMOVED, server_id))
+                else:
+                    # Replaced rather than updated, so readers never see half the change
+                    self.servers[server_id] = dict(current or {}, **config)
+                    events.append((SERVER_CHANGED if current else SERVER_ADDED, server_id))
+
+        for event, server_id in events:
+            logger.info(f"Server {server_id} {event} (RCON port {self.servers.get(server_id, {}).get('port')})")
+            for listener in self._listeners:
+                try:
+                    listener(event, server_id)
+                except Exception as e:
+                    logger.error(f"Error in server discovery listener: {e}")
+
+    def scan(self):
+        """Re-read every server under the root"""
+        try:
+            found = {name[:-5] for name in os.listdir(self.root) if name.endswith('.json')}
+        except OSError:
+            found = set()
+        with self._lock:
+            known = set(self.panel_servers) | set(self.servers)
+        self.refresh(sorted(found | known))
+
+    def start(self):
+        self.scan()
+        inotify = None
+        try:
+            inotify = Inotify()
+            watches = {inotify.add_watch(self.root, _WATCH_MASK | _IN_DELETE_SELF): None}
+        except (OSError, AttributeError) as e:
+            if inotify is not None:
+                inotify.close()
+            logger.info(f"Watching {self.root} by polling ({e})")
+            self.mode = 'polling'
+            target, args = self._poll, ()
+        else:
+            self.mode = 'inotify'
+            target, args = self._watch, (inotify, watches)
+        self._thread = threading.Thread(target=target, args=args, name='server-discovery', daemon=True)
+        self._thread.start()
+
+    def _poll(self):
+        while True:
+            time.sleep(CONFIG.get('server_discovery_poll_interval', 30))
+            try:
+                self.scan()
+            except Exception as e:
+                logger.error(f"Error scanning {self.root}: {e}")
+
+    def _watch_server(self, inotify: Inotify, watches: Dict[int, Optional[str]], server_id: str):
+        path = os.path.join(self.root, server_id)
+        if server_id in watches.values() or not os.path.isdir(path):
+            return
+        try:
+            watches[inotify.add_watch(path, _WATCH_MASK)] = server_id
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning(f"Cannot watch {path}: {e}")
+
+    def _watch(self, inotify: Inotify, watches: Dict[int, Optional[str]]):
+        for server_id in self.server_ids():
+            self._watch_server(inotify, watches, server_id)
+        while True:
+            events = inotify.read(None)
+            while True:
+                more = inotify.read(_DEBOUNCE)
+                if not more:
+                    break
+                events += more
+
+            changed, rescan = set(), False
+            for wd, mask, name in events:
+                if mask & _IN_Q_OVERFLOW:
+                    rescan = True
+                elif mask & _IN_IGNORED:
+                    # The watched directory is gone
+                    server_id = watches.pop(wd, 0)
+                    if server_id is None:
+                        logger.warning(f"{self.root} was removed; server discovery stopped following it")
+                    elif server_id:
+                        changed.add(server_id)
+                elif watches.get(wd, 0) is None:
+                    # In the root: <id>.json or a server directory
+                    if name.endswith('.json'):
+                        changed.add(name[:-5])
+                    elif mask & _IN_ISDIR:
+                        changed.add(name)
+                        self._watch_server(inotify, watches, name)
+                elif name == 'server.properties':
+                    changed.add(watches[wd])
+
+            if rescan:
+                self.registry.invalidate()
+                self.scan()
+                continue
+            for server_id in changed:
+                self.registry.invalidate(server_id)
+            try:
+                self.refresh(sorted(changed))
+            except Exception as e:
+                logger.error(f"Error refreshing servers {', '.join(changed)}: {e}")
+
+
+_discovery: Optional[ServerDiscovery] = None
+# Listeners registered before discovery started
+_listeners: List[Callable[[str, str], None]] = []
+_start_lock = threading.Lock()
+
+
+def start_server_discovery() -> Optional[ServerDiscovery]:
+    """Fill SERVERS from the server root and keep following it"""
+    global _discovery
+    with _start_lock:
+        if _discovery is None and CONFIG.get('enable_server_discovery', True):
+            discovery = ServerDiscovery(PUFFERPANEL_SERVER_ROOT, SERVERS, get_server_registry())
+            for listener in _listeners:
+                discovery.add_listener(listener)
+            discovery.start()
+            _discovery = discovery
+    return _discovery
+
+
+def get_server_discovery() -> Optional[ServerDiscovery]:
+    return _discovery
+
+
+def add_discovery_listener(listener: Callable[[str, str], None]):
+    """Call listener(event, server_id) when a server is added, removed or its RCON settings change"""
+    with _start_lock:
+        _listeners.append(listener)
+        if _discovery is not None:
+            _discovery.add_listener(listener)
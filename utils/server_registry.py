@@ -0,0 +1,146 @@
+"""
+Cached server metadata
+
+Display names, ports and ``server.properties`` values used to be read from
+disk on every ``get_server_info()`` call, which a single Slack request makes
+several times. The registry keeps one ServerMetadata per server, built from
+one read of ``<id>.json`` and one parse of ``server.properties``. Entries are
+revalidated against the files' mtime and size at most every
+``server_registry_check_interval`` seconds; in between, a read is a dict
+lookup.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config.settings import CONFIG, PUFFERPANEL_SERVER_ROOT
+from utils.output_cleaner import strip_formatting
+
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, size) of a file, or None if it does not exist
+FileStamp = Optional[Tuple[int, int]]
+
+
+def _stamp(path: str) -> FileStamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_properties(path: str) -> Dict[str, str]:
+    """key=value pairs of a server.properties file; comments and blank lines are skipped"""
+    properties = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line[0] in '#!' or '=' not in line:
+                    continue
+                key, value = line.split('=', 1)
+                properties[key.strip()] = value.strip()
+    except (IOError, UnicodeDecodeError) as e:
+        logger.debug(f"Could not read {path}: {e}")
+    return properties
+
+
+def _int_property(properties: Dict[str, str], key: str) -> Optional[int]:
+    value = properties.get(key, '')
+    return int(value) if value.isdigit() else None
+
+
+class ServerMetadata:
+    """What a server's PufferPanel config and server.properties say about it"""
+
+    __slots__ = ('server_id', 'display_name', 'properties', 'server_port', 'rcon_port',
+                 'stamps', 'checked_at')
+
+    def __init__(self, server_id: str, root: str):
+        self.server_id = server_id
+        config_path, properties_path = self.paths(server_id, root)
+        # Stamped before reading, so a change made while reading is caught on the next check
+        self.stamps = (_stamp(config_path), _stamp(properties_path))
+        self.checked_at = time.monotonic()
+
+        config = {}
+        if self.stamps[0] is not None:
+            try:
+                with open(config_path, 'r') as f:
+                    config = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                logger.debug(f"Could not read PufferPanel config for {server_id}: {e}")
+        self.properties = parse_properties(properties_path) if self.stamps[1] is not None else {}
+        self.server_port = _int_property(self.properties, 'server-port')
+        self.rcon_port = _int_property(self.properties, 'rcon.port')
+        self.display_name = self._display_name(config if isinstance(config, dict) else {})
+
+    @staticmethod
+    def paths(server_id: str, root: str) -> Tuple[str, str]:
+        return (os.path.join(root, f"{server_id}.json"),
+                os.path.join(root, server_id, "server.properties"))
+
+    def _display_name(self, config: Dict) -> str:
+        # PufferPanel's MOTD, then its display name, then the server.properties MOTD
+        data = config.get('data')
+        motd = data.get('motd') if isinstance(data, dict) else None
+        name = motd.get('value', '') if isinstance(motd, dict) else ''
+        if isinstance(name, str) and name:
+            name = strip_formatting(name).strip().strip('"\'')[:40]
+        if not name:
+            display = config.get('display', '')
+            name = display.strip() if isinstance(display, str) else ''
+        if not name and 'motd' in self.properties:
+            name = strip_formatting(self.properties['motd']).strip()[:40]
+        return name or self.server_id
+
+
+class ServerRegistry:
+    """ServerMetadata per server id, reloaded when its files change"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self._entries: Dict[str, ServerMetadata] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'checks': 0, 'loads': 0}
+
+    def get(self, server_id: str) -> ServerMetadata:
+        entry = self._entries.get(server_id)
+        if entry is not None:
+            if time.monotonic() - entry.checked_at < CONFIG.get('server_registry_check_interval', 2):
+                self.stats['hits'] += 1
+                return entry
+            self.stats['checks'] += 1
+            paths = ServerMetadata.paths(server_id, self.root)
+            if (_stamp(paths[0]), _stamp(paths[1])) == entry.stamps:
+                entry.checked_at = time.monotonic()
+                return entry
+
+        entry = ServerMetadata(server_id, self.root)
+        self.stats['loads'] += 1
+        with self._lock:
+            self._entries[server_id] = entry
+        return entry
+
+    def invalidate(self, server_id: Optional[str] = None):
+        """Forget one server's metadata, or everyone's"""
+        with self._lock:
+            if server_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(server_id, None)
+
+
+_registry = ServerRegistry(PUFFERPANEL_SERVER_ROOT)
+
+
+def get_server_registry() -> ServerRegistry:
+    return _registry
+
+
+def get_server_metadata(server_id: str) -> ServerMetadata:
+    return _registry.get(server_id)
@@ -9,10 +9,13 @@ import json
 import requests
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Slack accepts replies through a slash command's response_url for 30 minutes
+RESPONSE_URL_LIFETIME = 30 * 60
+
 class SlackNotifier:
     def __init__(self):
         self.backup_webhook = os.getenv('BACKUP_SLACK_WEBHOOK_URL')
@@ -164,6 +167,52 @@ class SlackNotifier:
         
         return self._send_notification(self.minecraft_webhook, payload)
 
+    def notify_deferred_results(self, user: str, server_name: str, results: List[Tuple[str, str]],
+                                response_url: Optional[str] = None) -> bool:
+        """Send the outcome of commands that were queued while a server was offline
+        
+        Goes to the requester through their command's response_url, or to the
+        Minecraft webhook when there is none or Slack no longer accepts it.
+        """
+        succeeded = sum(1 for _, result in results if not result.startswith("❌"))
+        lines = []
+        for command, result in results:
+            status_emoji = "❌" if result.startswith("❌") else "✅"
+            lines.append(f"{status_emoji} `{command}` - {result}")
+        
+        if response_url:
+            text = (f"⏳ Your deferred commands ran on *{server_name}* ({succeeded}/{len(results)} succeeded)\n"
+                    + "\n".join(lines))
+            if self.send_response(response_url, text):
+                return True
+            logger.info(f"Deferred results for {user} could not go through their response_url; using the webhook")
+        
+        payload = {
+            "text": f"⏳ Deferred commands for {user} ran on {server_name} ({succeeded}/{len(results)} succeeded)",
+            "attachments": [
+                {
+                    "color": "good" if succeeded == len(results) else "warning",
+                    "fields": [
+                        {
+                            "title": "Deferred Minecraft Commands",
+                            "value": f"*User:* {user}\n*Server:* {server_name}\n" + "\n".join(lines),
+                            "short": False
+                        }
+                    ],
+                    "footer": "RCON Web Service",
+                    "footer_icon": "https://cdn-icons-png.flaticon.com/512/2620/2620669.png",
+                    "ts": int(datetime.now().timestamp()),
+                    "mrkdwn_in": ["text", "pretext", "fields"]
+                }
+            ]
+        }
+        
+        return self._send_notification(self.minecraft_webhook, payload)
+
+    def send_response(self, response_url: str, text: str, response_type: str = 'ephemeral') -> bool:
+        """Send a delayed reply to a slash command through its response_url"""
+        return self._send_notification(response_url, {'response_type': response_type, 'text': text})
+
 # Global instance
 slack_notifier = SlackNotifier()
 
@@ -176,3 +225,10 @@ def notify_player_action(user: str, server_name: str, action: str, player: str =
 
 def notify_server_status(server_name: str, status: str, user: str = None) -> bool:
     return slack_notifier.notify_minecraft_server_status(server_name, status, user)
+
+def notify_deferred_results(user: str, server_name: str, results: List[Tuple[str, str]],
+                            response_url: Optional[str] = None) -> bool:
+    return slack_notifier.notify_deferred_results(user, server_name, results, response_url)
+
+def send_slack_response(response_url: str, text: str, response_type: str = 'ephemeral') -> bool:
+    return slack_notifier.send_response(response_url, text, response_type)
@@ -0,0 +1,179 @@
+"""
+Paginated delivery of long results to Slack
+
+Slack truncates long messages, so results are split on line boundaries into
+pages of at most ``slack_page_size`` characters. Pages are produced lazily
+from an iterable of lines: only the page being sent is ever joined into a
+string. The first page is the slash command's reply; the following ones are
+posted through the response_url, up to ``slack_pushed_pages`` of them, and
+anything left is kept in a bounded cache under a token for ``/mc more <token>``.
+"""
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from config.settings import CONFIG
+
+logger = logging.getLogger(__name__)
+
+MORE_USAGE = "Usage: `/mc more <token>`"
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """The lines of text, without splitting it into a list first"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_pages(lines: Iterable[str], limit: int) -> Iterator[str]:
+    """Join lines into pages of at most limit characters; longer lines are split"""
+    page, size, empty = [], 0, True
+    for line in lines:
+        if len(line) > limit:
+            if page:
+                yield '\n'.join(page)
+                page, size = [], 0
+            while len(line) > limit:
+                yield line[:limit]
+                line = line[limit:]
+            empty = False
+            if not line:
+                continue
+        if page and size + 1 + len(line) > limit:
+            yield '\n'.join(page)
+            page, size = [], 0
+        size += len(line) + (1 if page else 0)
+        page.append(line)
+    if page or empty:
+        yield '\n'.join(page)
+
+
+class PagedOutput:
+    """The pages of one result, rendered one at a time"""
+
+    def __init__(self, header: str, pages: Iterator[str], user_name: str,
+                 response_type: str = 'in_channel', footer: str = ''):
+        self.header = header
+        self.user_name = user_name
+        self.response_type = response_type
+        self.footer = footer
+        self.token: Optional[str] = None
+        self.number = 0
+        self._pages = pages
+        self._next = next(pages, None)
+        self._lock = threading.Lock()
+
+    @property
+    def has_more(self) -> bool:
+        return self._next is not None
+
+    def next_page(self, hint: bool = True) -> Optional[str]:
+        """The next page as a Slack message, or None when all have been sent"""
+        with self._lock:
+            body = self._next
+            if body is None:
+                return None
+            self._next = next(self._pages, None)
+            self.number += 1
+            number = self.number
+            last = self._next is None
+            # Only results that outgrow a single reply need a token
+            if not last and self.token is None:
+                _page_cache.put(self)
+
+        header = self.header if number == 1 else f"{self.header} (page {number})"
+        text = f"{header}\n```\n{body}\n```"
+        if last:
+            if self.footer:
+                text += f"\n{self.footer}"
+        elif hint and self.token:
+            text += f"\n📄 More output: `/mc more {self.token}`"
+        return text
+
+
+class PageCache:
+    """Bounded, expiring store of results with pages left to deliver"""
+
+    def __init__(self, max_entries: int = 100):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, paged: PagedOutput) -> str:
+        token = secrets.token_hex(4)
+        expires = time.monotonic() + CONFIG.get('slack_page_ttl', 1800)
+        with self._lock:
+            self._entries[token] = (paged, expires)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        paged.token = token
+        return token
+
+    def get(self, token: str, user_name: str) -> Optional[PagedOutput]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            paged, expires = entry
+            if expires < now or not paged.has_more:
+                del self._entries[token]
+                return None
+        return paged if paged.user_name == user_name else None
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+_page_cache = PageCache(CONFIG.get('slack_page_cache_size', 100))
+_push_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='slack-pages')
+
+
+def paginate(header: str, lines: Iterable[str], user_name: str,
+             response_type: str = 'in_channel', footer: str = '') -> PagedOutput:
+    """Split a result into pages, to be sent with ``next_page()``"""
+    pages = iter_pages(lines, CONFIG.get('slack_page_size', 3500))
+    return PagedOutput(header, pages, user_name, response_type, footer)
+
+
+def get_more(token: str, user_name: str) -> Optional[PagedOutput]:
+    """The paged result for a `/mc more` token, if it is still cached for this user"""
+    return _page_cache.get(token, user_name)
+
+
+def push_pages(response_url: str, paged: PagedOutput):
+    """Post the following pages through the response_url, leaving the rest for `/mc more`"""
+    from utils.slack_notifications import send_slack_response
+
+    for remaining in range(CONFIG.get('slack_pushed_pages', 4), 0, -1):
+        text = paged.next_page(hint=remaining == 1)
+        if text is None:
+            break
+        if not send_slack_response(response_url, text, paged.response_type):
+            logger.warning(f"Could not deliver page {paged.number} of {paged.token}")
+            break
+    if not paged.has_more and paged.token:
+        _page_cache.discard(paged.token)
+
+
+def paged_reply(paged: PagedOutput, response_url: Optional[str]):
+    """Slack reply with the first page; the following pages go out through the response_url"""
+    from flask import jsonify
+
+    push = bool(response_url)
+    response = jsonify({'response_type': paged.response_type, 'text': paged.next_page(hint=not push)})
+    if push and paged.has_more:
+        # Once the reply has been sent, so the pages arrive in order
+        response.call_on_close(lambda: _push_executor.submit(push_pages, response_url, paged))
+    return response
@@ -79,14 +79,16 @@ def test_context_manager():
 def test_command_processor():
     """Test command processing"""
     try:
-        from modules.command_processor import process_command_alias, format_command_template
+        from modules.command_processor import process_command_alias
+        from utils.alias_table import CompiledAlias
         
         # Test alias processing
         result, error = process_command_alias('list', 'test_user')
         assert error is None, f"Alias processing error: {error}"
         
         # Test template formatting
-        formatted, error = format_command_template('gamemode {mode} {player}', ['creative', 'TestPlayer'])
+        template = CompiledAlias('gm', 'gamemode {mode} {player}', '❌ Alias error', append_args=False)
+        formatted, error = template.render(['creative', 'TestPlayer'])
         assert error is None, f"Template formatting error: {error}"
         assert 'creative' in formatted and 'TestPlayer' in formatted, "Template not formatted correctly"
         print("✅ Command processor working")
@@ -95,6 +97,30 @@ def test_command_processor():
         print(f"❌ Command processor error: {e}")
         return False
 
+def test_command_policy():
+    """Test that denied commands stay denied in every spelling"""
+    try:
+        from utils.command_policy import get_command_policy, ROLE_USER
+        from config.settings import COMMAND_POLICY_RULES, CONFIG
+        if CONFIG.get('enable_dangerous_commands', False):
+            print("⚠️  enable_dangerous_commands is on - skipping policy check")
+            return True
+        policy = get_command_policy()
+        denied = [rule['command'] for rule in COMMAND_POLICY_RULES if rule.get('action', 'deny') == 'deny']
+        for command in denied:
+            for spelling in (command, f"/{command}", f"minecraft:{command}", f"spigot:{command}",
+                             f"bukkit:{command}", f"essentials:{command} @a", f"/Essentials:{command.upper()}",
+                             f"execute as @a run {command}", f"execute as @a run bukkit:{command}"):
+                allowed, _ = policy.check(spelling, ROLE_USER)
+                assert not allowed, f"Policy allowed '{spelling}' for non-admin users"
+        allowed, _ = policy.check('list', ROLE_USER)
+        assert allowed, "Policy denied 'list'"
+        print("✅ Command policy working")
+        return True
+    except Exception as e:
+        print(f"❌ Command policy error: {e}")
+        return False
+
 def test_backup_manager():
     """Test backup management"""
     try:
@@ -144,6 +170,7 @@ def main():
         ("Server Utils", test_server_utils),
         ("Context Manager", test_context_manager),
         ("Command Processor", test_command_processor),
+        ("Command Policy", test_command_policy),
         ("Backup Manager", test_backup_manager),
         ("Route Blueprints", test_routes),
         ("Flask Application", test_flask_app)